@@ -0,0 +1,59 @@
+"""Microbenchmark of the JSON codec
+
+    It decodes and encodes the pages of the fixtures tests/*-msgs-*.json scaled up,
+    with each library installed
+
+        Example:
+            python3 benchmarks/codec_benchmark.py --messages 100000
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from stocktwits_collector.codec import Codec
+
+def get_pages(messages):
+    """
+    pages of 30 messages, made by the messages of the fixtures with a new ID
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+    fixtures = []
+    for filename in sorted(glob.glob(os.path.join(path, "*-msgs-*.json"))):
+        with open(filename) as fh:
+            fixtures.extend(json.load(fh))
+    pages = []
+    for first in range(0, messages, 30):
+        page = []
+        for index in range(first, min(first + 30, messages)):
+            message = dict(fixtures[index % len(fixtures)])
+            message["id"] = 500000000 - index
+            page.append(message)
+        pages.append(json.dumps({"messages": page}).encode())
+    return pages
+
+def run(method, pages):
+    start = time.perf_counter()
+    for page in pages:
+        method(page)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    pages = get_pages(args.messages)
+    decoded = [json.loads(page)["messages"] for page in pages]
+    print(f"messages:       {args.messages}")
+    print(f"pages:          {len(pages)} ({sum([len(page) for page in pages]) / 1024 ** 2:.1f} MB)")
+    results = {}
+    for library, module in Codec.libraries.items():
+        if module is None:
+            continue
+        codec = Codec(library)
+        results[library] = run(codec.loads, pages) + run(codec.dumps, decoded)
+        print(f"{library + ':':15} decode and encode {results[library]:.3f} s")
+    print(f"speedup:        {results['json'] / results[Codec().library]:.1f}x codec {Codec().library}")
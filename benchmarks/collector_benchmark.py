@@ -0,0 +1,79 @@
+"""Microbenchmark of the chunk logic of the Collector
+
+    It compares clean_history and is_same_chunk parsing each created_at by strptime,
+    like the first versions of the Collector, with the parsed dates index and the binary search.
+
+        Example:
+            python3 benchmarks/collector_benchmark.py --messages 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from stocktwits_collector.collector import Collector
+
+class LegacyCollector(Collector):
+    def is_same_chunk(self, first_date, second_date, chunk = "day"):
+        first = datetime.strptime(first_date, "%Y-%m-%dT%H:%M:%SZ")
+        second = datetime.strptime(second_date, "%Y-%m-%dT%H:%M:%SZ")
+        is_same = False
+        if chunk == "day":
+            is_same = first.strftime("%Y-%m-%d") == second.strftime("%Y-%m-%d")
+        if chunk == "week":
+            is_same = first.strftime("%W") == second.strftime("%W")
+        if chunk == "month":
+            is_same = first.replace(day=1).strftime("%Y-%m-%d") == second.replace(day=1).strftime("%Y-%m-%d")
+        return is_same
+
+    def clean_history(self, cursor, history, chunk = "day"):
+        history_length = 0
+        same_oldest_date = 0
+        same_earliest_date = 0
+        for message in history:
+            history_length += 1
+            if self.is_same_chunk(message["created_at"], cursor["oldest_date"], chunk):
+                same_oldest_date += 1
+            if self.is_same_chunk(message["created_at"], cursor["earliest_date"], chunk):
+                same_earliest_date += 1
+        if history_length == (same_oldest_date + same_earliest_date):
+            current_chunk = cursor["oldest_date"]
+            indexes_to_delete = []
+            for index, message in enumerate(history):
+                if self.is_same_chunk(message["created_at"], current_chunk):
+                    indexes_to_delete.append(index)
+            for index in reversed(indexes_to_delete):
+                del history[index]
+        return history
+
+def get_history(messages):
+    """
+    history of two weeks sorted from the most recent message
+    """
+    last = datetime(2022, 4, 5, 12, 0, 0)
+    history = []
+    for index in range(messages):
+        created_at = last - timedelta(seconds=index * 14 * 86400 // messages)
+        history.append({"id": 500000000 - index, "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%SZ")})
+    return history
+
+def run(collector, history):
+    start = time.perf_counter()
+    cleaned = collector.clean_history(collector.get_cursor(history), history, "week")
+    return time.perf_counter() - start, len(cleaned)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1000000)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    before, before_length = run(LegacyCollector(), get_history(args.messages))
+    after, after_length = run(Collector(), get_history(args.messages))
+    assert before_length == after_length
+    print(f"messages:       {args.messages}")
+    print(f"strptime:       {before:.3f} s")
+    print(f"parsed index:   {after:.6f} s")
+    print(f"speedup:        {before / after:.0f}x")
@@ -0,0 +1,150 @@
+"""A local stand-in of the Stocktwits API for the benchmarks
+
+    It serves the streams/symbol and streams/user endpoints with synthetic messages,
+    so the benchmarks do not depend on the network or on the API quota.
+    The latency and the errors 429 and 504 of the API can be simulated, and the requests are counted by status.
+
+        Example:
+            server = Server()
+            server.start()
+            streamer = Streamer(url=server.url)
+            ...
+            server.stop()
+"""
+import json
+import time
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: int(value[0]) for key, value in parse_qs(url.query).items()}
+        parts = url.path.rstrip("/").split("/")
+        if len(parts) < 2 or parts[-2] not in ["symbol", "user"]:
+            self.send_error(404)
+            return
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        status = self.server.get_status()
+        if status != 200:
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", str(self.server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        stream = parts[-1].replace(".json", "")
+        messages = self.server.get_page(parts[-2], stream, params.get("since", 0), params.get("max", 0), params.get("limit", 30))
+        body = json.dumps({"messages": messages}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port = 0, messages = 10000, last_id = 500000000, last_date = "2023-03-12T17:25:51Z", interval = 60, latency = 0, rate_limited = 0, gateway_timeout = 0, retry_after = 0, seed = 0):
+        """
+        the stream of each symbol or user has the same synthetic messages, one every interval seconds
+
+            Arguments:
+                :port (int): port of the server, default 0 to choose a free one
+                :messages (int): number of messages of each stream
+                :last_id (int): ID of the most recent message
+                :last_date (str): created_at of the most recent message
+                :interval (int): seconds between two messages
+                :latency (float): seconds waited before each response, default 0
+                :rate_limited (float): fraction of the requests answered by 429, default 0
+                :gateway_timeout (float): fraction of the requests answered by 504, default 0
+                :retry_after (float): seconds of the Retry-After header of the responses 429, default 0
+                :seed (int): seed of the errors, so two runs have the same errors
+        """
+        super().__init__(("127.0.0.1", port), Handler)
+        self.messages = messages
+        self.last_id = last_id
+        self.last_date = datetime.strptime(last_date, "%Y-%m-%dT%H:%M:%SZ")
+        self.interval = interval
+        self.latency = latency
+        self.rate_limited = rate_limited
+        self.gateway_timeout = gateway_timeout
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    @property
+    def oldest_date(self):
+        return self.get_message("symbol", "TSLA", self.last_id - self.messages + 1)["created_at"]
+
+    def get_status(self):
+        """
+        get the status of a request, counting it
+        """
+        with self.lock:
+            draw = self.random.random()
+            status = 200
+            if draw < self.rate_limited:
+                status = 429
+            elif draw < self.rate_limited + self.gateway_timeout:
+                status = 504
+            self.requests[status] += 1
+            return status
+
+    def iter_messages(self, kind, stream):
+        """
+        iterate all the synthetic messages of a stream, the most recent first
+        """
+        for id in range(self.last_id, self.last_id - self.messages, -1):
+            yield self.get_message(kind, stream, id)
+
+    def get_message(self, kind, stream, id):
+        """
+        get the synthetic message with that ID
+        """
+        created_at = self.last_date - timedelta(seconds=(self.last_id - id) * self.interval)
+        username = stream if kind == "user" else "user"
+        symbol = stream if kind == "symbol" else "TSLA"
+        return {
+            "id": id,
+            "body": f"${symbol} message {id}",
+            "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "user": {"id": 1, "username": username},
+            "symbols": [{"id": 1, "symbol": symbol}],
+            "entities": {"sentiment": {"basic": "Bullish" if id % 3 else "Bearish"}}
+        }
+
+    def get_page(self, kind, stream, since, max_id, limit):
+        """
+        get the page of messages with the API paging: newest first, ID greater than since and less than or equal to max
+        """
+        limit = 30 if limit <= 0 or limit > 30 else limit
+        newest = self.last_id if max_id <= 0 else min(max_id, self.last_id)
+        oldest = max(since + 1, self.last_id - self.messages + 1, newest - limit + 1)
+        return [self.get_message(kind, stream, id) for id in range(newest, oldest - 1, -1)]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,58 @@
+"""Benchmark of Signals.details on a synthetic DataFrame of twits
+
+    It compares details parsing each created_at by strptime and mapping each sentiment by apply,
+    like the first versions of Signals, with the vectorized parsing, mapping and period keys.
+
+        Example:
+            python3 benchmarks/signals_benchmark.py --messages 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from stocktwits_collector.signals import Signals
+
+class LegacySignals(Signals):
+    def details(self, prefix, sentiment, twits):
+        twits['datetime'] = twits['created_at'].apply(self.convert_datetime)
+        twits['date'] = twits['datetime'].dt.strftime('%Y-%m-%d')
+        twits['time'] = twits['datetime'].dt.strftime('%H:%M:%SZ')
+        twits['hour'] = twits['datetime'].dt.strftime('%Y-%m-%dT%H:59:59Z')
+
+        twits[f'{prefix}_number'] = twits[sentiment].apply(self.convert_sentiment)
+        twits[f'{prefix}_total_cum'] = twits[f'{prefix}_number'].cumsum()
+        twits[f'{prefix}_day_cum'] = twits.groupby(['date'])[f'{prefix}_number'].cumsum()
+        twits[f'{prefix}_hour_cum'] = twits.groupby(['hour'])[f'{prefix}_number'].cumsum()
+        return twits
+
+def get_twits(messages):
+    """
+    twits of one year sorted from the oldest message, with about a third of them without sentiment
+    """
+    seconds = np.sort(np.random.default_rng(0).integers(0, 365 * 86400, messages))
+    created_at = (pd.Timestamp("2022-01-01") + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%dT%H:%M:%SZ")
+    sentiment = np.array(["Bullish", "Bearish", None], dtype=object)[np.arange(messages) % 3]
+    return pd.DataFrame({"id": np.arange(messages), "body": "message", "created_at": created_at, "sentiment": sentiment})
+
+def run(signals, twits):
+    start = time.perf_counter()
+    twits = signals.details("tsla", "sentiment", twits)
+    return time.perf_counter() - start, twits
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1000000)
+    args = parser.parse_args()
+
+    twits = get_twits(args.messages)
+    before, before_twits = run(LegacySignals(), twits.copy())
+    after, after_twits = run(Signals(), twits.copy())
+    pd.testing.assert_frame_equal(before_twits, after_twits)
+    print(f"messages:       {args.messages}")
+    print(f"apply:          {before:.3f} s")
+    print(f"vectorized:     {after:.3f} s")
+    print(f"speedup:        {before / after:.0f}x")
+
@@ -0,0 +1,44 @@
+"""Benchmark of the pages per second downloaded by the Streamer
+
+    It compares one new connection per page, like the module-level requests.get,
+    with the session of the Streamer that keeps the connections alive.
+
+        Example:
+            python3 benchmarks/streamer_benchmark.py --pages 500
+"""
+import os
+import sys
+import time
+import argparse
+import requests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from stocktwits_collector.streamer import Streamer
+from server import Server
+
+class LegacyStreamer(Streamer):
+    def request(self, url, data, endpoint='stream'):
+        r = requests.get(url, headers=self.headers, params=data, timeout=self.timeout)
+        if r.status_code != 200:
+            raise Exception('Unable to Return Request {}'.format(r.status_code))
+        return r.json()
+
+def run(streamer, pages):
+    max = 0
+    start = time.perf_counter()
+    for _ in range(pages):
+        messages = streamer.get_symbol_msgs("TSLA", max=max, limit=30)["messages"]
+        max = messages[-1]["id"]
+    return pages / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    args = parser.parse_args()
+
+    server = Server(messages=args.pages * 30).start()
+    before = run(LegacyStreamer(url=server.url), args.pages)
+    after = run(Streamer(url=server.url), args.pages)
+    server.stop()
+    print(f"requests.get: {before:.1f} pages/s")
+    print(f"session:      {after:.1f} pages/s")
+    print(f"speedup:      {after / before:.2f}x")
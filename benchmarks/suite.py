@@ -0,0 +1,149 @@
+"""Benchmark suite of the collector and of the signals on the local stand-in of the Stocktwits API
+
+    It times get_history(), save_history() and Signals.add_signals() for each size of the history,
+    each one in a new process, so the peak RSS is the one of that benchmark alone.
+    The results are printed and saved as JSON, and they can be compared with the results of a previous run,
+    so a regression of the throughput fails the run.
+
+        Example:
+            python3 benchmarks/suite.py --sizes 1000 10000 100000 --output results.json
+            python3 benchmarks/suite.py --latency 0.01 --rate-limited 0.05 --gateway-timeout 0.05
+            python3 benchmarks/suite.py --baseline results.json --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from server import Server
+
+benchmarks = ["get_history", "save_history", "add_signals"]
+
+def get_peak_rss():
+    """
+    peak resident set size of the process in MB, ru_maxrss is in bytes on macOS and in KB elsewhere
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def get_collector(url):
+    from stocktwits_collector.collector import Collector
+    import stocktwits_collector.streamer as s
+    collector = Collector(rate_limit=None)
+    collector.ts = s.Streamer(url=url, backoff=0.01, max_backoff=0.1)
+    return collector
+
+def run_get_history(size, url, start):
+    collector = get_collector(url)
+    begin = time.perf_counter()
+    messages = collector.get_history({"symbols": ["TSLA"], "start": start})
+    return time.perf_counter() - begin, len(messages), collector.counters
+
+def run_save_history(size, url, start):
+    collector = get_collector(url)
+    with tempfile.TemporaryDirectory() as directory:
+        begin = time.perf_counter()
+        collector.save_history({"symbols": ["TSLA"], "start": start, "chunk": "day", "filename_prefix": os.path.join(directory, "history.")})
+        seconds = time.perf_counter() - begin
+        saved = 0
+        for filename in os.listdir(directory):
+            if filename.startswith("history.") and filename.endswith(".json"):
+                with open(os.path.join(directory, filename)) as fh:
+                    saved += len(json.load(fh))
+    return seconds, saved, collector.counters
+
+def run_add_signals(size, url, start):
+    import pandas as pd
+    from stocktwits_collector.signals import Signals
+    from stocktwits_collector.writer import Writer
+    server = Server(messages=size)
+    server.server_close()
+    writer = Writer()
+    rows = [writer.flatten(message) for message in server.iter_messages("symbol", "TSLA")]
+    twits = pd.DataFrame(rows[::-1], columns=writer.columns).rename(columns={"entities.sentiment.basic": "sentiment"})
+    del rows
+    begin = time.perf_counter()
+    twits = Signals().add_signals("tsla", "sentiment", twits)
+    return time.perf_counter() - begin, len(twits), {}
+
+def run(benchmark, size, url, start):
+    """
+    run a benchmark in the current process
+
+        Arguments:
+            :benchmark (str): get_history, save_history or add_signals
+            :size (int): number of messages of the history
+            :url (str): URL of the stand-in server
+            :start (str): created_at of the oldest message of the history
+        Returns:
+            dictionary with seconds, messages, counters and peak_rss_mb
+    """
+    warnings.simplefilter("ignore")
+    seconds, messages, counters = globals()[f"run_{benchmark}"](size, url, start)
+    return {"seconds": seconds, "messages": messages, "counters": counters, "peak_rss_mb": get_peak_rss()}
+
+def compare(results, baseline, tolerance):
+    """
+    get the benchmarks slower than the baseline by more than tolerance
+
+        Arguments:
+            :results (list[dict]): results of this run
+            :baseline (list[dict]): results of a previous run
+            :tolerance (float): fraction of throughput that can be lost
+        Returns:
+            list of messages about the regressions
+    """
+    previous = {(result["benchmark"], result["size"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        key = (result["benchmark"], result["size"])
+        if key in previous and result["messages_per_second"] < previous[key]["messages_per_second"] * (1 - tolerance):
+            regressions.append(f'{key[0]} {key[1]}: {result["messages_per_second"]:.0f} msg/s, baseline {previous[key]["messages_per_second"]:.0f} msg/s')
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="numbers of messages, up to 10000000")
+    parser.add_argument("--benchmarks", nargs="+", default=benchmarks, choices=benchmarks)
+    parser.add_argument("--latency", type=float, default=0, help="seconds waited by the server before each response")
+    parser.add_argument("--rate-limited", type=float, default=0, help="fraction of the responses 429")
+    parser.add_argument("--gateway-timeout", type=float, default=0, help="fraction of the responses 504")
+    parser.add_argument("--output", default="results.json")
+    parser.add_argument("--baseline", help="results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="fraction of throughput that can be lost against the baseline")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        server = Server(messages=size, latency=args.latency, rate_limited=args.rate_limited, gateway_timeout=args.gateway_timeout).start()
+        for benchmark in args.benchmarks:
+            server.requests.clear()
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                result = executor.submit(run, benchmark, size, server.url, server.oldest_date).result()
+            result.update({
+                "benchmark": benchmark,
+                "size": size,
+                "messages_per_second": result["messages"] / result["seconds"] if result["seconds"] > 0 else 0,
+                "requests": {str(status): count for status, count in sorted(server.requests.items())}
+            })
+            results.append(result)
+            print(f'{benchmark:<13} {size:>9} messages  {result["seconds"]:9.3f} s  {result["messages_per_second"]:12.0f} msg/s  {result["peak_rss_mb"]:8.1f} MB  requests {result["requests"]}')
+        server.stop()
+
+    with open(args.output, "w") as fh:
+        json.dump({"python": platform.python_version(), "platform": platform.platform(), "tolerance": args.tolerance, "results": results}, fh, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,220 @@
+"""The class for collecting twits of Stocktwits with asyncio
+
+    The asyncio counterpart of the Collector: each page of all symbols and users is downloaded at the same time
+
+        Example:
+            import asyncio
+            from stocktwits_collector.async_collector import AsyncCollector
+            ac = AsyncCollector(max_concurrency=20)
+            messages = asyncio.run(ac.get_history({'symbols': ['TSLA', 'AAPL'], 'start': '2022-04-04T00:00:00Z'}))
+"""
+import asyncio
+import threading
+from stocktwits_collector.collector import Collector, logger
+import stocktwits_collector.async_streamer as s
+
+class AsyncCollector(Collector):
+    def __init__(self, pool_size = None, timeout = 30, max_concurrency = 10, rate_limit = 200, rate_period = 3600, retries = 5, cache = None, metrics = None):
+        """
+        the core of API is the class AsyncStreamer
+
+            Arguments:
+                :pool_size (int): number of connections kept alive by the streamer, at least max_concurrency, default max_concurrency
+                :timeout (float or tuple): seconds to wait for each request, or a (connect, read) tuple, default 30
+                :max_concurrency (int): max number of requests running at once, default 10
+                :rate_limit (int): number of requests allowed per rate_period by the API quota, default 200, None for no limit
+                :rate_period (float): seconds of the API quota period, default 3600
+                :retries (int): number of retries of each request failed, default 5
+                :cache (Cache): optional, the cache of the responses on disk
+                :metrics (Metrics): optional, the metrics shared with the streamer, default new metrics
+        """
+        self.max_concurrency = max_concurrency
+        super().__init__(pool_size, timeout, rate_limit, rate_period, retries, cache, metrics)
+
+    def get_streamer(self, pool_size, timeout, limiter, retries, cache):
+        """
+        get the AsyncStreamer of the requests, with the metrics of the collector and up to max_concurrency requests at once
+
+            Arguments:
+                :pool_size (int): number of connections kept alive by the streamer, None for max_concurrency
+                :timeout (float or tuple): seconds to wait for each request, or a (connect, read) tuple
+                :limiter (RateLimiter): the rate limiter shared by the requests, None for no limit
+                :retries (int): number of retries of each request failed
+                :cache (Cache): the cache of the responses on disk, None for no cache
+            Returns:
+                an AsyncStreamer
+        """
+        return s.AsyncStreamer(pool_size, timeout, self.max_concurrency, limiter=limiter, retries=retries, cache=cache, metrics=self.metrics)
+
+    async def get_data(self, event):
+        """
+        get data from Stocktwits, default last 30 messages, requesting all users and symbols at the same time
+
+            Arguments:
+                :event (dict): dictionary fully described in Collector.save_history()
+            Returns:
+                list of messages, the same of Collector.get_data()
+        """
+        messages = []
+        event = self.set_paging(event)
+        requests = []
+
+        if "users" in event:
+            for user in event["users"]:
+                requests.append(self.ts.get_user_msgs(user_id=user, since=event["min"], max=event["max"], limit=event["limit"], callback=None, filter=None))
+
+        if "symbols" in event:
+            for symbol in event["symbols"]:
+                requests.append(self.ts.get_symbol_msgs(symbol_id=symbol, since=event["min"], max=event["max"], limit=event["limit"], callback=None, filter=None))
+
+        # the responses keep the order of the requests, so clean_data returns the same of Collector.get_data()
+        for response in await asyncio.gather(*requests):
+            messages.extend(response["messages"])
+
+        self.count("pages_fetched")
+        with self.timer("clean"):
+            messages = self.project_data(self.clean_data(messages, event), event)
+        self.increment("stocktwits_pages_total")
+        self.increment("stocktwits_messages_total", len(messages))
+        return messages
+
+    async def walk(self, event, cursor, history):
+        """
+        walk along the messages like a shrimp, see Collector.walk()
+        """
+        event["max"] = cursor["min"]
+        messages = [message for message in await self.get_data(event) if message["id"] < cursor["min"]]
+        cursor = self.get_cursor(messages)
+        chunk = event["chunk"] if "chunk" in event else "day"
+
+        if not self.is_same_chunk(cursor["oldest_date"], cursor["earliest_date"], chunk):
+            length = len(messages)
+            with self.timer("clean"):
+                messages = self.clean_history(cursor, messages, chunk)
+            self.increment("stocktwits_discarded_total", length - len(messages))
+            cursor = self.get_cursor(messages)
+        history.extend(messages)
+
+        return cursor, history
+
+    async def seek(self, event, date, max_probes = 32):
+        """
+        find the message ID at a datetime by a few probe pages, see Collector.seek()
+        """
+        bounds = None
+        for index in range(max_probes):
+            probe = self.get_seek_probe(bounds, date)
+            messages = await self.get_data(self.update_event("max", probe, event))
+            self.increment("stocktwits_seek_probes_total")
+            bounds, found = self.update_seek(bounds, messages, probe, date)
+            if found is not None:
+                return found
+        return bounds["high"]["id"]
+
+    async def set_window(self, event):
+        """
+        set the max ID of event at its end, see Collector.set_window()
+        """
+        if "end" in event and ("max" not in event or not event["max"]) and self.load_checkpoint(event) is None:
+            event["max"] = self.get_window_max(await self.seek(event, event["end"]))
+        return event
+
+    async def iter_pages(self, event):
+        """
+        iterate the pages of messages from Stocktwits, walking to the next page only when it is requested, see Collector.iter_pages()
+        """
+        event = await self.set_window(event)
+        messages = await self.get_data(event)
+        yield messages
+
+        if "start" in event:
+            cursor = self.get_cursor(messages)
+            while self.is_younger(event["start"], cursor["oldest_date"]) and not event["start"] == cursor["oldest_date"]:
+                self.log(event, "method get_history, start: {start}, cursor: {cursor}", start=event["start"], cursor=cursor["oldest_date"])
+                cursor, messages = await self.walk(event, cursor, [])
+                yield messages
+
+    async def iter_messages(self, event):
+        """
+        iterate the messages from Stocktwits one by one, so they can be consumed in constant memory, see Collector.iter_messages()
+        """
+        async for messages in self.iter_pages(event):
+            for message in messages:
+                yield message
+
+    async def get_history(self, event):
+        """
+        get history from Stocktwist, default last 30 messages, see Collector.get_history()
+        """
+        history = []
+        async for messages in self.iter_pages(event):
+            history.extend(messages)
+
+        return history
+
+    async def save_history(self, event):
+        """
+        save history from Stocktwist on files splitted by chunk per day, week or month, see Collector.save_history()
+        """
+        event = await self.set_window(self.set_chunking(event))
+        self.reset_counters()
+        router = self.get_router(event)
+
+        try:
+            while not router["is_reached"]:
+                self.route_messages(router, await self.get_data(router["page"]), event)
+        finally:
+            next_chunk = self.close_router(router, event)
+
+        return next_chunk
+
+    def tail(self, event, callback):
+        """
+        the streams are followed by Collector.tail(), that polls one stream at a time
+        """
+        raise NotImplementedError('AsyncCollector does not follow the streams, use Collector().tail()')
+
+    async def work(self, queue, worker = None, max_tasks = None, poll = None):
+        """
+        lease the tasks of a queue one by one and save their chunks by save_history(), see Collector.work()
+        """
+        worker = queue.get_worker() if worker is None else worker
+        completed = 0
+        while max_tasks is None or completed < max_tasks:
+            task = queue.lease(worker)
+            if task is None:
+                if poll is not None and queue.get_counts()["leased"] > 0:
+                    await asyncio.sleep(poll)
+                    continue
+                break
+            stop = threading.Event()
+            self.lease_lost = threading.Event()
+            heartbeat = threading.Thread(target=self.renew_lease, args=(queue, task, stop, self.lease_lost), daemon=True)
+            heartbeat.start()
+            next_chunk = None
+            try:
+                next_chunk = await self.save_history(dict(task["event"]))
+            except Exception as error:
+                if not self.lease_lost.is_set():
+                    logger.warning(f"method work, task {task['key']} failed: {error}", extra={"stocktwits": {"task": task["key"], "error": str(error)}})
+                    self.increment("stocktwits_tasks_total", status="failed")
+                    queue.fail(task, error)
+                    continue
+            finally:
+                stop.set()
+                heartbeat.join()
+                lost = self.lease_lost.is_set()
+                self.lease_lost = None
+            if not lost and queue.complete(task, {"counters": self.counters, "next_chunk": next_chunk}):
+                completed += 1
+                self.increment("stocktwits_tasks_total", status="done")
+            else:
+                logger.warning(f"method work, task {task['key']} lease lost", extra={"stocktwits": {"task": task["key"]}})
+                self.increment("stocktwits_tasks_total", status="lost")
+        return completed
+
+    def close(self):
+        """
+        close the pool of threads and the connections of the streamer
+        """
+        self.ts.close()
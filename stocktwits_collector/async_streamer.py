@@ -0,0 +1,68 @@
+"""The class for getting twits from Stocktwits with asyncio
+
+    A collection of coroutines to download many streams at the same time
+
+    Each request is run by the Streamer on a pool of threads,
+    so the requests share its session and the number of requests running at once is limited by the pool
+"""
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import stocktwits_collector.streamer as s
+
+class AsyncStreamer():
+
+    def __init__(self, pool_size = None, timeout = 30, max_concurrency = 10, streamer = None, limiter = None, retries = 5, cache = None, metrics = None):
+        """
+        the coroutines wrap the methods of the Streamer
+
+            Arguments:
+                :pool_size (int): number of connections kept alive by the streamer, at least max_concurrency, default max_concurrency
+                :timeout (float or tuple): seconds to wait for each request, or a (connect, read) tuple, default 30
+                :max_concurrency (int): max number of requests running at once, default 10
+                :streamer (Streamer): optional, the streamer to wrap, default a new Streamer
+                :limiter (RateLimiter): optional, the rate limiter shared by the requests of a new Streamer
+                :retries (int): number of retries of each request failed of a new Streamer, default 5
+                :cache (Cache): optional, the cache of the responses on disk of a new Streamer
+                :metrics (Metrics): optional, the metrics of the requests of a new Streamer
+        """
+        if pool_size is None:
+            pool_size = max_concurrency
+        if streamer is None and pool_size < max_concurrency:
+            # the connections over the pool size would be opened and discarded at each burst of requests
+            raise Exception(f'The pool_size {pool_size} must be at least max_concurrency {max_concurrency}')
+        self.streamer = s.Streamer(pool_size, timeout, limiter=limiter, retries=retries, cache=cache, metrics=metrics) if streamer is None else streamer
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def run(self, method, **kwargs):
+        """
+        run a method of the streamer on the pool of threads
+
+            Arguments:
+                :method (callable): method of the streamer
+                :kwargs (dict): arguments of the method
+            Returns:
+                the result of the method
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(method, **kwargs))
+
+    async def get_user_msgs(self, user_id, since=0, max=0, limit=0, callback=None, filter=None):
+        """
+        returns the most recent messages for the specified user, see Streamer.get_user_msgs()
+        """
+        return await self.run(self.streamer.get_user_msgs, user_id=user_id, since=since, max=max, limit=limit, callback=callback, filter=filter)
+
+    async def get_symbol_msgs(self, symbol_id, since=0, max=0, limit=0, callback=None, filter=None):
+        """
+        returns the most recent messages for the specified symbol, see Streamer.get_symbol_msgs()
+        """
+        return await self.run(self.streamer.get_symbol_msgs, symbol_id=symbol_id, since=since, max=max, limit=limit, callback=callback, filter=filter)
+
+    def close(self):
+        """
+        close the pool of threads and the connections of the streamer
+        """
+        self.executor.shutdown(wait=False)
+        if hasattr(self.streamer, "close"):
+            self.streamer.close()
@@ -0,0 +1,173 @@
+"""The class for caching the responses of Stocktwits on disk
+
+    A page with a max ID is a closed window of the stream: its messages cannot change,
+    so the Streamer can read it from the disk instead of requesting it again
+
+        Example:
+            from stocktwits_collector.cache import Cache
+            from stocktwits_collector.streamer import Streamer
+            st = Streamer(cache=Cache('.cache', max_size=1024 ** 3, max_age=30 * 86400))
+"""
+import os
+import gzip
+import time
+import hashlib
+import stocktwits_collector.codec as c
+
+class Cache():
+
+    def __init__(self, path, max_size = None, max_age = None, offline = False, codec = None, scan_interval = 1000):
+        """
+        the responses are saved compressed, one file per request
+
+            Arguments:
+                :path (str): folder of the cache files
+                :max_size (int): optional, max bytes of the cache files, the oldest ones are deleted first
+                :max_age (float): optional, max seconds of a cache file before it is deleted
+                :offline (bool): optional, if True, the requests are never sent and a missing page raises an exception
+                :codec (Codec): optional, the codec of the files, default the fastest JSON library installed
+                :scan_interval (int): optional, number of files saved between two scans of the folder, default 1000:
+                    the size is kept by each set, so the folder is scanned only when it is over max_size,
+                    to delete the files older than max_age and to count the files saved by other processes
+        """
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.offline = offline
+        self.codec = c.Codec() if codec is None else codec
+        self.scan_interval = scan_interval
+        # bytes of the cache files, None until the first scan
+        self.size = None
+        self.writes = 0
+        os.makedirs(path, exist_ok=True)
+
+    def get_key(self, endpoint, id, since, max, limit):
+        """
+        get the key of a request
+
+            Arguments:
+                :endpoint (str): user or symbol
+                :id (str): name of the user or symbol
+                :since (int): min ID of the request
+                :max (int): max ID of the request
+                :limit (int): number of messages of the request
+            Returns:
+                the key as string
+        """
+        request = f"{endpoint}/{id}?since={since}&max={max}&limit={limit}"
+        return hashlib.sha1(request.encode()).hexdigest()
+
+    def is_cacheable(self, since, max):
+        """
+        check if the response of a request can change
+
+            Arguments:
+                :since (int): min ID of the request
+                :max (int): max ID of the request
+            Returns:
+                a boolean, True if the request has a max ID, so its window is closed
+        """
+        return int(max) > 0
+
+    def get_file_name(self, key):
+        return os.path.join(self.path, f"{key}.json.gz")
+
+    def get(self, key):
+        """
+        get the response of a request
+
+            Arguments:
+                :key (str): key of the request
+            Returns:
+                the response as dictionary, None if it is not in the cache or it is expired
+        """
+        filename = self.get_file_name(key)
+        try:
+            if self.max_age is not None and time.time() - os.path.getmtime(filename) > self.max_age:
+                self.remove(filename)
+                return None
+            with gzip.open(filename, "rb") as fh:
+                response = self.codec.loads(fh.read())
+        except (OSError, ValueError):
+            return None
+        os.utime(filename)
+        return response
+
+    def set(self, key, response):
+        """
+        save the response of a request and evict the oldest files if the cache is too big
+
+            Arguments:
+                :key (str): key of the request
+                :response (dict): response of the request
+        """
+        filename = self.get_file_name(key)
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        with gzip.open(temporary, "wb") as fh:
+            fh.write(self.codec.dumps_bytes(response))
+        if self.size is not None:
+            try:
+                self.size -= os.path.getsize(filename)
+            except OSError:
+                pass
+            self.size += os.path.getsize(temporary)
+        os.replace(temporary, filename)
+        self.writes += 1
+        if self.max_size is None and self.max_age is None:
+            return
+        if self.size is None or self.writes >= self.scan_interval or (self.max_size is not None and self.size > self.max_size):
+            self.evict()
+
+    def remove(self, filename):
+        """
+        delete a cache file and subtract its bytes from the size
+
+            Arguments:
+                :filename (str): name of the file
+        """
+        try:
+            file_size = os.path.getsize(filename)
+            os.remove(filename)
+        except OSError:
+            return
+        if self.size is not None:
+            self.size -= file_size
+
+    def evict(self):
+        """
+        scan the folder, delete the files older than max_age and the least recently used files over max_size
+        """
+        files = []
+        for name in os.listdir(self.path):
+            if name.endswith(".json.gz"):
+                filename = os.path.join(self.path, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, filename))
+        files.sort()
+        size = sum([file[1] for file in files])
+        now = time.time()
+        for mtime, file_size, filename in files:
+            is_expired = self.max_age is not None and now - mtime > self.max_age
+            is_over = self.max_size is not None and size > self.max_size
+            if not is_expired and not is_over:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            size -= file_size
+        self.size = size
+        self.writes = 0
+
+    def clear(self):
+        """
+        delete all the files of the cache
+        """
+        for name in os.listdir(self.path):
+            if name.endswith(".json.gz"):
+                os.remove(os.path.join(self.path, name))
+        self.size = 0
+        self.writes = 0
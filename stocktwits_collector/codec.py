@@ -0,0 +1,90 @@
+"""The class for decoding and encoding the JSON of Stocktwits
+
+    The codec uses the fastest library installed among orjson, msgspec and the standard json,
+    so the responses of the Streamer and the chunk files of the Writer are handled with the same one
+
+        Example:
+            from stocktwits_collector.codec import Codec
+            codec = Codec()
+            print(codec.library)
+            page = codec.loads(b'{"messages": [{"id": 1, "created_at": "2022-04-04T00:00:00Z"}]}')
+"""
+import json
+import stocktwits_collector.message as m
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+class Codec():
+    libraries = {"orjson": orjson, "msgspec": msgspec, "json": json}
+
+    def __init__(self, library = None):
+        """
+        the library is chosen once, when the codec is created
+
+            Arguments:
+                :library (str): optional, orjson, msgspec or json, default the first one installed
+        """
+        if library is None:
+            library = [name for name, module in self.libraries.items() if module is not None][0]
+        if library not in self.libraries:
+            raise Exception(f'The library {library} is not supported, use one of {", ".join(self.libraries)}')
+        if self.libraries[library] is None:
+            raise Exception(f'The library {library} is not installed')
+        self.library = library
+        if msgspec is not None:
+            self.decoder = msgspec.json.Decoder()
+            self.encoder = msgspec.json.Encoder(enc_hook=m.Message.to_dict)
+
+    def loads(self, data):
+        """
+        decode a JSON document
+
+            Arguments:
+                :data (bytes or str): the JSON document
+            Returns:
+                the value decoded, like json.loads(), a ValueError is raised when data is not valid
+        """
+        if self.library == "orjson":
+            return orjson.loads(data)
+        if self.library == "msgspec":
+            try:
+                return self.decoder.decode(data)
+            except msgspec.DecodeError as error:
+                raise ValueError(str(error))
+        return json.loads(data)
+
+    def dumps(self, value):
+        """
+        encode a value as JSON, the Message records are encoded like the messages of the API
+
+            Arguments:
+                :value (mix): the value to encode
+            Returns:
+                the JSON document as string
+        """
+        if self.library == "json":
+            return json.dumps(value, default=m.Message.to_dict)
+        return self.dumps_bytes(value).decode()
+
+    def dumps_bytes(self, value):
+        """
+        encode a value as JSON for a binary file, without decoding the bytes of orjson and msgspec
+
+            Arguments:
+                :value (mix): the value to encode
+            Returns:
+                the JSON document as bytes
+        """
+        if self.library == "orjson":
+            return orjson.dumps(value, default=m.Message.to_dict)
+        if self.library == "msgspec":
+            return self.encoder.encode(value)
+        return json.dumps(value, default=m.Message.to_dict).encode()
@@ -2,46 +2,138 @@
 
     A collection of methods to simplify your downloading
 """
-import sys
+import os
+import logging
 import warnings
-from contextlib import contextmanager
-from io import StringIO
+from contextlib import nullcontext
 import json
 import time
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import stocktwits_collector.streamer as s
+import stocktwits_collector.limiter as l
+import stocktwits_collector.message as m
+import stocktwits_collector.writer as w
+import stocktwits_collector.database as d
+import stocktwits_collector.metrics as mt
 # import stockTwitFetchAPI.stocktwitapi as st
 
+logger = logging.getLogger(__name__)
+
 class Collector():
     ts = None
-    def __init__(self):
+    counters = None
+    counters_lock = threading.Lock()
+    metrics = None
+    lease_lost = None
+    checkpoint_keys = ["symbols", "users", "only_combo", "start", "end", "chunk", "filename_prefix", "filename_suffix", "format", "fields", "compact"]
+    def __init__(self, pool_size = 10, timeout = 30, rate_limit = 200, rate_period = 3600, retries = 5, cache = None, metrics = None):
         """
         the core of API is the package stockTwitFetchAPI with the class twitStreamer
+
+            Arguments:
+                :pool_size (int): number of connections kept alive by the streamer, default 10
+                :timeout (float or tuple): seconds to wait for each request, or a (connect, read) tuple, default 30
+                :rate_limit (int): number of requests allowed per rate_period by the API quota, default 200, None for no limit
+                :rate_period (float): seconds of the API quota period, default 3600
+                :retries (int): number of retries of each request failed, default 5
+                :cache (Cache): optional, the cache of the responses on disk
+                :metrics (Metrics): optional, the metrics shared with the streamer, default new metrics
         """
         #self.ts = st.twitStreamer()
-        self.ts = s.Streamer()
+        self.metrics = mt.Metrics() if metrics is None else metrics
+        self.ts = self.get_streamer(pool_size, timeout, self.get_limiter(rate_limit, rate_period), retries, cache)
+        self.reset_counters()
 
-    @contextmanager
-    def hold_output(self):
+    def get_streamer(self, pool_size, timeout, limiter, retries, cache):
         """
-        hold output
+        get the streamer of the requests, with the metrics of the collector
 
-        This method is temporary until PR approval:
-        https://github.com/p-hiroshige/stockTwitsAPI/pull/1
+            Arguments:
+                :pool_size (int): number of connections kept alive by the streamer
+                :timeout (float or tuple): seconds to wait for each request, or a (connect, read) tuple
+                :limiter (RateLimiter): the rate limiter shared by the requests, None for no limit
+                :retries (int): number of retries of each request failed
+                :cache (Cache): the cache of the responses on disk, None for no cache
+            Returns:
+                a Streamer
+        """
+        return s.Streamer(pool_size, timeout, limiter=limiter, retries=retries, cache=cache, metrics=self.metrics)
 
-            Example:
-                with hold_output() as (out, err):
-                    method_with_a_print()
-                captured_output = out.getvalue().strip()
+    def reset_counters(self):
+        """
+        reset the counters of the pages: pages_fetched are the pages downloaded, pages_used the ones with messages saved,
+        chunks_skipped the chunks already complete in the manifest and duplicates the messages already saved by a previous run
+        """
+        self.counters = {"pages_fetched": 0, "pages_used": 0, "chunks_skipped": 0, "duplicates": 0}
 
+    def count(self, name, value = 1):
         """
-        new_out, new_err = StringIO(), StringIO()
-        old_out, old_err = sys.stdout, sys.stderr
-        try:
-            sys.stdout, sys.stderr = new_out, new_err
-            yield sys.stdout, sys.stderr
-        finally:
-            sys.stdout, sys.stderr = old_out, old_err
+        add a value to a counter of the pages, under a lock because the workers of save_history count at the same time
+
+            Arguments:
+                :name (str): pages_fetched, pages_used, chunks_skipped or duplicates
+                :value (int): optional, default 1
+        """
+        if self.counters is not None:
+            with self.counters_lock:
+                self.counters[name] += value
+
+    def get_limiter(self, rate_limit, rate_period):
+        """
+        get the rate limiter shared by the requests
+
+            Arguments:
+                :rate_limit (int): number of requests allowed per rate_period, None for no limit
+                :rate_period (float): seconds of the period
+            Returns:
+                a RateLimiter or None
+        """
+        if rate_limit is None:
+            return None
+        return l.RateLimiter(rate_limit, rate_period)
+
+    def increment(self, name, value = 1, **labels):
+        """
+        add a value to a counter of the metrics, when the collector has them
+
+            Arguments:
+                :name (str): name of the counter
+                :value (float): optional, default 1
+                :labels (dict): optional, labels of the counter
+        """
+        if self.metrics is not None:
+            self.metrics.increment(name, value, **labels)
+
+    def timer(self, phase):
+        """
+        measure the seconds spent in a block for a phase of the metrics, when the collector has them
+
+            Arguments:
+                :phase (str): fetch, parse, clean or write
+            Returns:
+                a context manager
+        """
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.timer(phase)
+
+    def log(self, event, message, **fields):
+        """
+        log a step of a method, with its fields in the attribute stocktwits of the record
+
+        The step is logged at level INFO when event has is_verbose True, else at level DEBUG
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+                :message (str): message with the fields in braces, like "start: {start}"
+                :fields (dict): values of the fields
+        """
+        level = logging.INFO if "is_verbose" in event and event["is_verbose"] is True else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, message.format(**fields), extra={"stocktwits": fields})
 
     def there_is_symbol(self, symbols_fetched, symbols_target):
         """
@@ -78,23 +170,75 @@ class Collector():
                 messages = list({ message["id"] : message for message in messages if self.there_is_symbol(message["symbols"], event["symbols"]) and message["user"]["username"] in event["users"] }.values())
         return messages
 
-    def get_data(self, event, count = 0):
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def get_projection(fields):
         """
-        get data from Stocktwits, default last 30 messages
+        get the tree of the fields to keep, computed once for each tuple of fields
+
+            Arguments:
+                :fields (tuple of str): dotted paths of the fields, like user.username or symbols.symbol
+            Returns:
+                dictionary with a key for each field, its value is the tree of the sub fields or None for the whole value
+        """
+        projection = {}
+        for field in ("id", "created_at") + fields:
+            tree = projection
+            keys = field.split(".")
+            for key in keys[:-1]:
+                if key in tree and tree[key] is None:
+                    break
+                tree = tree.setdefault(key, {})
+            else:
+                tree[keys[-1]] = None
+        return projection
+
+    def project(self, value, projection):
+        """
+        keep only the fields of projection, the lists are projected item by item
+
+            Arguments:
+                :value (mix): message, or a part of it
+                :projection (dict): the tree returned by get_projection()
+            Returns:
+                the value with only the fields of projection
+        """
+        if projection is None:
+            return value
+        if isinstance(value, list):
+            return [self.project(item, projection) for item in value]
+        if isinstance(value, dict):
+            return {key: self.project(value[key], tree) for key, tree in projection.items() if key in value}
+        return value
+
+    def project_data(self, messages, event):
+        """
+        keep only the fields of event of each message
 
             Arguments:
+                :messages (list of dict): list of messages
                 :event (dict): dictionary fully described in save_history()
-                    symbols (list of str): names of symbols to fetch
-                    users (list of str): names of users to fetch
-                    min (int): optional, min ID
-                    max (int): optional, max ID
-                    limit (int): optional, defalt 30 messages
-                :count (int): counter to manage a request exception, probably for Gateway Timeout (504)
+                    fields (list of str): optional, dotted paths of the fields to keep, id and created_at are always kept
+                    compact (bool): optional, if True, each message is a Message record
             Returns:
-                list of messages
+                list of messages projected
         """
-        messages = []
+        if "fields" in event and event["fields"]:
+            projection = self.get_projection(tuple(event["fields"]))
+            messages = [self.project(message, projection) for message in messages]
+        if "compact" in event and event["compact"] is True:
+            messages = [m.Message.from_dict(message) for message in messages]
+        return messages
+
+    def set_paging(self, event):
+        """
+        set the default values of the paging keys of event
 
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                the same event with min, max and limit
+        """
         if "min" not in event:
             event["min"] = 0
 
@@ -104,6 +248,27 @@ class Collector():
         if "limit" not in event:
             event["limit"] = 30
 
+        return event
+
+    def get_data(self, event):
+        """
+        get data from Stocktwits, default last 30 messages
+
+        Each request is retried by the streamer when it fails, so the messages already downloaded are kept
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+                    symbols (list of str): names of symbols to fetch
+                    users (list of str): names of users to fetch
+                    min (int): optional, min ID
+                    max (int): optional, max ID, included
+                    limit (int): optional, defalt 30 messages
+            Returns:
+                list of messages
+        """
+        messages = []
+        event = self.set_paging(event)
+
         if "users" in event:
             for user in event["users"]:
                 response = self.ts.get_user_msgs(user_id=user, since=event["min"], max=event["max"], limit=event["limit"], callback=None, filter=None)
@@ -111,19 +276,48 @@ class Collector():
 
         if "symbols" in event:
             for symbol in event["symbols"]:
-                with self.hold_output() as (out, err):
-                    try:
-                        response = self.ts.get_symbol_msgs(symbol_id=symbol, since=event["min"], max=event["max"], limit=event["limit"], callback=None, filter=None)
-                    except Exception as error:
-                        count = count + 1
-                        if count == 1:
-                            time.sleep(60)
-                            return self.get_data(event, 1)
-                        else:
-                            raise Exception(error)
-                    messages.extend(response["messages"])
-
-        return self.clean_data(messages, event)
+                response = self.ts.get_symbol_msgs(symbol_id=symbol, since=event["min"], max=event["max"], limit=event["limit"], callback=None, filter=None)
+                messages.extend(response["messages"])
+
+        self.count("pages_fetched")
+        with self.timer("clean"):
+            messages = self.project_data(self.clean_data(messages, event), event)
+        self.increment("stocktwits_pages_total")
+        self.increment("stocktwits_messages_total", len(messages))
+        return messages
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def get_datetime(date):
+        """
+        get the datetime of a date, the last 65536 dates parsed are cached
+
+            Argument:
+                :date (str): datetime with format %Y-%m-%dT%H:%M:%SZ
+            Returns:
+                a datetime
+        """
+        return datetime(int(date[0:4]), int(date[5:7]), int(date[8:10]), int(date[11:13]), int(date[14:16]), int(date[17:19]))
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def get_chunk_key(date, chunk = "day"):
+        """
+        get the key of the chunk of a date, the last 65536 keys computed are cached
+
+            Argument:
+                :date (str): datetime with format %Y-%m-%dT%H:%M:%SZ
+                :chunk (str): day, week or month, default day
+            Returns:
+                the key as string: two dates of the same chunk have the same key
+        """
+        if chunk == "day":
+            return date[0:10]
+        if chunk == "week":
+            return Collector.get_datetime(date).strftime("%W")
+        if chunk == "month":
+            return date[0:7]
+        return None
 
     def is_younger(self, first_date, second_date):
         """
@@ -135,12 +329,7 @@ class Collector():
             Returns:
                 a boolean, True if first date is younger than second one
         """
-        first = datetime.strptime(first_date, "%Y-%m-%dT%H:%M:%SZ")
-        second = datetime.strptime(second_date, "%Y-%m-%dT%H:%M:%SZ")
-
-        if first <= second:
-            return True
-        return False
+        return self.get_datetime(first_date) <= self.get_datetime(second_date)
 
     def is_same_chunk(self, first_date, second_date, chunk = "day"):
         """
@@ -153,18 +342,30 @@ class Collector():
             Returns:
                 a boolean, True if the dates are of the same chunk
         """
-        first = datetime.strptime(first_date, "%Y-%m-%dT%H:%M:%SZ")
-        second = datetime.strptime(second_date, "%Y-%m-%dT%H:%M:%SZ")
-        is_same = False
+        if chunk not in ["day", "week", "month"]:
+            return False
+        return self.get_chunk_key(first_date, chunk) == self.get_chunk_key(second_date, chunk)
 
-        if chunk == "day":
-            is_same = first.strftime("%Y-%m-%d") == second.strftime("%Y-%m-%d")
-        if chunk == "week":
-            is_same = first.strftime("%W") == second.strftime("%W")
-        if chunk == "month":
-            is_same = first.replace(day=1).strftime("%Y-%m-%d") == second.replace(day=1).strftime("%Y-%m-%d")
+    def find_chunk_border(self, history, date, chunk = "day", is_suffix = True):
+        """
+        find by binary search where the messages of the chunk of date start or end, in a history sorted from the most recent
 
-        return is_same
+            Arguments:
+                :history (list[dict]): list of messages sorted from the most recent
+                :date (str): datetime with format %Y-%m-%dT%H:%M:%SZ
+                :chunk (str): day, week or month, default day
+                :is_suffix (bool): True if the messages of the chunk are the last ones of history, False if they are the first ones
+            Returns:
+                the index of the first message of the chunk when is_suffix, else the index of the first message out of the chunk
+        """
+        low, high = 0, len(history)
+        while low < high:
+            middle = (low + high) // 2
+            if self.is_same_chunk(history[middle]["created_at"], date, chunk) == is_suffix:
+                high = middle
+            else:
+                low = middle + 1
+        return low
 
     def get_cursor(self, messages):
         """
@@ -191,27 +392,14 @@ class Collector():
                 :history (list[dict]): list of messages
                 :chunk (str): day, week or month, default day
             Returns:
-                history cleaned
+                history cleaned, it has to be sorted from the most recent message
         """
-        history_length = 0
-        same_oldest_date = 0
-        same_earliest_date = 0
-
-        for message in history:
-            history_length += 1
-            if self.is_same_chunk(message["created_at"], cursor["oldest_date"], chunk):
-                same_oldest_date += 1
-            if self.is_same_chunk(message["created_at"], cursor["earliest_date"], chunk):
-                same_earliest_date += 1
+        history_length = len(history)
+        same_oldest_date = history_length - self.find_chunk_border(history, cursor["oldest_date"], chunk)
+        same_earliest_date = self.find_chunk_border(history, cursor["earliest_date"], chunk, False)
 
         if history_length == (same_oldest_date + same_earliest_date):
-            current_chunk = cursor["oldest_date"]
-            indexes_to_delete = []
-            for index, message in enumerate(history):
-                if self.is_same_chunk(message["created_at"], current_chunk):
-                    indexes_to_delete.append(index)
-            for index in reversed(indexes_to_delete):
-                del history[index]
+            del history[self.find_chunk_border(history, cursor["oldest_date"]):]
         elif not history_length == same_oldest_date and not history_length == same_earliest_date:
             warnings.warn(f"method clean_history, messages amount: {history_length}, {same_oldest_date} messages of {cursor['oldest_date']} and {same_earliest_date} messages of {cursor['earliest_date']}")
 
@@ -229,45 +417,281 @@ class Collector():
                 cursor, history
         """
         event["max"] = cursor["min"]
-        messages = self.get_data(event)
+        # the page starts from the message of the cursor, already walked
+        messages = [message for message in self.get_data(event) if message["id"] < cursor["min"]]
         cursor = self.get_cursor(messages)
         chunk = event["chunk"] if "chunk" in event else "day"
 
         if not self.is_same_chunk(cursor["oldest_date"], cursor["earliest_date"], chunk):
-            messages = self.clean_history(cursor, messages, chunk)
+            length = len(messages)
+            with self.timer("clean"):
+                messages = self.clean_history(cursor, messages, chunk)
+            self.increment("stocktwits_discarded_total", length - len(messages))
             cursor = self.get_cursor(messages)
         history.extend(messages)
 
         return cursor, history
 
-    def get_history(self, event):
+    def iter_pages(self, event):
         """
-        get history from Stocktwist, default last 30 messages
+        iterate the pages of messages from Stocktwits, walking to the next page only when it is requested
 
             Arguments:
                 :event (dict): dictionary fully described in save_history()
                     start (datetime): optional, min datetime
-                    is_verbose (bool): optional, if True comments will be printed
+                    end (datetime): optional, datetime before which the messages are returned
+                    is_verbose (bool): optional, if True the steps are logged at level INFO
             Returns:
-                list of messages
+                a generator of lists of messages, the same pages of get_history()
         """
-        history = []
+        event = self.set_window(event)
         messages = self.get_data(event)
-        history.extend(messages)
+        yield messages
 
         if "start" in event:
             cursor = self.get_cursor(messages)
             while self.is_younger(event["start"], cursor["oldest_date"]) and not event["start"] == cursor["oldest_date"]:
-                if "is_verbose" in event and event["is_verbose"] is True:
-                    print(f"method get_history, start: {event['start']}, cursor: {cursor['oldest_date']}")
-                cursor, history = self.walk(event, cursor, history)
+                self.log(event, "method get_history, start: {start}, cursor: {cursor}", start=event["start"], cursor=cursor["oldest_date"])
+                cursor, messages = self.walk(event, cursor, [])
+                yield messages
         # elif "min" in event and event["min"] > 0:
         #     cursor = self.get_cursor(messages)
         #     while event["min"] < cursor["min"]:
-        #         cursor, history = self.walk(event, cursor, history)
+        #         cursor, messages = self.walk(event, cursor, [])
+        #         yield messages
+
+    def iter_messages(self, event):
+        """
+        iterate the messages from Stocktwits one by one, so they can be consumed in constant memory
+
+            Example:
+                for message in Collector().iter_messages({"symbols": ["TSLA"], "start": "2022-04-04T00:00:00Z"}):
+                    print(message["body"])
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                a generator of messages, the same messages of get_history()
+        """
+        for messages in self.iter_pages(event):
+            for message in messages:
+                yield message
+
+    def get_history(self, event):
+        """
+        get history from Stocktwist, default last 30 messages
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+                    start (datetime): optional, min datetime
+                    end (datetime): optional, datetime before which the messages are returned
+                    workers (int): optional, number of workers walking at the same time, default 1
+                    is_verbose (bool): optional, if True the steps are logged at level INFO
+            Returns:
+                list of messages
+        """
+        history = []
+
+        if "start" in event and "workers" in event and event["workers"] > 1:
+            messages = self.get_data(self.set_window(event))
+            history.extend(messages)
+            return self.get_parallel_history(event, self.get_cursor(messages), history)
+
+        for messages in self.iter_pages(event):
+            history.extend(messages)
 
         return history
 
+    def get_bounds(self, event, cursor):
+        """
+        split the message IDs between the cursor and start in one range per worker
+
+        The ID of the message published at start is estimated by the rate of the IDs of the cursor,
+        so the last range walks to start: it can be shorter or longer than the others, but nothing is lost
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+                :cursor (dict): dictionary with the keys oldest_date, min ID, earliest_date and max (ID)
+            Returns:
+                list of IDs, from the min ID of cursor to None, that is start
+        """
+        oldest = self.get_datetime(cursor["oldest_date"])
+        earliest = self.get_datetime(cursor["earliest_date"])
+        start = self.get_datetime(event["start"])
+        seconds = (earliest - oldest).total_seconds()
+        if seconds <= 0 or oldest <= start:
+            return [cursor["min"], None]
+        rate = (cursor["max"] - cursor["min"]) / seconds
+        lowest = max(0, cursor["min"] - rate * (oldest - start).total_seconds())
+        step = (cursor["min"] - lowest) / event["workers"]
+        if step < 1:
+            return [cursor["min"], None]
+        return [int(cursor["min"] - step * worker) for worker in range(event["workers"])] + [None]
+
+    def walk_range(self, event, cursor, bound):
+        """
+        walk along the messages like a shrimp, from the cursor to the bound ID or to start
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history(), used only by this walk
+                :cursor (dict): dictionary with the key min ID where the walk starts
+                :bound (int): min ID of the range, None for walking to start
+            Returns:
+                list of messages of the range and a boolean, True if the walk has reached start
+        """
+        history = []
+        while bound is None or cursor["min"] > bound:
+            if not self.is_younger(event["start"], cursor["oldest_date"]) or event["start"] == cursor["oldest_date"]:
+                return history, True
+            cursor, history = self.walk(event, cursor, history)
+        return [message for message in history if message["id"] >= bound], False
+
+    def get_parallel_history(self, event, cursor, history):
+        """
+        get history from Stocktwist walking the message IDs between the cursor and start with more workers at the same time
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+                :cursor (dict): dictionary with the keys oldest_date, min ID, earliest_date and max (ID) of the first page
+                :history (list[dict]): list of messages of the first page
+            Returns:
+                list of messages, ordered and unique like get_history()
+        """
+        bounds = self.get_bounds(event, cursor)
+        workers = len(bounds) - 1
+        events = [self.update_event("max", event["max"], event) for worker in range(workers)]
+        cursors = [cursor] + [{"min": bound, "oldest_date": cursor["oldest_date"]} for bound in bounds[1:-1]]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            ranges = list(executor.map(self.walk_range, events, cursors, bounds[1:]))
+        for worker, (messages, is_reached) in enumerate(ranges):
+            history.extend(messages)
+            event["max"] = events[worker]["max"]
+            if is_reached:
+                break
+        return list({ message["id"] : message for message in history }.values())
+
+    def get_seek_probe(self, bounds, date):
+        """
+        get the max ID of the next probe of seek()
+
+        While no message before date is known, the ID of date is extrapolated from the oldest message after date
+        by the rate of the IDs, doubling the distance at each probe, then it is interpolated between the two messages
+        around date, alternated with a bisection so that the range halves at least every two probes
+
+            Arguments:
+                :bounds (dict): the bounds returned by update_seek(), None before the first probe
+                :date (str): datetime with format %Y-%m-%dT%H:%M:%SZ
+            Returns:
+                the max ID of the page to request, 0 for the most recent page
+        """
+        if bounds is None:
+            return 0
+        high = bounds["high"]
+        low = bounds["low"]
+        if low is None:
+            seconds = (self.get_datetime(high["created_at"]) - self.get_datetime(date)).total_seconds()
+            target = high["id"] - seconds * bounds["rate"] * 2 ** bounds["misses"]
+            return max(1, int(target + bounds["span"] / 2))
+        if high["id"] - low["id"] <= bounds["span"]:
+            return high["id"]
+        if low["created_at"] is None or bounds["misses"] % 2 == 1:
+            return (low["id"] + high["id"]) // 2 + 1
+        oldest = self.get_datetime(low["created_at"])
+        fraction = (self.get_datetime(date) - oldest).total_seconds() / max(1, (self.get_datetime(high["created_at"]) - oldest).total_seconds())
+        target = low["id"] + (high["id"] - low["id"]) * fraction
+        return min(high["id"], max(low["id"] + 1, int(target + bounds["span"] / 2)))
+
+    def update_seek(self, bounds, messages, probe, date):
+        """
+        update the bounds of seek() with the page of a probe
+
+            Arguments:
+                :bounds (dict): the bounds returned by the previous call, None for the first probe
+                :messages (list[dict]): list of messages of the page with max ID probe
+                :probe (int): max ID of the page
+                :date (str): datetime with format %Y-%m-%dT%H:%M:%SZ
+            Returns:
+                the bounds, a dictionary with high, the oldest message known created at or after date,
+                low, the newest message known created before date, the rate and the span of the IDs of a page and the probes missed,
+                and the ID found, None when the seek has to go on
+        """
+        # the page of a probe has the messages up to the probe included, the probe is the ID excluded
+        messages = sorted([message for message in messages if probe <= 0 or message["id"] < probe], key=lambda message: message["id"], reverse=True)
+        if bounds is None:
+            if not messages or not self.is_younger(date, messages[0]["created_at"]):
+                return None, 0
+            bounds = {"high": messages[0], "low": None, "rate": 0, "span": 1, "misses": -1}
+            seconds = (self.get_datetime(messages[0]["created_at"]) - self.get_datetime(messages[-1]["created_at"])).total_seconds()
+            if seconds > 0:
+                bounds["span"] = messages[0]["id"] - messages[-1]["id"]
+                bounds["rate"] = bounds["span"] / seconds
+            else:
+                bounds["low"] = {"id": 0, "created_at": None}
+        newer = [message for message in messages if self.is_younger(date, message["created_at"])]
+        if newer and len(newer) < len(messages):
+            return bounds, newer[-1]["id"]
+        if newer:
+            bounds["high"] = newer[-1]
+        elif probe >= bounds["high"]["id"]:
+            return bounds, bounds["high"]["id"]
+        else:
+            if bounds["low"] is None:
+                bounds["misses"] = -1
+            bounds["low"] = messages[0] if messages else {"id": probe - 1, "created_at": None}
+        bounds["misses"] += 1
+        if bounds["low"] is not None and bounds["high"]["id"] - bounds["low"]["id"] <= 1:
+            return bounds, bounds["high"]["id"]
+        return bounds, None
+
+    def seek(self, event, date, max_probes = 32):
+        """
+        find the message ID at a datetime by a few probe pages, without walking the messages after it
+
+        The probes are counted by the metric stocktwits_seek_probes_total
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+                :date (str): datetime with format %Y-%m-%dT%H:%M:%SZ
+                :max_probes (int): optional, max number of pages requested, default 32
+            Returns:
+                the ID of the oldest message created at or after date, so the messages with a lower ID are older than date,
+                0 when all messages are older than date
+        """
+        bounds = None
+        for index in range(max_probes):
+            probe = self.get_seek_probe(bounds, date)
+            messages = self.get_data(self.update_event("max", probe, event))
+            self.increment("stocktwits_seek_probes_total")
+            bounds, found = self.update_seek(bounds, messages, probe, date)
+            if found is not None:
+                return found
+        return bounds["high"]["id"]
+
+    def set_window(self, event):
+        """
+        set the max ID of event at its end, when event has end and not max and it does not resume from a checkpoint
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                the same event with max, the ID before the first message created at or after end
+        """
+        if "end" in event and ("max" not in event or not event["max"]) and self.load_checkpoint(event) is None:
+            event["max"] = self.get_window_max(self.seek(event, event["end"]))
+        return event
+
+    @staticmethod
+    def get_window_max(found):
+        """
+        get the max ID of a window from the ID found by seek() at its end, the max ID is included by the API
+
+            Arguments:
+                :found (int): the ID returned by seek()
+            Returns:
+                the ID before found, 0 when found is 0
+        """
+        return found - 1 if found > 0 else 0
+
     def get_date(self, chunk = "day", date = None, jump_chunk = False):
         """
         get date at midnight about chunk
@@ -282,7 +706,7 @@ class Collector():
         if date is None:
             current = datetime.now()
         else:
-            current = datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ")
+            current = self.get_datetime(date)
         jump = 1
         start = current
         if chunk == "week":
@@ -302,6 +726,15 @@ class Collector():
                 start = start.replace(month=month, year=year)
         return start.strftime("%Y-%m-%dT00:00:00Z")
 
+    def get_now(self):
+        """
+        get the current datetime in UTC
+
+            Returns:
+                string of the current datetime with format %Y-%m-%dT%H:%M:%SZ, like the created_at of the messages
+        """
+        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
     def update_event(self, key, value, event):
         """
         update a specific key of event
@@ -354,11 +787,11 @@ class Collector():
             Returns:
                 the file name
         """
-        chunk = datetime.strptime(current_chunk["start"], "%Y-%m-%dT%H:%M:%SZ")
+        chunk = self.get_datetime(current_chunk["start"])
         next_chunk = self.get_temporary_event(history, current_chunk, event)
         cursor = self.get_cursor(history)
         if self.get_date(event["chunk"], next_chunk["start"]) == self.get_date(event["chunk"], cursor["earliest_date"]):
-            chunk = datetime.strptime(next_chunk["start"], "%Y-%m-%dT%H:%M:%SZ")
+            chunk = self.get_datetime(next_chunk["start"])
         return f'{event["filename_prefix"]}{chunk.strftime("%Y%m%d")}{event["filename_suffix"]}'
 
     def save_data(self, history, current_chunk, event):
@@ -379,62 +812,660 @@ class Collector():
             history = self.clean_history(cursor, history, event["chunk"])
             cursor = self.get_cursor(history)
             next_chunk["max"] = cursor["min"]
-        with open(filename, "w") as fh:
-            json.dump(history, fh)
+        self.get_writer(event).write(filename, history)
         return next_chunk
 
+    def set_chunking(self, event):
+        """
+        set the default values of the chunking keys of event
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                the same event with chunk, start, filename_prefix and filename_suffix
+        """
+        if "chunk" not in event:
+            event["chunk"] = "day"
+
+        if "start" not in event:
+            event["start"] = self.get_date(event["chunk"])
+
+        if "filename_prefix" not in event:
+            event["filename_prefix"] = "history."
+
+        if "filename_suffix" not in event:
+            event["filename_suffix"] = self.get_writer(event).suffix
+
+        return event
+
+    def get_writer(self, event):
+        """
+        get the writer of the chunk files
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                a Writer of the format of event, default json
+        """
+        return w.Writer(event["format"] if "format" in event else "json")
+
+    def save_checkpoint(self, history, next_chunk, event):
+        """
+        save the progress of save_history() on the checkpoint file of event, if there is
+
+            Arguments:
+                :history (list[dict]): list of messages of the chunk saved
+                :next_chunk (dict): the temporary chunk event returned by save_data()
+                :event (dict): dictionary fully described in save_history()
+        """
+        if "checkpoint" not in event:
+            return
+        checkpoint = {
+            "event": {key: event[key] for key in self.checkpoint_keys if key in event},
+            "cursor": self.get_cursor(history),
+            "chunk": next_chunk
+        }
+        temporary = f'{event["checkpoint"]}.tmp'
+        with open(temporary, "w") as fh:
+            json.dump(checkpoint, fh)
+        os.replace(temporary, event["checkpoint"])
+
+    def load_checkpoint(self, event):
+        """
+        load the progress of a previous save_history() from the checkpoint file of event
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                a dictionary with the keys event, cursor of the last chunk saved and the next chunk event,
+                or None when the event does not resume or the checkpoint file does not exist
+        """
+        if "checkpoint" not in event or "resume" not in event or event["resume"] is not True:
+            return None
+        if not os.path.isfile(event["checkpoint"]):
+            return None
+        with open(event["checkpoint"], "r") as fh:
+            checkpoint = json.load(fh)
+        for key in self.checkpoint_keys:
+            if checkpoint["event"].get(key) != event.get(key):
+                raise Exception(f'The checkpoint {event["checkpoint"]} has a different {key}: {checkpoint["event"].get(key)}')
+        return checkpoint
+
+    def load_manifest(self, event):
+        """
+        load the manifest of the chunk files of event, the index of what each file contains
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                a dictionary with the keys event and chunks, where chunks has an entry for each chunk start,
+                None when event has not a manifest file
+        """
+        if "manifest" not in event:
+            return None
+        keys = [key for key in self.checkpoint_keys if key not in ["start", "end"]]
+        if not os.path.isfile(event["manifest"]):
+            return {"event": {key: event[key] for key in keys if key in event}, "chunks": {}}
+        with open(event["manifest"], "r") as fh:
+            manifest = json.load(fh)
+        for key in keys:
+            if manifest["event"].get(key) != event.get(key):
+                raise Exception(f'The manifest {event["manifest"]} has a different {key}: {manifest["event"].get(key)}')
+        return manifest
+
+    def save_manifest(self, manifest, event):
+        """
+        save the manifest on the manifest file of event
+
+            Arguments:
+                :manifest (dict): the manifest returned by load_manifest()
+                :event (dict): dictionary fully described in save_history()
+        """
+        temporary = f'{event["manifest"]}.tmp'
+        with open(temporary, "w") as fh:
+            json.dump(manifest, fh, indent=1)
+        os.replace(temporary, event["manifest"])
+
+    def get_complete_chunk(self, router, start):
+        """
+        get the entry of the manifest of a chunk already saved with all its messages
+
+            Arguments:
+                :router (dict): the router returned by get_router()
+                :start (str): start of the chunk, with format %Y-%m-%dT00:00:00Z
+            Returns:
+                the entry of the chunk, None when the chunk is not complete or its file does not exist anymore
+        """
+        if router["manifest"] is None or start not in router["manifest"]["chunks"]:
+            return None
+        entry = router["manifest"]["chunks"][start]
+        if not entry["complete"] or not os.path.isfile(entry["file"]):
+            return None
+        return entry
+
+    def get_idset(self, event):
+        """
+        get the set of the IDs already saved
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                the IdSet of the dedup file of event, None when event has not a dedup file
+        """
+        if "dedup" not in event:
+            return None
+        # numpy is only needed by the dedup files
+        import stocktwits_collector.idset as i
+        return i.IdSet(event["dedup"])
+
+    def get_database(self, event):
+        """
+        get the database where the messages are saved besides the chunk files
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                the Database of the database file of event, None when event has not a database file
+        """
+        if "database" not in event:
+            return None
+        return d.Database(event["database"])
+
+    def get_router(self, event):
+        """
+        get the router of save_history(), that sends each message fetched to the file of its chunk
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                a dictionary with the event of the pages, the writer, the manifest, the ID set, the database, the chunk open with its messages,
+                the min ID routed, the date up to which the walk has no gaps, the next chunk event
+                and is_reached, True when the walk has reached start
+        """
+        router = {
+            "page": self.update_event("chunk", event["chunk"], event),
+            "writer": self.get_writer(event),
+            "manifest": self.load_manifest(event),
+            "dedup": self.get_idset(event),
+            "database": self.get_database(event),
+            "key": None,
+            "start": None,
+            "messages": [],
+            "min": None,
+            "top_date": None,
+            "next_chunk": None,
+            "is_reached": False
+        }
+        if "end" in event:
+            router["top_date"] = event["end"]
+        elif "max" not in event or not event["max"]:
+            router["top_date"] = self.get_now()
+        checkpoint = self.load_checkpoint(event)
+        if checkpoint is not None:
+            router["next_chunk"] = checkpoint["chunk"]
+            router["page"]["max"] = checkpoint["chunk"]["max"]
+            router["min"] = checkpoint["chunk"]["max"] + 1
+            router["top_date"] = checkpoint["cursor"]["oldest_date"]
+            router["is_reached"] = not self.is_younger(event["start"], checkpoint["chunk"]["start"])
+        return router
+
+    def flush_chunk(self, router, event, is_bottom = True):
+        """
+        save the messages of the chunk open on its file and database, and the progress on the checkpoint, manifest and dedup files
+
+        The chunk is complete when the walk has covered it from its end, or from the time of the first page, to its start
+
+            Arguments:
+                :router (dict): the router returned by get_router()
+                :event (dict): dictionary fully described in save_history()
+                :is_bottom (bool): optional, True if the walk has gone over the start of the chunk, default True
+        """
+        history = router["messages"]
+        if not history:
+            return
+        if self.lease_lost is not None and self.lease_lost.is_set():
+            raise Exception('The lease of the task is lost, the chunk is left to the worker that leased it again')
+        filename = f'{event["filename_prefix"]}{self.get_datetime(router["start"]).strftime("%Y%m%d")}{event["filename_suffix"]}'
+        if router["dedup"] is not None:
+            router["dedup"].update([message["id"] for message in history])
+            if os.path.isfile(filename):
+                # the messages saved by a previous run are kept, once each also when they were saved before the ID set
+                messages = {message["id"]: message for message in router["writer"].read(filename) + history}
+                history = sorted(messages.values(), key=lambda message: message["id"], reverse=True)
+        with self.timer("write"):
+            router["writer"].write(filename, history)
+            if router["database"] is not None:
+                router["database"].write(history)
+        self.increment("stocktwits_chunks_saved_total")
+        if router["dedup"] is not None:
+            router["dedup"].save()
+        router["next_chunk"] = self.update_event("start", self.get_date(event["chunk"], router["start"], True), event)
+        router["next_chunk"]["max"] = history[-1]["id"] - 1
+        self.save_checkpoint(history, router["next_chunk"], event)
+        if router["manifest"] is not None:
+            is_top = router["top_date"] is not None and not self.is_same_chunk(router["top_date"], router["start"], event["chunk"])
+            router["manifest"]["chunks"][router["start"]] = {
+                "file": filename,
+                "symbols": event["symbols"] if "symbols" in event else [],
+                "users": event["users"] if "users" in event else [],
+                "count": len(history),
+                "min": history[-1]["id"],
+                "max": history[0]["id"],
+                "oldest_date": history[-1]["created_at"],
+                "earliest_date": history[0]["created_at"],
+                "complete": is_top and is_bottom
+            }
+            self.save_manifest(router["manifest"], event)
+        self.log(event, "method save_history, start: {start}, cursor: {cursor}, next chunk: {next_chunk}", start=event["start"], cursor=history[-1]["created_at"], next_chunk=router["next_chunk"]["start"], file=filename, count=len(history))
+        router["messages"] = []
+        router["top_date"] = router["start"]
+
+    def skip_chunks(self, router, event):
+        """
+        skip the chunk open and the older ones, while they are complete in the manifest
+
+            Arguments:
+                :router (dict): the router returned by get_router()
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                a boolean, True if at least one chunk has been skipped
+        """
+        entry = self.get_complete_chunk(router, router["start"])
+        if entry is None or (router["min"] is not None and entry["max"] >= router["min"]):
+            return False
+        while entry is not None:
+            start = router["start"]
+            router["min"] = entry["min"]
+            router["next_chunk"] = self.update_event("start", self.get_date(event["chunk"], start, True), event)
+            router["next_chunk"]["max"] = entry["min"] - 1
+            self.count("chunks_skipped")
+            self.increment("stocktwits_chunks_skipped_total")
+            self.log(event, "method save_history, start: {start}, skipped chunk: {chunk}", start=event["start"], chunk=start)
+            router["start"] = router["next_chunk"]["start"]
+            if not self.is_younger(event["start"], router["start"]):
+                router["is_reached"] = True
+                break
+            entry = self.get_complete_chunk(router, router["start"])
+        router["key"] = None
+        router["top_date"] = start
+        return True
+
+    def close_router(self, router, event):
+        """
+        save the last chunk open and close the database of the router
+
+        When the walk has failed before reaching start, the last chunk is not saved,
+        so a resume goes on from the checkpoint of the last chunk complete
+
+            Arguments:
+                :router (dict): the router returned by get_router()
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                the next chunk event of the router
+        """
+        try:
+            if router["is_reached"]:
+                self.flush_chunk(router, event, router["start"] is not None and self.is_younger(event["start"], router["start"]))
+        finally:
+            if router["database"] is not None:
+                router["database"].close()
+        return router["next_chunk"]
+
+    def route_messages(self, router, messages, event):
+        """
+        send each message to the chunk open, saving the chunk when a message of an older chunk arrives
+
+        The messages already routed and the ones older than start are skipped, so no page has to be downloaded again,
+        the messages in the ID set are dropped and the walk jumps over the chunks already complete in the manifest
+
+            Arguments:
+                :router (dict): the router returned by get_router()
+                :messages (list[dict]): list of messages of a page
+                :event (dict): dictionary fully described in save_history()
+        """
+        # the pages of more streams are merged, so they are sorted from the most recent again
+        messages = sorted(messages, key=lambda message: message["id"], reverse=True)
+        is_used = False
+        is_walked = False
+        for message in messages:
+            if router["is_reached"]:
+                break
+            if router["min"] is not None and message["id"] >= router["min"]:
+                continue
+            if not self.is_younger(event["start"], message["created_at"]):
+                router["is_reached"] = True
+                break
+            if router["dedup"] is not None and message["id"] in router["dedup"]:
+                router["min"] = message["id"]
+                self.count("duplicates")
+                self.increment("stocktwits_duplicates_total")
+                is_walked = True
+                continue
+            key = self.get_chunk_key(message["created_at"], event["chunk"])
+            if key != router["key"]:
+                self.flush_chunk(router, event)
+                router["key"] = key
+                router["start"] = self.get_date(event["chunk"], message["created_at"])
+                if self.skip_chunks(router, event):
+                    is_used = True
+                    continue
+            router["messages"].append(message)
+            router["min"] = message["id"]
+            is_used = True
+        if is_used:
+            self.count("pages_used")
+        elif not is_walked:
+            router["is_reached"] = True
+        if messages:
+            router["page"]["max"] = min(messages[-1]["id"], router["min"])
+
     def save_history(self, event):
         """
         save history from Stocktwist on files splitted by chunk per day, week or month
 
+        Each page is downloaded once and its messages are routed to the files of their chunks,
+        the counters pages_fetched and pages_used of the collector report the pages of the last run
+        (with workers, the history walked by the workers is routed as one page)
+
             Arguments:
                 :event (dict):
                     symbols (list[str]): names of symbols to fetch
                     users (list[str]): names of users to fetch
                     only_combo (bool): optional, if True, fetches only messages of those symbols posted from those users
                     min (int): optional, min ID
-                    max (int): optional, max ID
+                    max (int): optional, max ID, included
                     limit (int): optional, default 30 messages
                     start (str): optional, min datetime
+                    end (str): optional, datetime before which the messages are saved, the max ID is found by seek() when max is not given
                     chunk (str): optional (day, week or month), default day
                     filename_prefix (str): optional, default "history."
-                    filename_suffix (str): optional, default ".json"
-                    is_verbose (bool): optional, if True comments will be printed
+                    filename_suffix (str): optional, default the suffix of format, like ".json"
+                    format (str): optional (json, jsonl, jsonl.gz, jsonl.zst or parquet), default json
+                    workers (int): optional, number of workers walking the message IDs at the same time, default 1
+                    checkpoint (str): optional, name of the file where the progress is saved after each chunk
+                    resume (bool): optional, if True, continues from the last chunk saved in the checkpoint file
+                    manifest (str): optional, name of the file indexing the chunk files, the chunks already complete are not downloaded again
+                    dedup (str): optional, prefix of the files of the IDs saved, the messages already saved by any run are not saved again, only by save_history and tail
+                    database (str): optional, name of the SQLite file where the messages are saved besides the chunk files
+                    fields (list[str]): optional, dotted paths of the fields to keep of each message
+                    compact (bool): optional, if True, each message is a Message record
+                    is_verbose (bool): optional, if True the steps are logged at level INFO
             Returns:
-                last temporary chunk event discarded
+                the next chunk event, with the start of the chunk before the last one saved and the ID before its min ID as max,
+                None when nothing has been saved
         """
-        history = []
-        if "chunk" not in event:
-            event["chunk"] = "day"
+        event = self.set_window(self.set_chunking(event))
+        self.reset_counters()
+        router = self.get_router(event)
 
-        if "start" not in event:
-            event["start"] = self.get_date(event["chunk"])
+        try:
+            if "workers" in event and event["workers"] > 1 and not router["is_reached"]:
+                self.route_messages(router, self.get_history(router["page"]), event)
+            while not router["is_reached"]:
+                self.route_messages(router, self.get_data(router["page"]), event)
+        finally:
+            next_chunk = self.close_router(router, event)
 
-        if "filename_prefix" not in event:
-            event["filename_prefix"] = "history."
+        return next_chunk
 
-        if "filename_suffix" not in event:
-            event["filename_suffix"] = ".json"
+    def get_streams(self, event):
+        """
+        get the streams of event
 
-        messages = self.get_data(event)
-        history.extend(messages)
-        cursor = self.get_cursor(messages)
-        oldest_date = self.get_date(event["chunk"], cursor["oldest_date"])
-        chunk = self.update_event("start", oldest_date, event)
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+            Returns:
+                list of tuples (kind, name), where kind is user or symbol
+        """
+        streams = []
+        if "users" in event:
+            streams.extend([("user", user) for user in event["users"]])
+        if "symbols" in event:
+            streams.extend([("symbol", symbol) for symbol in event["symbols"]])
+        return streams
 
-        if "start" in event:
-            if "is_verbose" in event and event["is_verbose"] is True:
-                print(f"method save_history, start: {event['start']}, cursor: {cursor['oldest_date']}, next chunk: {chunk['start']}")
-            while self.is_younger(event["start"], chunk["start"]):
-                history = self.get_history(chunk)
-                chunk = self.save_data(history, chunk, event)
-                if "is_verbose" in event and event["is_verbose"] is True:
-                    print(f"method save_history, start: {event['start']}, cursor: {cursor['oldest_date']}, next chunk: {chunk['start']}")
-                history = []
-        # elif "min" in event and event["min"] > 0:
-        #     while event["min"] < cursor["min"]:
-        #         history = self.get_history(chunk)
-        #         chunk = self.save_data(history, chunk, event)
-        #         history = []
+    def get_stream_msgs(self, stream, since, max, limit):
+        """
+        get one page of messages of a stream
 
-        return chunk
+            Arguments:
+                :stream (tuple): kind (user or symbol) and name of the stream
+                :since (int): messages with an ID greater than since
+                :max (int): messages with an ID less than or equal to max, 0 for the most recent
+                :limit (int): number of messages
+            Returns:
+                list of messages
+        """
+        kind, name = stream
+        if kind == "user":
+            return self.ts.get_user_msgs(user_id=name, since=since, max=max, limit=limit, callback=None, filter=None)["messages"]
+        return self.ts.get_symbol_msgs(symbol_id=name, since=since, max=max, limit=limit, callback=None, filter=None)["messages"]
+
+    def get_new_msgs(self, stream, since, limit):
+        """
+        get all messages of a stream newer than since, walking back while the pages are full
+
+            Arguments:
+                :stream (tuple): kind (user or symbol) and name of the stream
+                :since (int): messages with an ID greater than since
+                :limit (int): number of messages per page
+            Returns:
+                list of messages, the most recent first
+        """
+        messages = self.get_stream_msgs(stream, since, 0, limit)
+        page = messages
+        while since > 0 and len(page) >= limit:
+            page = self.get_stream_msgs(stream, since, messages[-1]["id"], limit)
+            messages.extend([message for message in page if message["id"] < messages[-1]["id"]])
+        return messages
+
+    def get_poll_interval(self, rate, limit, min_interval, max_interval):
+        """
+        get the seconds to wait before polling a stream again
+
+            Arguments:
+                :rate (float): messages per second observed on the stream
+                :limit (int): number of messages per page
+                :min_interval (float): min seconds between two polls
+                :max_interval (float): max seconds between two polls
+            Returns:
+                the seconds to get about half a page per poll, between min_interval and max_interval
+        """
+        if rate <= 0:
+            return max_interval
+        return min(max_interval, max(min_interval, limit / 2 / rate))
+
+    def tail(self, event, callback):
+        """
+        follow the streams of event, passing the new messages to callback as soon as they are published
+
+        Each stream keeps the ID of its newest message and it is polled only for the messages newer than it:
+        the poll interval adapts to the rate of messages of the stream, fast for hot symbols and slow for quiet ones
+
+            Example:
+                Collector().tail({"symbols": ["TSLA", "AAPL"]}, lambda messages: print(len(messages)))
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history()
+                    symbols (list of str): names of symbols to follow
+                    users (list of str): names of users to follow
+                    only_combo (bool): optional, if True, passes only messages of those symbols posted from those users
+                    min (int): optional, ID after which the messages are passed, default the last page
+                    limit (int): optional, default 30 messages
+                    min_interval (float): optional, min seconds between two polls of a stream, default 5
+                    max_interval (float): optional, max seconds between two polls of a stream, default 300
+                    max_polls (int): optional, number of polls after which the method returns, default forever
+                    dedup (str): optional, prefix of the files of the IDs passed, the messages already passed by any run are not passed again
+                    database (str): optional, name of the SQLite file where the messages passed are saved
+                :callback (callable): function called with the list of new messages, the most recent first
+            Returns:
+                dictionary with the ID of the newest message of each stream
+        """
+        event = self.set_paging(event)
+        min_interval = event["min_interval"] if "min_interval" in event else 5
+        max_interval = event["max_interval"] if "max_interval" in event else 300
+        streams = {stream: {"since": event["min"], "rate": 0, "polled_at": None, "next_poll": 0} for stream in self.get_streams(event)}
+        seen = set()
+        dedup = self.get_idset(event)
+        database = self.get_database(event)
+        polls = 0
+
+        try:
+            while streams and ("max_polls" not in event or polls < event["max_polls"]):
+                stream = min(streams, key=lambda stream: streams[stream]["next_poll"])
+                state = streams[stream]
+                wait = state["next_poll"] - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+
+                now = time.monotonic()
+                messages = self.get_new_msgs(stream, state["since"], event["limit"])
+                polls += 1
+                if messages:
+                    state["since"] = max(state["since"], messages[0]["id"])
+                if state["polled_at"] is not None:
+                    observed = len(messages) / max(now - state["polled_at"], 1e-6)
+                    state["rate"] = 0.5 * observed + 0.5 * state["rate"]
+                elif len(messages) > 1:
+                    seconds = (self.get_datetime(messages[0]["created_at"]) - self.get_datetime(messages[-1]["created_at"])).total_seconds()
+                    state["rate"] = len(messages) / max(seconds, 1)
+                state["polled_at"] = now
+                state["next_poll"] = now + self.get_poll_interval(state["rate"], event["limit"], min_interval, max_interval)
+
+                with self.timer("clean"):
+                    messages = [message for message in self.project_data(self.clean_data(messages, event), event) if message["id"] not in seen]
+                self.increment("stocktwits_messages_total", len(messages))
+                if dedup is not None:
+                    length = len(messages)
+                    messages = [message for message in messages if message["id"] not in dedup]
+                    self.increment("stocktwits_duplicates_total", length - len(messages))
+                if messages:
+                    seen.update([message["id"] for message in messages])
+                    callback(messages)
+                    if database is not None:
+                        with self.timer("write"):
+                            database.write(messages)
+                    if dedup is not None:
+                        dedup.update([message["id"] for message in messages])
+                        dedup.save()
+                oldest = min([state["since"] for state in streams.values()])
+                seen = {id for id in seen if id > oldest}
+        finally:
+            if database is not None:
+                database.close()
+        return {f"{kind}:{name}": state["since"] for (kind, name), state in streams.items()}
+
+    def get_tasks(self, event):
+        """
+        split a job in one task per stream and chunk, from start to end
+
+            Arguments:
+                :event (dict): dictionary fully described in save_history(), without only_combo, checkpoint, resume, manifest, dedup and workers
+                    end (str): optional, datetime before which the messages are saved, default now
+            Returns:
+                list of tuples with the key of the task, like symbol:TSLA:2022-04-04T00:00:00Z:2022-04-05T00:00:00Z, and its event:
+                the files of a task have the name of its stream after filename_prefix, like history.TSLA.20220404.json
+        """
+        for key in ["only_combo", "checkpoint", "resume", "manifest", "dedup", "workers"]:
+            if key in event and event[key]:
+                raise Exception(f'The key {key} is not supported by the tasks of a queue')
+        event = self.set_chunking(dict(event))
+        end = event["end"] if "end" in event else self.get_now()
+        windows = []
+        top = end
+        current = self.get_date(event["chunk"], end)
+        if current == end:
+            current = self.get_date(event["chunk"], current, True)
+        while not self.is_younger(top, event["start"]):
+            bottom = event["start"] if self.is_younger(current, event["start"]) else current
+            windows.append((bottom, top))
+            top = current
+            current = self.get_date(event["chunk"], current, True)
+        common = {key: value for key, value in event.items() if key not in ["symbols", "users", "min", "max"]}
+        tasks = []
+        for kind, name in self.get_streams(event):
+            for bottom, top in windows:
+                task = dict(common, start=bottom, end=top, filename_prefix=f'{event["filename_prefix"]}{name}.')
+                task["users" if kind == "user" else "symbols"] = [name]
+                tasks.append((f"{kind}:{name}:{bottom}:{top}", task))
+        return tasks
+
+    def enqueue(self, queue, event):
+        """
+        add the tasks of a job to a queue, the tasks already in the queue are not added again
+
+            Arguments:
+                :queue (TaskQueue): the queue shared by the workers
+                :event (dict): dictionary fully described in get_tasks()
+            Returns:
+                the number of tasks added
+        """
+        return queue.put(self.get_tasks(event))
+
+    def renew_lease(self, queue, task, stop, lost):
+        """
+        renew the lease of a task every third of the lease, until stop is set or the lease is lost
+
+            Arguments:
+                :queue (TaskQueue): the queue of the task
+                :task (dict): the task returned by TaskQueue.lease()
+                :stop (threading.Event): set when the task has finished
+                :lost (threading.Event): set when the lease is lost, so no chunk of the task is saved anymore
+        """
+        while not stop.wait(queue.lease_seconds / 3):
+            if not queue.renew(task):
+                lost.set()
+                break
+
+    def work(self, queue, worker = None, max_tasks = None, poll = None):
+        """
+        lease the tasks of a queue one by one and save their chunks by save_history(), until no task can be leased
+
+        While a task runs, its lease is renewed by a thread, so only the tasks of a worker stopped are leased again,
+        and when the lease is lost the task stops before saving its next chunk
+
+            Example:
+                Collector().work(TaskQueue('tasks.db'), max_tasks=100)
+
+            Arguments:
+                :queue (TaskQueue): the queue shared by the workers
+                :worker (str): optional, name of the worker, default host name and process ID
+                :max_tasks (int): optional, number of tasks after which the method returns, default all
+                :poll (float): optional, seconds to wait when the tasks left are leased by other workers, default None to return
+            Returns:
+                the number of tasks completed by this worker
+        """
+        worker = queue.get_worker() if worker is None else worker
+        completed = 0
+        while max_tasks is None or completed < max_tasks:
+            task = queue.lease(worker)
+            if task is None:
+                if poll is not None and queue.get_counts()["leased"] > 0:
+                    time.sleep(poll)
+                    continue
+                break
+            stop = threading.Event()
+            self.lease_lost = threading.Event()
+            heartbeat = threading.Thread(target=self.renew_lease, args=(queue, task, stop, self.lease_lost), daemon=True)
+            heartbeat.start()
+            next_chunk = None
+            try:
+                next_chunk = self.save_history(dict(task["event"]))
+            except Exception as error:
+                if not self.lease_lost.is_set():
+                    logger.warning(f"method work, task {task['key']} failed: {error}", extra={"stocktwits": {"task": task["key"], "error": str(error)}})
+                    self.increment("stocktwits_tasks_total", status="failed")
+                    queue.fail(task, error)
+                    continue
+            finally:
+                stop.set()
+                heartbeat.join()
+                lost = self.lease_lost.is_set()
+                self.lease_lost = None
+            if not lost and queue.complete(task, {"counters": self.counters, "next_chunk": next_chunk}):
+                completed += 1
+                self.increment("stocktwits_tasks_total", status="done")
+            else:
+                logger.warning(f"method work, task {task['key']} lease lost", extra={"stocktwits": {"task": task["key"]}})
+                self.increment("stocktwits_tasks_total", status="lost")
+        return completed
@@ -0,0 +1,125 @@
+"""The class for saving the messages of Stocktwits on a SQLite database
+
+    The messages are inserted in bulk, one transaction per batch, and the ID of the message is the primary key,
+    so a message saved twice is kept once. The indexes on created_at, symbol and username
+    let a query read only the rows of its range, without loading the chunk files
+
+        Example:
+            from stocktwits_collector.database import Database
+            from stocktwits_collector.signals import Signals
+            db = Database('history.db')
+            twits = db.query(symbols=['AAPL'], start='2022-03-28T00:00:00Z')
+            twits = Signals().add_signals('aapl', 'sentiment', twits)
+"""
+import sqlite3
+import stocktwits_collector.writer as w
+
+class Database():
+    columns = ["id", "created_at", "body", "user_id", "username", "sentiment"]
+
+    def __init__(self, path, batch_size = 10000):
+        """
+        the database is created with its tables when it does not exist
+
+            Arguments:
+                :path (str): name of the SQLite file
+                :batch_size (int): optional, number of messages inserted by each executemany, default 10000
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.writer = w.Writer()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    body TEXT,
+                    user_id INTEGER,
+                    username TEXT,
+                    sentiment TEXT,
+                    message TEXT
+                )""")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS symbols (
+                    symbol TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    PRIMARY KEY (symbol, created_at, id)
+                ) WITHOUT ROWID""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS messages_created_at ON messages (created_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS messages_username ON messages (username, created_at)")
+
+    def get_rows(self, messages):
+        """
+        get the rows of the tables messages and symbols
+
+            Arguments:
+                :messages (list[dict]): list of messages, also projected or Message records
+            Returns:
+                the list of rows of messages and the list of rows of symbols
+        """
+        messages_rows = []
+        symbols_rows = []
+        for message in messages:
+            row = self.writer.flatten(message)
+            messages_rows.append((row["id"], row["created_at"], row["body"], row["user.id"], row["user.username"], row["entities.sentiment.basic"], self.writer.codec.dumps(message)))
+            symbols_rows.extend([(symbol, row["created_at"], row["id"]) for symbol in row["symbols"]])
+        return messages_rows, symbols_rows
+
+    def write(self, messages):
+        """
+        insert the messages, the ones already saved are ignored
+
+            Arguments:
+                :messages (list[dict]): list of messages, also projected or Message records
+        """
+        for first in range(0, len(messages), self.batch_size):
+            messages_rows, symbols_rows = self.get_rows(messages[first:first + self.batch_size])
+            with self.connection:
+                self.connection.executemany("INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)", messages_rows)
+                self.connection.executemany("INSERT OR IGNORE INTO symbols VALUES (?, ?, ?)", symbols_rows)
+
+    def query(self, symbols = None, users = None, start = None, end = None, columns = None):
+        """
+        get the messages of a range as a DataFrame sorted from the oldest message, ready for Signals.add_signals()
+
+            Arguments:
+                :symbols (list of str): optional, names of the symbols, default all
+                :users (list of str): optional, names of the users, default all
+                :start (str): optional, min datetime with format %Y-%m-%dT%H:%M:%SZ
+                :end (str): optional, datetime with format %Y-%m-%dT%H:%M:%SZ before which the messages are returned
+                :columns (list of str): optional, default id, created_at, body, user_id, username and sentiment, message is the JSON of the message
+            Returns:
+                a DataFrame with a row for each message
+        """
+        import pandas as pd
+        columns = self.columns if columns is None else columns
+        conditions = []
+        params = []
+        ranges = []
+        if start is not None:
+            ranges.append("created_at >= ?")
+        if end is not None:
+            ranges.append("created_at < ?")
+        dates = [date for date in [start, end] if date is not None]
+        if symbols:
+            # the symbols table has the created_at of its messages, so the range is read by its primary key
+            symbol_conditions = [f"symbol IN ({', '.join(['?'] * len(symbols))})"] + ranges
+            conditions.append(f"id IN (SELECT id FROM symbols WHERE {' AND '.join(symbol_conditions)})")
+            params.extend(list(symbols) + dates)
+        if users:
+            conditions.append(f"username IN ({', '.join(['?'] * len(users))})")
+            params.extend(list(users))
+        conditions.extend(ranges)
+        params.extend(dates)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return pd.read_sql_query(f"SELECT {', '.join(columns)} FROM messages {where} ORDER BY created_at, id", self.connection, params=params)
+
+    def close(self):
+        """
+        close the connection to the database
+        """
+        self.connection.close()
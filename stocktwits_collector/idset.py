@@ -0,0 +1,165 @@
+"""The class for remembering the message IDs already saved, also between the runs
+
+    The IDs are kept in a few sorted runs of int64 on disk, read by memory map, so a billion of IDs take 8GB on disk
+    and only the pages read by the binary searches in memory. The IDs added are kept in a set and appended to a log file,
+    until they are written as a new run. A run is merged with the one before while that one is at most twice as big,
+    a block at a time in a new file, so each ID is rewritten a few times and the memory does not grow with the IDs
+
+        Example:
+            from stocktwits_collector.idset import IdSet
+            ids = IdSet('history.ids')
+            messages = [message for message in messages if message['id'] not in ids]
+            ids.update([message['id'] for message in messages])
+            ids.save()
+"""
+import os
+import glob
+import numpy as np
+
+class IdSet():
+
+    def __init__(self, path = None, buffer_size = 1048576, block_size = 1048576):
+        """
+        the IDs saved on path are loaded when the set is created
+
+            Arguments:
+                :path (str): optional, prefix of the files, the runs have the suffix .<number>.run and the log file .log, default only in memory
+                :buffer_size (int): optional, number of IDs added before they are written as a new run, default 1048576
+                :block_size (int): optional, number of IDs of each run read at once when two runs are merged, default 1048576
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.block_size = block_size
+        self.runs = []
+        self.numbers = []
+        self.pending = set()
+        self.unsaved = []
+        if path is not None:
+            for filename in sorted(glob.glob(f"{glob.escape(path)}.*.run"), key=self.get_number):
+                self.runs.append(self.load_run(filename))
+                self.numbers.append(self.get_number(filename))
+            if os.path.isfile(f"{path}.log"):
+                self.pending = set(np.fromfile(f"{path}.log", dtype=np.int64).tolist())
+
+    def __contains__(self, id):
+        if id in self.pending:
+            return True
+        for run in self.runs:
+            index = np.searchsorted(run, id)
+            if index < len(run) and run[index] == id:
+                return True
+        return False
+
+    def __len__(self):
+        return sum([len(run) for run in self.runs]) + len(self.pending)
+
+    def get_number(self, filename):
+        """
+        get the number of a run from its file name
+
+            Arguments:
+                :filename (str): name of the file of the run
+            Returns:
+                the number of the run, the runs with a greater number are newer
+        """
+        return int(filename[len(self.path) + 1:-len(".run")])
+
+    def load_run(self, filename):
+        """
+        read a run by memory map
+
+            Arguments:
+                :filename (str): name of the file of the run
+            Returns:
+                the sorted array of the run
+        """
+        if os.path.getsize(filename) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.memmap(filename, dtype=np.int64, mode="r")
+
+    def write_run(self, blocks, number):
+        """
+        write a run by its sorted blocks, on a temporary file renamed when it is complete
+
+            Arguments:
+                :blocks (iterable of arrays): the sorted blocks of the run
+                :number (int): number of the run
+            Returns:
+                the sorted array of the run, read by memory map when the set has a path
+        """
+        if self.path is None:
+            return np.concatenate([np.empty(0, dtype=np.int64)] + list(blocks))
+        filename = f"{self.path}.{number}.run"
+        with open(f"{filename}.tmp", "wb") as fh:
+            for block in blocks:
+                block.astype(np.int64).tofile(fh)
+        os.replace(f"{filename}.tmp", filename)
+        return self.load_run(filename)
+
+    def merge_blocks(self, first, second):
+        """
+        get the union of two runs a block at a time
+
+            Arguments:
+                :first (array): a sorted run
+                :second (array): another sorted run
+            Returns:
+                a generator of sorted blocks, each one made of at most a block of each run
+        """
+        i = 0
+        j = 0
+        while i < len(first) or j < len(second):
+            head = np.asarray(first[i:i + self.block_size])
+            tail = np.asarray(second[j:j + self.block_size])
+            # the IDs up to the end of the shorter block are all in these two blocks
+            bound = min(head[-1], tail[-1]) if len(head) and len(tail) else (head[-1] if len(head) else tail[-1])
+            head = head[:np.searchsorted(head, bound, side="right")]
+            tail = tail[:np.searchsorted(tail, bound, side="right")]
+            i += len(head)
+            j += len(tail)
+            yield np.union1d(head, tail)
+
+    def update(self, ids):
+        """
+        add the IDs to the set
+
+            Arguments:
+                :ids (list of int): the IDs
+        """
+        for id in ids:
+            if id not in self:
+                self.pending.add(id)
+                self.unsaved.append(id)
+
+    def merge(self):
+        """
+        write the IDs added as a new run, and merge the last runs while the one before is at most twice as big
+        """
+        if not self.pending:
+            return
+        number = self.numbers[-1] + 1 if self.numbers else 0
+        self.runs.append(self.write_run([np.array(sorted(self.pending), dtype=np.int64)], number))
+        self.numbers.append(number)
+        self.pending = set()
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            number = self.numbers[-1] + 1
+            run = self.write_run(self.merge_blocks(self.runs[-2], self.runs[-1]), number)
+            if self.path is not None:
+                for old in self.numbers[-2:]:
+                    os.remove(f"{self.path}.{old}.run")
+            self.runs[-2:] = [run]
+            self.numbers[-2:] = [number]
+
+    def save(self):
+        """
+        save the IDs added on the log file, and as a new run when they are more than buffer_size
+        """
+        if self.path is None:
+            return
+        if self.unsaved:
+            with open(f"{self.path}.log", "ab") as fh:
+                np.array(self.unsaved, dtype=np.int64).tofile(fh)
+            self.unsaved = []
+        if len(self.pending) >= self.buffer_size:
+            self.merge()
+            os.remove(f"{self.path}.log")
@@ -0,0 +1,73 @@
+"""The class for limiting the requests to Stocktwits
+
+    A token bucket shared by all the requests of a Streamer, also between threads:
+    the bucket is refilled at the rate of the API quota, so the requests run near the quota ceiling
+    without waiting a fixed time when the quota is over
+"""
+import time
+import threading
+
+class RateLimiter():
+
+    def __init__(self, rate = 200, period = 3600, burst = None):
+        """
+        the bucket starts full
+
+            Arguments:
+                :rate (int): number of requests allowed per period, default 200 like the Stocktwits API quota
+                :period (float): seconds of the period, default 3600
+                :burst (int): optional, max number of tokens in the bucket, default rate
+        """
+        self.rate = rate
+        self.period = period
+        self.burst = rate if burst is None else burst
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self.resume_at = 0
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        """
+        refill the bucket with the tokens earned since the last update
+
+            Arguments:
+                :now (float): current monotonic time
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate / self.period)
+        self.updated_at = now
+
+    def get_wait(self):
+        """
+        take a token if there is one
+
+            Returns:
+                the seconds to wait before a token is available, 0 if the token has been taken
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now < self.resume_at:
+                return self.resume_at - now
+            self.refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) * self.period / self.rate
+
+    def acquire(self):
+        """
+        wait until a token is available and take it
+        """
+        wait = self.get_wait()
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.get_wait()
+
+    def hold(self, seconds):
+        """
+        hold all the requests, for example when the API answers with a Retry-After header
+
+            Arguments:
+                :seconds (float): seconds to wait before the next request
+        """
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
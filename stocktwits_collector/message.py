@@ -0,0 +1,96 @@
+"""The class for keeping the messages of Stocktwits in a compact record
+
+    A message of the API is a dictionary with the user profile, the entities, the links and all the symbols metadata,
+    while the collector and the signals use only a few fields: the record keeps only those ones in slots,
+    so a big history takes an order of magnitude less memory
+
+        Example:
+            from stocktwits_collector.collector import Collector
+            messages = Collector().get_history({'symbols': ['TSLA'], 'start': '2022-04-04T00:00:00Z', 'compact': True})
+            print(messages[0].created_at, messages[0]['body'], messages[0].to_dict())
+"""
+
+class Message():
+    __slots__ = ("id", "created_at", "body", "username", "symbols", "sentiment")
+
+    def __init__(self, id, created_at, body = None, username = None, symbols = (), sentiment = None):
+        """
+        the record of a message
+
+            Arguments:
+                :id (int): ID of the message
+                :created_at (str): datetime with format %Y-%m-%dT%H:%M:%SZ
+                :body (str): optional, text of the message
+                :username (str): optional, name of the user
+                :symbols (tuple of str): optional, names of the symbols
+                :sentiment (str): optional, Bullish, Bearish or None
+        """
+        self.id = id
+        self.created_at = created_at
+        self.body = body
+        self.username = username
+        self.symbols = symbols
+        self.sentiment = sentiment
+
+    @classmethod
+    def from_dict(cls, message):
+        """
+        get the record of a message of the API, also when it is projected
+
+            Arguments:
+                :message (dict): message of the API
+            Returns:
+                a Message
+        """
+        user = message.get("user") or {}
+        sentiment = (message.get("entities") or {}).get("sentiment") or {}
+        return cls(
+            message["id"],
+            message["created_at"],
+            message.get("body"),
+            user.get("username"),
+            tuple([symbol["symbol"] for symbol in message.get("symbols") or []]),
+            sentiment.get("basic")
+        )
+
+    def to_dict(self):
+        """
+        get the message with the same structure of the API, with only the fields of the record
+
+            Returns:
+                dictionary with id, body, created_at, user.username, symbols[].symbol and entities.sentiment.basic
+        """
+        return {
+            "id": self.id,
+            "body": self.body,
+            "created_at": self.created_at,
+            "user": {"username": self.username},
+            "symbols": [{"symbol": symbol} for symbol in self.symbols],
+            "entities": {"sentiment": None if self.sentiment is None else {"basic": self.sentiment}}
+        }
+
+    def __getitem__(self, key):
+        """
+        get a field like the message of the API, so message["created_at"] and message["symbols"] work for both:
+        the key is read from its slot, without building the whole dictionary
+        """
+        if key in ("id", "created_at", "body"):
+            return getattr(self, key)
+        if key == "user":
+            return {"username": self.username}
+        if key == "symbols":
+            return [{"symbol": symbol} for symbol in self.symbols]
+        if key == "entities":
+            return {"sentiment": None if self.sentiment is None else {"basic": self.sentiment}}
+        raise KeyError(key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Message):
+            return NotImplemented
+        return all([getattr(self, key) == getattr(other, key) for key in self.__slots__])
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Message(id={self.id}, created_at={self.created_at!r}, username={self.username!r}, symbols={self.symbols!r})"
@@ -0,0 +1,245 @@
+"""The class for measuring the downloads of Stocktwits
+
+    The streamer and the collector update the same metrics: counters of requests, bytes, retries, pages, messages,
+    duplicates and discards, the histogram of the latency of the requests per endpoint and the seconds spent per phase
+    (fetch, parse, clean and write). The metrics can be read by the methods, exported as Prometheus text
+    on an HTTP endpoint, or passed to callbacks at each update
+
+        Example:
+            from stocktwits_collector.collector import Collector
+            c = Collector()
+            c.metrics.add_callback(lambda kind, name, value, labels: print(kind, name, value, labels))
+            server = c.metrics.serve(9100)
+            c.save_history({'symbols': ['TSLA'], 'start': '2022-04-04T00:00:00Z'})
+            print(c.metrics.get_rate('stocktwits_messages_total'), c.metrics.get('stocktwits_phase_seconds_total', phase='fetch'))
+            server.shutdown()
+"""
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class Metrics():
+    buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    descriptions = {
+        "stocktwits_requests_total": "requests to the API by endpoint and status",
+        "stocktwits_request_seconds": "latency of the requests to the API by endpoint",
+        "stocktwits_received_bytes_total": "bytes of the responses of the API by endpoint",
+        "stocktwits_retries_total": "requests retried by endpoint",
+        "stocktwits_cache_hits_total": "pages read from the cache by endpoint",
+        "stocktwits_pages_total": "pages fetched by the collector",
+        "stocktwits_messages_total": "messages fetched by the collector",
+        "stocktwits_duplicates_total": "messages dropped because already saved by a previous run",
+        "stocktwits_discarded_total": "messages discarded by clean_history at the border of a chunk",
+        "stocktwits_chunks_saved_total": "chunks saved on files",
+        "stocktwits_chunks_skipped_total": "chunks skipped because already complete in the manifest",
+        "stocktwits_seek_probes_total": "pages requested by seek to find the message ID at the end of a window",
+        "stocktwits_tasks_total": "tasks of a queue by status: done, failed or lost when the lease has expired",
+        "stocktwits_phase_seconds_total": "seconds spent by phase: fetch, parse, clean and write"
+    }
+
+    def __init__(self, buckets = None):
+        """
+        the metrics start from zero
+
+            Arguments:
+                :buckets (tuple of float): optional, upper bounds in seconds of the buckets of the histograms
+        """
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.reset()
+
+    def reset(self):
+        """
+        set all the metrics to zero, the rates are computed from now
+        """
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started_at = time.monotonic()
+
+    def add_callback(self, callback):
+        """
+        add a function called at each update of a metric
+
+            Arguments:
+                :callback (callable): function called with kind (counter or histogram), name, value and labels (dict)
+        """
+        self.callbacks.append(callback)
+
+    def notify(self, kind, name, value, labels):
+        for callback in self.callbacks:
+            callback(kind, name, value, labels)
+
+    def increment(self, name, value = 1, **labels):
+        """
+        add a value to a counter
+
+            Arguments:
+                :name (str): name of the counter
+                :value (float): optional, default 1
+                :labels (dict): optional, labels of the counter, like endpoint="symbol"
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self.callbacks:
+            self.notify("counter", name, value, labels)
+
+    def observe(self, name, value, **labels):
+        """
+        add a value to a histogram
+
+            Arguments:
+                :name (str): name of the histogram
+                :value (float): the value observed, like the seconds of a request
+                :labels (dict): optional, labels of the histogram, like endpoint="symbol"
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0, "count": 0}
+            histogram = self.histograms[key]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+        if self.callbacks:
+            self.notify("histogram", name, value, labels)
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        add the seconds spent in the block to the counter stocktwits_phase_seconds_total of phase
+
+            Example:
+                with metrics.timer("write"):
+                    writer.write(filename, messages)
+
+            Arguments:
+                :phase (str): fetch, parse, clean or write
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.increment("stocktwits_phase_seconds_total", time.perf_counter() - start, phase=phase)
+
+    def get(self, name, **labels):
+        """
+        get the value of a counter, summed over the labels not given
+
+            Arguments:
+                :name (str): name of the counter
+                :labels (dict): optional, labels to match
+            Returns:
+                the value of the counter, 0 when it has never been updated
+        """
+        items = set(labels.items())
+        with self.lock:
+            return sum([value for (key, key_labels), value in self.counters.items() if key == name and items <= set(key_labels)])
+
+    def get_histogram(self, name, **labels):
+        """
+        get a histogram, summed over the labels not given
+
+            Arguments:
+                :name (str): name of the histogram
+                :labels (dict): optional, labels to match
+            Returns:
+                dictionary with buckets (dict of upper bound and cumulative count), sum and count
+        """
+        items = set(labels.items())
+        result = {"buckets": dict.fromkeys(self.buckets, 0), "sum": 0, "count": 0}
+        with self.lock:
+            for (key, key_labels), histogram in self.histograms.items():
+                if key == name and items <= set(key_labels):
+                    for bound, count in zip(self.buckets, histogram["buckets"]):
+                        result["buckets"][bound] += count
+                    result["sum"] += histogram["sum"]
+                    result["count"] += histogram["count"]
+        return result
+
+    def get_rate(self, name, **labels):
+        """
+        get the value per second of a counter, from the creation or the last reset of the metrics
+
+            Arguments:
+                :name (str): name of the counter, like stocktwits_pages_total or stocktwits_messages_total
+                :labels (dict): optional, labels to match
+            Returns:
+                the value of the counter divided by the seconds elapsed
+        """
+        elapsed = time.monotonic() - self.started_at
+        return self.get(name, **labels) / elapsed if elapsed > 0 else 0
+
+    def format_labels(self, labels, extra = ()):
+        labels = list(labels) + list(extra)
+        if not labels:
+            return ""
+        escaped = [(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in labels]
+        return "{" + ",".join([f'{key}="{value}"' for key, value in escaped]) + "}"
+
+    def to_prometheus(self):
+        """
+        get the metrics with the text format of Prometheus
+
+            Returns:
+                a string with the counters and the histograms
+        """
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted([(key, {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}) for key, value in self.histograms.items()])
+        names = set()
+        for (name, labels), value in counters:
+            if name not in names:
+                names.add(name)
+                lines.append(f"# HELP {name} {self.descriptions.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self.format_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in names:
+                names.add(name)
+                lines.append(f"# HELP {name} {self.descriptions.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in zip(self.buckets, histogram["buckets"]):
+                lines.append(f"{name}_bucket{self.format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{self.format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{self.format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{self.format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port = 9100, host = "127.0.0.1"):
+        """
+        serve the metrics with the text format of Prometheus on the path /metrics, on a thread
+
+            Arguments:
+                :port (int): optional, default 9100, 0 to choose a free one
+                :host (str): optional, default 127.0.0.1
+            Returns:
+                the HTTP server, stopped by its method shutdown()
+        """
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        server.metrics = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
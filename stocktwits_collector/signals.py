@@ -3,9 +3,12 @@
     A collection of methods to make your signals
 """
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 
 class Signals():
+    sentiments = {'Bullish': 1, 'Bearish': -1}
 
     def convert_datetime(self, date):
         """
@@ -34,7 +37,35 @@ class Signals():
             return -1
         return 0
 
-    def details(self, prefix, sentiment, twits):
+    def format_periods(self, datetimes, freq, format):
+        """
+        format the datetimes floored to a period, calling strftime once for each period instead of once for each row
+
+            Arguments:
+                :datetimes (Series): datetimes of the twits
+                :freq (str): period of pandas, like D for day or h for hour
+                :format (str): format of strftime
+            Returns:
+                a Series of strings with the same index of datetimes
+        """
+        codes, periods = pd.factorize(datetimes.dt.floor(freq))
+        return pd.Series(periods.strftime(format).to_numpy(dtype=object)[codes], index=datetimes.index)
+
+    def format_times(self, datetimes):
+        """
+        format the time of the datetimes, calling strftime once for each second of the day
+
+            Arguments:
+                :datetimes (Series): datetimes of the twits
+            Returns:
+                a Series of strings with format %H:%M:%SZ and the same index of datetimes
+        """
+        seconds = datetimes.to_numpy().astype('datetime64[s]').astype(np.int64) % 86400
+        codes, uniques = pd.factorize(seconds)
+        times = np.array([f'{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}Z' for second in uniques], dtype=object)
+        return pd.Series(times[codes], index=datetimes.index)
+
+    def details(self, prefix, sentiment, twits, key = None):
         """
         add features in your DataFrame about datetime and simple Stocktwits Sentiment statistics
 
@@ -42,6 +73,7 @@ class Signals():
                 :prefix (str): prefix of the new features name
                 :sentiment (str): feature name of Stocktwits Sentiment
                 :twits (DataFrame): DataFrame of twits with at least Stocktwits created_at feature and Stocktwits Sentiment
+                :key (str): optional, feature name of the series of a panel, like the symbol, the cumulative sums are calculated for each key
             Returns:
                 a DataFrame with the new features:
                 datetime, date, time, hour, {prefix}_number, {prefix}_total_cum, {prefix}_day_cum, {prefix}_hour_cum
@@ -50,19 +82,110 @@ class Signals():
             if feature in twits.keys():
                 raise Warning('The feature named {} is already present: this method overwrites it!'.format(feature))
             
-        twits['datetime'] = twits['created_at'].apply(self.convert_datetime)
-        twits['date'] = twits['datetime'].dt.strftime('%Y-%m-%d')
-        twits['time'] = twits['datetime'].dt.strftime('%H:%M:%SZ')
-        twits['hour'] = twits['datetime'].dt.strftime('%Y-%m-%dT%H:59:59Z')
+        # vectorized: the same values of convert_datetime and convert_sentiment, without a Python call per row
+        # the Z is matched by exact=False, because a literal Z in the format disables the fast ISO 8601 parser of pandas
+        twits['datetime'] = pd.to_datetime(twits['created_at'], format='%Y-%m-%dT%H:%M:%S', exact=False)
+        twits['date'] = self.format_periods(twits['datetime'], 'D', '%Y-%m-%d')
+        twits['time'] = self.format_times(twits['datetime'])
+        twits['hour'] = self.format_periods(twits['datetime'], 'h', '%Y-%m-%dT%H:59:59Z')
 
-        twits[f'{prefix}_number'] = twits[sentiment].apply(self.convert_sentiment)
-        twits[f'{prefix}_total_cum'] = twits[f'{prefix}_number'].cumsum()
-        twits[f'{prefix}_day_cum'] = twits.groupby(['date'])[f'{prefix}_number'].cumsum()
-        twits[f'{prefix}_hour_cum'] = twits.groupby(['hour'])[f'{prefix}_number'].cumsum()
+        twits[f'{prefix}_number'] = twits[sentiment].map(self.sentiments).fillna(0).astype(np.int64)
+        keys = [] if key is None else [twits[key]]
+        twits[f'{prefix}_total_cum'] = twits[f'{prefix}_number'].groupby(keys).cumsum() if keys else twits[f'{prefix}_number'].cumsum()
+        twits[f'{prefix}_day_cum'] = twits[f'{prefix}_number'].groupby(keys + [twits['datetime'].dt.floor('D')]).cumsum()
+        twits[f'{prefix}_hour_cum'] = twits[f'{prefix}_number'].groupby(keys + [twits['datetime'].dt.floor('h')]).cumsum()
 
         return twits
 
-    def bull_bear_ratios(self, prefix, groupby, sentiment, twits, ema_list = []):
+    def ema(self, values, spans, initial = None, segments = None):
+        """
+        calculate the exponential moving averages of the values for each span,
+        by Series.ewm(span=span, adjust=False, ignore_na=True).mean()
+
+            Arguments:
+                :values (array of float): values sorted by time, NaN values are skipped and take the previous average
+                :spans (list of int): spans of the averages, each one at least 1
+                :initial (array of float): optional, averages of each span before the first value, to continue a previous calculation,
+                    default the first value is the first average
+                :segments (array): optional, the series of each value, like the symbol, with the values of a series contiguous:
+                    each series has its own averages, default one series
+            Returns:
+                a 2-D array with a row for each value and a column for each span
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if any([span < 1 for span in spans]):
+            raise Exception('The span of an EMA must be at least 1')
+        if segments is not None and initial is not None:
+            raise Exception('The initial averages cannot be used with more segments')
+        averages = np.full((len(values), len(spans)), np.nan)
+        for index, span in enumerate(spans):
+            if segments is not None:
+                grouped = pd.Series(values).groupby(np.asarray(segments), sort=False).ewm(span=span, adjust=False, ignore_na=True).mean()
+                averages[:, index] = grouped.droplevel(0).sort_index().to_numpy()
+            elif initial is not None:
+                # the previous average is the first value, so the averages go on from it
+                series = pd.Series(np.r_[initial[index], values])
+                averages[:, index] = series.ewm(span=span, adjust=False, ignore_na=True).mean().to_numpy()[1:]
+            else:
+                averages[:, index] = pd.Series(values).ewm(span=span, adjust=False, ignore_na=True).mean().to_numpy()
+        return averages
+
+    def get_cube(self, sentiment, twits, freq = 'h', key = None):
+        """
+        count the twits of each sentiment by period in one scan of the rows,
+        so the counts of any longer period are rolled up from the cube instead of the rows
+
+            Arguments:
+                :sentiment (str): feature name of Stocktwits Sentiment
+                :twits (DataFrame): DataFrame of twits with at least Stocktwits body and created_at features and Stocktwits Sentiment
+                :freq (str): optional, period of pandas of the cube, like min or h, default h
+                :key (str): optional, feature name counted apart, like the symbol
+            Returns:
+                a DataFrame with a column of counts for each sentiment and a row for each period,
+                indexed by period, or by key and period when key is given
+        """
+        if 'datetime' in twits.keys():
+            datetimes = twits['datetime']
+        else:
+            datetimes = pd.to_datetime(twits['created_at'], format='%Y-%m-%dT%H:%M:%S', exact=False)
+        keys = [datetimes.dt.floor(freq).rename('period'), twits[sentiment]]
+        if key is not None:
+            keys.insert(0, twits[key])
+        return twits['body'].groupby(keys).count().unstack(fill_value=0)
+
+    def roll_up(self, cube, freq, format):
+        """
+        sum the counts of a cube by a period equal or longer than the one of the cube
+
+            Arguments:
+                :cube (DataFrame): counts returned by get_cube()
+                :freq (str): period of pandas, like D for day or h for hour
+                :format (str): format of strftime of the periods, like the one of the feature used by bull_bear_ratios()
+            Returns:
+                a DataFrame with the columns of the cube and a row for each period formatted, and for each key when the cube has it
+        """
+        codes, periods = pd.factorize(cube.index.get_level_values('period').floor(freq))
+        labels = periods.strftime(format).to_numpy(dtype=object)[codes]
+        levels = [labels] if cube.index.nlevels == 1 else [cube.index.get_level_values(0), labels]
+        return cube.groupby(levels).sum()
+
+    def broadcast(self, values, positions):
+        """
+        get the values of the periods for each row, by the positions of the periods of the rows
+
+            Arguments:
+                :values (array): a value for each period
+                :positions (array of int): position of the period of each row, -1 when the period is missing
+            Returns:
+                an array with a value for each row, NaN for the missing periods
+        """
+        if (positions >= 0).all():
+            return values[positions]
+        result = np.full(len(positions), np.nan)
+        result[positions >= 0] = values[positions[positions >= 0]]
+        return result
+
+    def bull_bear_ratios(self, prefix, groupby, sentiment, twits, ema_list = [], counts = None, key = None):
         """
         add features in your DataFrame about Bullish/Bearish Ratio and related EMAs
 
@@ -71,7 +194,11 @@ class Signals():
                 :groupby (str): feature name used within groupby with sentiment
                 :sentiment (str): feature name of Stocktwits Sentiment
                 :twits (DataFrame): DataFrame of twits with at least Stocktwits body and created_at features and Stocktwits Sentiment
-                :ema_list (list of int): default is empty
+                :ema_list (list of int): spans of the EMAs of the ratio, default is empty
+                :counts (DataFrame): optional, counts of each sentiment indexed by the values of groupby, like roll_up() of a cube,
+                    default the counts of the twits
+                :key (str): optional, feature name of the series of a panel, like the symbol, the ratios and the EMAs are calculated for each key
+                    and counts is indexed by key and groupby
             Returns:
                 a DataFrame with the new features:
                 {prefix}_bull, {prefix}_bear, {prefix}_bb_ratio and {prefix}_bb_ratio_{ema} for ema in ema_list
@@ -83,28 +210,42 @@ class Signals():
             if feature in twits.keys():
                 raise Warning('The feature named {} is already present: this method overwrites it!'.format(feature))
 
-        sentiments = twits[sentiment].unique()
-        for s in ['Bearish', 'Bullish']:
-            if s not in sentiments:
-                raise Exception('Stocktwits Sentiment named {} not found'.format(s))
-
-        bull_bear_df = twits.groupby([groupby, sentiment]).agg({'body': 'count'}).unstack().reset_index()
-        bull_bear_df.sort_values(groupby, inplace=True)
-        bull_bear_df['Bull/Bear Ratio'] = (bull_bear_df[('body', 'Bullish')]) / (bull_bear_df[('body', 'Bearish')])
-        
-        bb = pd.DataFrame()
-        bb[groupby] = bull_bear_df[groupby]
-        bb[f'{prefix}_bull'] = bull_bear_df[('body','Bullish')]
-        bb[f'{prefix}_bear'] = bull_bear_df[('body','Bearish')]
-        bb[f'{prefix}_bb_ratio'] = bull_bear_df['Bull/Bear Ratio']
+        keys = [] if key is None else [twits[key]]
+        if counts is None:
+            counts = twits['body'].groupby(keys + [twits[groupby], twits[sentiment]]).count().unstack(fill_value=0)
+        if key is None:
+            for s in ['Bearish', 'Bullish']:
+                if s not in counts.keys():
+                    raise Exception('Stocktwits Sentiment named {} not found'.format(s))
+        else:
+            # a key can miss a sentiment, add_signals() checks the whole panel
+            counts = counts.reindex(columns=['Bullish', 'Bearish'], fill_value=0)
 
-        for ema in ema_list:
-            exp_ema = bb[f'{prefix}_bb_ratio'].ewm(com=0.5, adjust=False).mean()
-            bb[f'{prefix}_bb_ratio_{ema}'] = exp_ema
-        
-        return twits.merge(bb)
+        # the periods without Bullish or Bearish twits have a NaN count, so a NaN ratio skipped by the EMAs
+        counts = counts[['Bullish', 'Bearish']].sort_index()
+        if (counts == 0).any().any():
+            counts = counts.astype(np.float64).where(counts > 0)
+        bull = counts['Bullish'].to_numpy()
+        bear = counts['Bearish'].to_numpy()
+        ratio = bull / bear
+        emas = self.ema(ratio, ema_list, segments=None if key is None else counts.index.codes[0])
 
-    def add_signals(self, prefix, sentiment, twits, ema_list = [5, 6, 7, 8, 9, 10, 15, 20]):
+        # each row takes the values of its period by an index lookup, without merging the twits
+        codes, periods = pd.factorize(twits[groupby], use_na_sentinel=False)
+        if key is not None:
+            # the pairs of key and period are factorized by their codes, without building a tuple for each row
+            key_codes, key_values = pd.factorize(twits[key], use_na_sentinel=False)
+            codes, pairs = pd.factorize(key_codes * len(periods) + codes)
+            periods = pd.MultiIndex.from_arrays([key_values.take(pairs // len(periods)), periods.take(pairs % len(periods))])
+        positions = counts.index.get_indexer(periods)[codes]
+        twits[f'{prefix}_bull'] = self.broadcast(bull, positions)
+        twits[f'{prefix}_bear'] = self.broadcast(bear, positions)
+        twits[f'{prefix}_bb_ratio'] = self.broadcast(ratio, positions)
+        for index, ema in enumerate(ema_list):
+            twits[f'{prefix}_bb_ratio_{ema}'] = self.broadcast(emas[:, index], positions)
+        return twits
+
+    def add_signals(self, prefix, sentiment, twits, ema_list = [5, 6, 7, 8, 9, 10, 15, 20], key = None, workers = None):
         """
         add features in your DataFrame about datetime, statistics of Stocktwits Sentiment and related EMAs
 
@@ -112,13 +253,182 @@ class Signals():
                 :prefix (str): prefix of the new features name
                 :sentiment (str): feature name of Stocktwits Sentiment
                 :twits (DataFrame): DataFrame of twits with at least Stocktwits body and created_at features and Stocktwits Sentiment
-                :ema_list (list of int): default is [5, 6, 7, 8, 9, 10, 15, 20]
+                :ema_list (list of int): spans of the EMAs of the ratios, default is [5, 6, 7, 8, 9, 10, 15, 20]
+                :key (str): optional, feature name of the series of a panel, like the symbol: the features of each key are the ones
+                    of add_signals() on the twits of that key alone, calculated for all the keys by the same operations
+                :workers (int): optional, number of processes sharing the keys of a panel, default all in this process
             Returns:
                 a DataFrame with the new features:
                 datetime, date, time, hour, {prefix}_number, {prefix}_total_cum, {prefix}_day_cum, {prefix}_hour_cum,
                 {prefix}_bull, {prefix}_bear, {prefix}_bb_ratio and {prefix}_bb_ratio_{ema} for ema in ema_list
         """
-        twits = self.details(prefix, sentiment, twits)
-        twits = self.bull_bear_ratios(f'{prefix}_day', 'date', sentiment, twits, ema_list)
-        twits = self.bull_bear_ratios(f'{prefix}_hour', 'hour', sentiment, twits, ema_list)
+        if key is not None:
+            sentiments = twits[sentiment].unique()
+            for s in ['Bearish', 'Bullish']:
+                if s not in sentiments:
+                    raise Exception('Stocktwits Sentiment named {} not found'.format(s))
+            if workers is not None and workers > 1:
+                return self.add_panel_signals(prefix, sentiment, twits, ema_list, key, workers)
+        return self.add_key_signals(prefix, sentiment, twits, ema_list, key)
+
+    def add_key_signals(self, prefix, sentiment, twits, ema_list, key = None):
+        """
+        add the features of add_signals(), without checking the sentiments of a panel
+
+            Arguments:
+                :prefix (str): prefix of the new features name
+                :sentiment (str): feature name of Stocktwits Sentiment
+                :twits (DataFrame): DataFrame of twits
+                :ema_list (list of int): spans of the EMAs of the ratios
+                :key (str): optional, feature name of the series of a panel, like the symbol
+            Returns:
+                the DataFrame of add_signals()
+        """
+        twits = self.details(prefix, sentiment, twits, key)
+        # one scan of the rows, the days and the hours are rolled up from the counts by hour
+        cube = self.get_cube(sentiment, twits, key=key)
+        twits = self.bull_bear_ratios(f'{prefix}_day', 'date', sentiment, twits, ema_list, self.roll_up(cube, 'D', '%Y-%m-%d'), key)
+        twits = self.bull_bear_ratios(f'{prefix}_hour', 'hour', sentiment, twits, ema_list, self.roll_up(cube, 'h', '%Y-%m-%dT%H:59:59Z'), key)
+        return twits
+
+    def add_panel_signals(self, prefix, sentiment, twits, ema_list, key, workers):
+        """
+        add the features of a panel by more processes, each one with all the twits of some keys
+
+            Arguments:
+                :prefix (str): prefix of the new features name
+                :sentiment (str): feature name of Stocktwits Sentiment
+                :twits (DataFrame): DataFrame of twits of more keys
+                :ema_list (list of int): spans of the EMAs of the ratios
+                :key (str): feature name of the series of the panel, like the symbol
+                :workers (int): number of processes
+            Returns:
+                the DataFrame of add_signals() with the rows in the order of twits
+        """
+        codes, uniques = pd.factorize(twits[key])
+        workers = min(workers, max(len(uniques), 1))
+        groups = codes % workers
+        rows = [np.flatnonzero(groups == group) for group in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(self.add_key_signals, [prefix] * workers, [sentiment] * workers, [twits.iloc[group_rows] for group_rows in rows], [ema_list] * workers, [key] * workers))
+        return pd.concat(parts).iloc[np.argsort(np.concatenate(rows), kind='stable')]
+
+class OnlineSignals(Signals):
+    periods = [('day', 'date', 'D', '%Y-%m-%d'), ('hour', 'hour', 'h', '%Y-%m-%dT%H:59:59Z')]
+
+    def __init__(self, prefix, sentiment, ema_list = [5, 6, 7, 8, 9, 10, 15, 20]):
+        """
+        the signals of a live stream, updated by each batch of twits with the state of the previous ones:
+        the running totals, the counters and the Bullish and Bearish counts of the last day and hour, and the EMAs before them
+
+            Example:
+                from stocktwits_collector.signals import OnlineSignals
+                signals = OnlineSignals('tsla', 'sentiment')
+                for twits in batches:
+                    twits = signals.update(twits)
+
+            Arguments:
+                :prefix (str): prefix of the new features name
+                :sentiment (str): feature name of Stocktwits Sentiment
+                :ema_list (list of int): spans of the EMAs of the ratios, default is [5, 6, 7, 8, 9, 10, 15, 20]
+        """
+        self.prefix = prefix
+        self.sentiment = sentiment
+        self.ema_list = list(ema_list)
+        self.reset()
+
+    def reset(self):
+        """
+        forget the twits received, the next batch starts a new stream
+        """
+        self.total = 0
+        self.counters = {groupby: (None, 0) for name, groupby, freq, format in self.periods}
+        self.states = {name: None for name, groupby, freq, format in self.periods}
+
+    def add_counters(self, twits):
+        """
+        continue the cumulative sums of details() from the totals of the previous batches
+
+            Arguments:
+                :twits (DataFrame): the batch returned by details()
+        """
+        if len(twits) == 0:
+            return
+        twits[f'{self.prefix}_total_cum'] += self.total
+        self.total = int(twits[f'{self.prefix}_total_cum'].iloc[-1])
+        for name, groupby, freq, format in self.periods:
+            feature = f'{self.prefix}_{name}_cum'
+            period, value = self.counters[groupby]
+            if period is not None:
+                if (twits[groupby] < period).any():
+                    raise Exception('The twits must be sorted from the oldest message, a batch cannot go back to a previous period')
+                twits.loc[twits[groupby] == period, feature] += value
+            last = twits[groupby].max()
+            self.counters[groupby] = (last, int(twits.loc[twits[groupby] == last, feature].iloc[-1]))
+
+    def add_ratios(self, name, groupby, counts, twits):
+        """
+        add the Bullish/Bearish Ratio and the EMAs of the periods of the batch, continuing the counts and the EMAs of the last period
+
+            Arguments:
+                :name (str): day or hour
+                :groupby (str): feature name of the period, date or hour
+                :counts (DataFrame): counts of each sentiment of the batch indexed by period, like roll_up() of a cube
+                :twits (DataFrame): the batch returned by details()
+        """
+        prefix = f'{self.prefix}_{name}'
+        counts = counts.reindex(columns=['Bullish', 'Bearish'], fill_value=0).sort_index().astype(np.float64)
+        state = self.states[name]
+        initial = None
+        if state is not None:
+            # the twits of the last period without Bullish or Bearish twits in this batch keep the counts of the previous batches
+            if state['period'] not in counts.index and (twits[groupby] == state['period']).any():
+                counts.loc[state['period']] = 0
+                counts = counts.sort_index()
+            if len(counts) and counts.index[0] < state['period']:
+                raise Exception('The twits must be sorted from the oldest message, a batch cannot go back to a previous period')
+            if len(counts) and counts.index[0] == state['period']:
+                counts.iloc[0] += [state['bull'], state['bear']]
+                initial = state['before']
+            else:
+                initial = state['after']
+
+        # the periods without Bullish or Bearish twits have a NaN count, so a NaN ratio skipped by the EMAs
+        bull = counts['Bullish'].where(counts['Bullish'] > 0).to_numpy()
+        bear = counts['Bearish'].where(counts['Bearish'] > 0).to_numpy()
+        ratio = bull / bear
+        emas = self.ema(ratio, self.ema_list, initial)
+        if len(counts):
+            self.states[name] = {
+                'period': counts.index[-1],
+                'bull': counts['Bullish'].iloc[-1],
+                'bear': counts['Bearish'].iloc[-1],
+                'before': emas[-2] if len(counts) > 1 else (np.full(len(self.ema_list), np.nan) if initial is None else initial),
+                'after': emas[-1]
+            }
+
+        codes, periods = pd.factorize(twits[groupby], use_na_sentinel=False)
+        positions = counts.index.get_indexer(periods)[codes]
+        twits[f'{prefix}_bull'] = self.broadcast(bull, positions)
+        twits[f'{prefix}_bear'] = self.broadcast(bear, positions)
+        twits[f'{prefix}_bb_ratio'] = self.broadcast(ratio, positions)
+        for index, ema in enumerate(self.ema_list):
+            twits[f'{prefix}_bb_ratio_{ema}'] = self.broadcast(emas[:, index], positions)
+
+    def update(self, twits):
+        """
+        add the signals to a batch of new twits, in a time proportional to the batch and not to the twits received before:
+        each twit has the values that add_signals() gives to it on all the twits received up to this batch
+
+            Arguments:
+                :twits (DataFrame): DataFrame of twits sorted from the oldest message, newer than the ones of the previous batches,
+                    with at least Stocktwits body and created_at features and Stocktwits Sentiment
+            Returns:
+                a DataFrame with the features of add_signals(), the ratios are NaN until both Bullish and Bearish twits have been received
+        """
+        twits = self.details(self.prefix, self.sentiment, twits)
+        self.add_counters(twits)
+        cube = self.get_cube(self.sentiment, twits)
+        for name, groupby, freq, format in self.periods:
+            self.add_ratios(name, groupby, self.roll_up(cube, freq, format), twits)
         return twits
@@ -2,16 +2,164 @@
 
     A collection of methods to simplify your downloading
 
-    It is a part of https://github.com/p-hiroshige/stockTwitsAPI/blob/main/stockTwitFetchAPI/stocktwitapi.py 
+    It is a part of https://github.com/p-hiroshige/stockTwitsAPI/blob/main/stockTwitFetchAPI/stocktwitapi.py
     that it is missing of a PR approvation to fix an original API change
 """
+import time
+import random
+from email.utils import parsedate_to_datetime
 import requests
+from requests.adapters import HTTPAdapter
+import stocktwits_collector.codec as c
 
 class Streamer():
+    retry_status = [429, 500, 502, 503, 504]
 
-    def __init__(self):
-        self.url = "https://api.stocktwits.com/api/2/"
-        self.headers = {'Content-Type': 'application/json'}
+    def __init__(self, pool_size=10, timeout=30, url="https://api.stocktwits.com/api/2/", limiter=None, retries=5, backoff=1, max_backoff=30, cache=None, codec=None, metrics=None):
+        """
+        the requests share one session, so the connections are kept alive between the pages
+
+            Arguments:
+                :pool_size (int): number of connections kept alive per host, default 10
+                :timeout (float or tuple): seconds to wait for the server, or a (connect, read) tuple, default 30
+                :url (str): base url of the Stocktwits API
+                :limiter (RateLimiter): optional, the rate limiter shared by the requests
+                :retries (int): number of retries of a request failed, default 5
+                :backoff (float): seconds to wait before the first retry, doubled at each retry, default 1
+                :max_backoff (float): max seconds to wait before a retry without Retry-After header, default 30
+                :cache (Cache): optional, the cache of the responses on disk
+                :codec (Codec): optional, the codec of the responses, default the fastest JSON library installed
+                :metrics (Metrics): optional, the metrics of the requests: latency, bytes, status and retries per endpoint
+        """
+        self.url = url
+        self.headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip, deflate'}
+        self.timeout = timeout
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache = cache
+        self.codec = c.Codec() if codec is None else codec
+        self.metrics = metrics
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self):
+        """
+        close the connections kept alive by the session
+        """
+        self.session.close()
+
+    def get_backoff(self, attempt, retry_after=None):
+        """
+        get the seconds to wait before a retry
+
+            Arguments:
+                :attempt (int): number of the attempt failed, from 0
+                :retry_after (str): optional, value of the Retry-After header, in seconds or HTTP date
+            Returns:
+                the seconds of Retry-After when it is present, else the exponential backoff with jitter
+        """
+        if retry_after:
+            try:
+                return max(0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        backoff = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(backoff / 2, backoff)
+
+    def measure(self, endpoint, status, seconds, size):
+        """
+        update the metrics of a request, when the streamer has them
+
+            Arguments:
+                :endpoint (str): user or symbol
+                :status (str): HTTP status of the response, or error when there is no response
+                :seconds (float): seconds waited for the response
+                :size (int): bytes of the response
+        """
+        if self.metrics is None:
+            return
+        self.metrics.increment("stocktwits_requests_total", endpoint=endpoint, status=status)
+        self.metrics.observe("stocktwits_request_seconds", seconds, endpoint=endpoint)
+        self.metrics.increment("stocktwits_received_bytes_total", size, endpoint=endpoint)
+        self.metrics.increment("stocktwits_phase_seconds_total", seconds, phase="fetch")
+
+    def request(self, url, data, endpoint='stream'):
+        """
+        request a page to Stocktwits by the session, retrying it when the API is busy
+
+            Arguments:
+                :url (str): url of the stream
+                :data (dict): parameters of the request
+                :endpoint (str): optional, user or symbol, the label of the metrics
+            Returns:
+                raw_json (dict) = The JSON output unparsed
+        """
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                r = self.session.get(url, params=data, timeout=self.timeout)
+                self.measure(endpoint, str(r.status_code), time.perf_counter() - start, len(r.content))
+                if r.status_code == 200:
+                    if self.metrics is None:
+                        return self.codec.loads(r.content)
+                    with self.metrics.timer("parse"):
+                        return self.codec.loads(r.content)
+                error = Exception('Unable to Return Request {}'.format(r.status_code))
+                if r.status_code not in self.retry_status:
+                    raise error
+                retry_after = r.headers.get('Retry-After')
+            except requests.exceptions.RequestException as exception:
+                self.measure(endpoint, 'error', time.perf_counter() - start, 0)
+                error = Exception('Unable to Return Request {}'.format(exception))
+            if attempt >= self.retries:
+                raise error
+            if self.metrics is not None:
+                self.metrics.increment("stocktwits_retries_total", endpoint=endpoint)
+            wait = self.get_backoff(attempt, retry_after)
+            if retry_after and self.limiter is not None:
+                self.limiter.hold(wait)
+            else:
+                time.sleep(wait)
+            attempt += 1
+
+    def cached_request(self, endpoint, id, url, data):
+        """
+        request a page to Stocktwits, or read it from the cache when its window is closed
+
+            Arguments:
+                :endpoint (str): user or symbol
+                :id (str): name of the user or symbol
+                :url (str): url of the stream
+                :data (dict): parameters of the request
+            Returns:
+                raw_json (dict) = The JSON output unparsed
+        """
+        if self.cache is None:
+            return self.request(url, data, endpoint)
+        key = self.cache.get_key(endpoint, id, data['since'], data['max'], data['limit'])
+        if self.cache.offline or self.cache.is_cacheable(data['since'], data['max']):
+            raw_json = self.cache.get(key)
+            if raw_json is not None:
+                if self.metrics is not None:
+                    self.metrics.increment("stocktwits_cache_hits_total", endpoint=endpoint)
+                return raw_json
+        if self.cache.offline:
+            raise Exception('Unable to Return Request {}/{} offline'.format(endpoint, id))
+        raw_json = self.request(url, data, endpoint)
+        self.cache.set(key, raw_json)
+        return raw_json
 
     def get_user_msgs(self, user_id, since=0, max=0, limit=0, callback=None, filter=None):
 
@@ -44,12 +192,7 @@ class Streamer():
                  # 'filter': '{}'.format(filter)
                 }
 
-        r = requests.get(url, headers=self.headers, params=data)
-        if r.status_code != 200:
-            raise Exception('Unable to Return Request {}'.format(r.status_code))
-
-        raw_json = r.json()
-        return raw_json
+        return self.cached_request('user', user_id, url, data)
 
     def get_symbol_msgs(self, symbol_id, since=0, max=0, limit=0, callback=None, filter=None):
 
@@ -82,9 +225,4 @@ class Streamer():
                  # 'filter': '{}'.format(filter)
                 }
 
-        r = requests.get(url, headers=self.headers, params=data)
-        if r.status_code != 200:
-            raise Exception('Unable to Return Request {}'.format(r.status_code))
-
-        raw_json = r.json()
-        return raw_json
+        return self.cached_request('symbol', symbol_id, url, data)
@@ -0,0 +1,194 @@
+"""The class for sharing the tasks of a collection between more processes and machines
+
+    A job is split by the Collector in one task per stream and chunk, saved on a SQLite file:
+    each worker leases a task, saves its chunk and completes it, so no task is collected twice.
+    The lease of a worker that stops without completing its task expires, and the task is leased again by another worker,
+    up to max_attempts times. The file needs no external service, only a file system with working locks shared by the workers
+
+        Example:
+            from stocktwits_collector.collector import Collector
+            from stocktwits_collector.taskqueue import TaskQueue
+            # coordinator
+            Collector().enqueue(TaskQueue('tasks.db'), {'symbols': ['TSLA', 'AAPL'], 'start': '2022-03-01T00:00:00Z', 'end': '2022-04-01T00:00:00Z'})
+            # each worker, on any process or machine
+            Collector().work(TaskQueue('tasks.db'))
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+
+class TaskQueue():
+    statuses = ["pending", "leased", "done", "failed"]
+
+    def __init__(self, path, lease_seconds = 600, max_attempts = 5):
+        """
+        the queue is created with its table when it does not exist
+
+            Arguments:
+                :path (str): name of the SQLite file shared by the workers
+                :lease_seconds (float): optional, seconds after which a task leased and not completed can be leased again, default 600
+                :max_attempts (int): optional, number of leases of a task before it fails, default 5
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        # autocommit, so each lease is one explicit BEGIN IMMEDIATE transaction
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                event TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                leased_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, leased_until)")
+
+    def get_worker(self):
+        """
+        get the default name of a worker
+
+            Returns:
+                the host name and the process ID
+        """
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def put(self, tasks):
+        """
+        add the tasks, the ones with a key already in the queue are ignored, so a job can be added again
+
+            Arguments:
+                :tasks (list of tuple): key (str) and event (dict) of each task
+            Returns:
+                the number of tasks added
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                before = self.connection.total_changes
+                self.connection.executemany("INSERT OR IGNORE INTO tasks (key, event, status) VALUES (?, ?, 'pending')", [(key, json.dumps(event)) for key, event in tasks])
+                added = self.connection.total_changes - before
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return added
+
+    def lease(self, worker = None):
+        """
+        lease the first task pending, or leased by a worker whose lease has expired
+
+            Arguments:
+                :worker (str): optional, name of the worker, default host name and process ID
+            Returns:
+                a dictionary with id, key, event, worker and attempts of the task, None when no task can be leased
+        """
+        worker = self.get_worker() if worker is None else worker
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.execute("UPDATE tasks SET status = 'failed', error = 'lease expired' WHERE status = 'leased' AND leased_until < ? AND attempts >= ?", (now, self.max_attempts))
+                row = self.connection.execute("SELECT id, key, event, attempts FROM tasks WHERE status = 'pending' OR (status = 'leased' AND leased_until < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+                if row is not None:
+                    self.connection.execute("UPDATE tasks SET status = 'leased', worker = ?, leased_until = ?, attempts = attempts + 1 WHERE id = ?", (worker, now + self.lease_seconds, row[0]))
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "key": row[1], "event": json.loads(row[2]), "worker": worker, "attempts": row[3] + 1}
+
+    def update(self, task, query, params):
+        with self.lock:
+            cursor = self.connection.execute(f"{query} WHERE id = ? AND status = 'leased' AND worker = ?", tuple(params) + (task["id"], task["worker"]))
+        return cursor.rowcount == 1
+
+    def renew(self, task):
+        """
+        extend the lease of a task still running
+
+            Arguments:
+                :task (dict): the task returned by lease()
+            Returns:
+                a boolean, False if the lease has been lost
+        """
+        return self.update(task, "UPDATE tasks SET leased_until = ?", [time.time() + self.lease_seconds])
+
+    def complete(self, task, result = None):
+        """
+        complete a task, only when its lease is still held by the worker
+
+            Arguments:
+                :task (dict): the task returned by lease()
+                :result (mix): optional, value saved as JSON with the task
+            Returns:
+                a boolean, False if the lease has been lost and another worker has the task
+        """
+        return self.update(task, "UPDATE tasks SET status = 'done', leased_until = NULL, result = ?", [json.dumps(result)])
+
+    def fail(self, task, error):
+        """
+        release a task failed, so it can be leased again until max_attempts
+
+            Arguments:
+                :task (dict): the task returned by lease()
+                :error (str): description of the error
+            Returns:
+                a boolean, False if the lease has been lost
+        """
+        status = "failed" if task["attempts"] >= self.max_attempts else "pending"
+        return self.update(task, "UPDATE tasks SET status = ?, leased_until = NULL, error = ?", [status, str(error)])
+
+    def get_counts(self):
+        """
+        get the number of tasks by status
+
+            Returns:
+                dictionary with pending, leased, done and failed
+        """
+        counts = dict.fromkeys(self.statuses, 0)
+        with self.lock:
+            rows = self.connection.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        for status, count in rows:
+            counts[status] = count
+        return counts
+
+    def get_tasks(self, status = None):
+        """
+        get the tasks of the queue
+
+            Arguments:
+                :status (str): optional, pending, leased, done or failed, default all
+            Returns:
+                list of dictionaries with id, key, event, status, worker, attempts, result and error
+        """
+        query = "SELECT id, key, event, status, worker, attempts, result, error FROM tasks"
+        with self.lock:
+            rows = self.connection.execute(f"{query} WHERE status = ? ORDER BY id" if status else f"{query} ORDER BY id", (status,) if status else ()).fetchall()
+        return [{
+            "id": row[0],
+            "key": row[1],
+            "event": json.loads(row[2]),
+            "status": row[3],
+            "worker": row[4],
+            "attempts": row[5],
+            "result": json.loads(row[6]) if row[6] is not None else None,
+            "error": row[7]
+        } for row in rows]
+
+    def close(self):
+        """
+        close the connection to the queue
+        """
+        self.connection.close()
@@ -0,0 +1,178 @@
+"""The class for writing the chunks of messages on files
+
+    The format is selected by the key format of the event of save_history():
+
+    * json, one array of messages per file, the default
+    * jsonl, one message per line, so a file can be appended and read line by line
+    * jsonl.gz and jsonl.zst, JSON Lines compressed by gzip or by zstandard (it requires the package zstandard)
+    * parquet, one column per field with a flattened schema, so the columns can be read alone (it requires the package pyarrow)
+
+        Example:
+            from stocktwits_collector.writer import Writer
+            writer = Writer('parquet')
+            writer.write('history.20220404.parquet', messages)
+            df = writer.read_frame('history.20220404.parquet', columns=['created_at', 'entities.sentiment.basic'])
+"""
+import io
+import gzip
+import stocktwits_collector.message as m
+import stocktwits_collector.codec as c
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+class Writer():
+    suffixes = {"json": ".json", "jsonl": ".jsonl", "jsonl.gz": ".jsonl.gz", "jsonl.zst": ".jsonl.zst", "parquet": ".parquet"}
+    columns = ["id", "created_at", "body", "user.id", "user.username", "symbols", "entities.sentiment.basic"]
+
+    def __init__(self, format = "json", codec = None):
+        """
+        the format is checked when the writer is created, so save_history() fails before downloading
+
+            Arguments:
+                :format (str): json, jsonl, jsonl.gz, jsonl.zst or parquet, default json
+                :codec (Codec): optional, the codec of the JSON formats, default the fastest JSON library installed
+        """
+        if format not in self.suffixes:
+            raise Exception(f'The format {format} is not supported, use one of {", ".join(self.suffixes)}')
+        if format == "jsonl.zst" and zstandard is None:
+            raise Exception('The format jsonl.zst requires the package zstandard')
+        if format == "parquet" and pyarrow is None:
+            raise Exception('The format parquet requires the package pyarrow')
+        self.format = format
+        self.suffix = self.suffixes[format]
+        self.codec = c.Codec() if codec is None else codec
+
+    def open(self, filename, mode):
+        """
+        open a JSON Lines file as text, compressed by the format
+
+            Arguments:
+                :filename (str): name of the file
+                :mode (str): r, w or a
+            Returns:
+                the file object
+        """
+        if self.format == "jsonl.gz":
+            return gzip.open(filename, f"{mode}t", encoding="utf-8")
+        if self.format == "jsonl.zst":
+            if mode == "r":
+                return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"), read_across_frames=True), encoding="utf-8")
+            return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(filename, f"{mode}b")), encoding="utf-8")
+        return open(filename, mode, encoding="utf-8")
+
+    def flatten(self, message):
+        """
+        flatten a message on the columns of the writer
+
+            Arguments:
+                :message (dict or Message): message of the API, also projected, or a row already flattened
+            Returns:
+                dictionary with a key for each column, symbols is the list of the symbols names
+        """
+        if isinstance(message, m.Message):
+            return {
+                "id": message.id,
+                "created_at": message.created_at,
+                "body": message.body,
+                "user.id": None,
+                "user.username": message.username,
+                "symbols": list(message.symbols),
+                "entities.sentiment.basic": message.sentiment
+            }
+        if "user.username" in message:
+            return {column: message.get(column) for column in self.columns}
+        user = message.get("user") or {}
+        sentiment = (message.get("entities") or {}).get("sentiment") or {}
+        return {
+            "id": message.get("id"),
+            "created_at": message.get("created_at"),
+            "body": message.get("body"),
+            "user.id": user.get("id"),
+            "user.username": user.get("username"),
+            "symbols": [symbol["symbol"] for symbol in message.get("symbols") or []],
+            "entities.sentiment.basic": sentiment.get("basic")
+        }
+
+    def get_table(self, messages):
+        """
+        get the Arrow table of the messages flattened
+
+            Arguments:
+                :messages (list[dict]): list of messages
+            Returns:
+                a pyarrow.Table
+        """
+        schema = pyarrow.schema([
+            ("id", pyarrow.int64()),
+            ("created_at", pyarrow.string()),
+            ("body", pyarrow.string()),
+            ("user.id", pyarrow.int64()),
+            ("user.username", pyarrow.string()),
+            ("symbols", pyarrow.list_(pyarrow.string())),
+            ("entities.sentiment.basic", pyarrow.string())
+        ])
+        return pyarrow.Table.from_pylist([self.flatten(message) for message in messages], schema=schema)
+
+    def write(self, filename, messages, append = False):
+        """
+        write the messages on a file
+
+            Arguments:
+                :filename (str): name of the file
+                :messages (list[dict]): list of messages, also Message records
+                :append (bool): optional, if True, the messages are added at the end of the file, only for JSON Lines
+        """
+        if append and self.format in ["json", "parquet"]:
+            raise Exception(f'The format {self.format} cannot be appended')
+        if self.format == "json":
+            with open(filename, "w", encoding="utf-8") as fh:
+                fh.write(self.codec.dumps(messages))
+        elif self.format == "parquet":
+            pyarrow.parquet.write_table(self.get_table(messages), filename)
+        else:
+            with self.open(filename, "a" if append else "w") as fh:
+                for message in messages:
+                    fh.write(self.codec.dumps(message))
+                    fh.write("\n")
+
+    def read(self, filename):
+        """
+        read the messages of a file
+
+            Arguments:
+                :filename (str): name of the file
+            Returns:
+                list of messages, flattened when the format is parquet
+        """
+        if self.format == "json":
+            with open(filename, "r", encoding="utf-8") as fh:
+                return self.codec.loads(fh.read())
+        if self.format == "parquet":
+            return pyarrow.parquet.read_table(filename).to_pylist()
+        with self.open(filename, "r") as fh:
+            return [self.codec.loads(line) for line in fh if line.strip()]
+
+    def read_frame(self, filename, columns = None):
+        """
+        read the messages of a file as a pandas DataFrame with the flattened columns
+
+            Arguments:
+                :filename (str): name of the file
+                :columns (list of str): optional, names of the columns, default all: the parquet format reads only those ones
+            Returns:
+                a DataFrame with a row for each message
+        """
+        columns = self.columns if columns is None else columns
+        if self.format == "parquet":
+            return pyarrow.parquet.read_table(filename, columns=columns).to_pandas()
+        import pandas as pd
+        return pd.DataFrame([self.flatten(message) for message in self.read(filename)], columns=columns)
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+class SyntheticStreamer():
+    """
+    streamer with synthetic messages, one every interval seconds,
+    paged like the Stocktwits API: newest first, ID greater than since and less than or equal to max
+    """
+    def __init__(self, messages = 300, last_id = 500000000, last_date = "2022-04-05T10:00:00Z", interval = 1200, step = 7):
+        self.messages = messages
+        self.last_id = last_id
+        self.last_date = datetime.strptime(last_date, "%Y-%m-%dT%H:%M:%SZ")
+        self.interval = interval
+        self.step = step
+        self.requests = []
+    def get_message(self, kind, stream, index):
+        id = self.last_id - index * self.step
+        created_at = self.last_date - timedelta(seconds=index * self.interval)
+        return {
+            "id": id,
+            "body": f"message {id}",
+            "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "user": {"id": 1, "username": stream if kind == "user" else "user"},
+            "symbols": [{"id": 1, "symbol": stream if kind == "symbol" else "TSLA"}],
+            "entities": {"sentiment": {"basic": "Bullish" if index % 3 else "Bearish"}}
+        }
+    def get_page(self, kind, stream, since, max, limit):
+        self.requests.append((kind, stream, since, max, limit))
+        limit = 30 if limit <= 0 or limit > 30 else limit
+        first = 0 if max <= 0 else -((max - self.last_id) // self.step)
+        messages = []
+        for index in range(first, self.messages):
+            message = self.get_message(kind, stream, index)
+            if message["id"] <= since or len(messages) == limit:
+                break
+            messages.append(message)
+        return {"messages": messages}
+    def get_user_msgs(self, user_id, since=0, max=0, limit=0, callback=None, filter=None):
+        return self.get_page("user", user_id, since, max, limit)
+    def get_symbol_msgs(self, symbol_id, since=0, max=0, limit=0, callback=None, filter=None):
+        return self.get_page("symbol", symbol_id, since, max, limit)
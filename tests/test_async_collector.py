@@ -0,0 +1,131 @@
+import unittest
+import os
+import json
+import time
+import asyncio
+import threading
+from stocktwits_collector.collector import Collector
+from stocktwits_collector.async_collector import AsyncCollector
+from stocktwits_collector.async_streamer import AsyncStreamer
+from stocktwits_collector.taskqueue import TaskQueue
+from tests.test_collector import Streamer
+from tests.synthetic_streamer import SyntheticStreamer
+
+class SlowStreamer(Streamer):
+    running = 0
+    max_running = 0
+    def __init__(self):
+        Streamer.__init__(self)
+        self.lock = threading.Lock()
+    def get_symbol_msgs(self, symbol_id, since, max, limit, callback=None, filter=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = self.running if self.running > self.max_running else self.max_running
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return Streamer.get_symbol_msgs(self, symbol_id, since, max, limit, callback, filter)
+
+class TestService(unittest.TestCase):
+    c = None
+    ac = None
+    def __init__(self, *args, **kwargs):
+        self.c = Collector()
+        self.c.ts = Streamer()
+        self.ac = AsyncCollector()
+        self.ac.ts = AsyncStreamer(streamer=self.c.ts)
+        unittest.TestCase.__init__(self, *args, **kwargs)
+
+    def test_get_data(self):
+        for event in [{"users": ["ChartMill"]}, {"symbols": ["TSLA"]}, {"users": ["ChartMill"], "symbols": ["TSLA"]}, {"users": ["ChartMill", "Stocksavior14"], "symbols": ["TSLA"], "only_combo": True}]:
+            self.assertEqual(asyncio.run(self.ac.get_data(dict(event))), self.c.get_data(dict(event)))
+
+    def test_max_concurrency(self):
+        streamer = SlowStreamer()
+        ac = AsyncCollector()
+        ac.ts = AsyncStreamer(max_concurrency=3, streamer=streamer)
+        asyncio.run(ac.get_data({"symbols": ["TSLA"] * 10}))
+        self.assertEqual(streamer.max_running, 3)
+
+    def test_pool_size(self):
+        ac = AsyncCollector(max_concurrency=20, rate_limit=None)
+        self.assertEqual(ac.ts.streamer.session.get_adapter("https://")._pool_maxsize, 20)
+        self.assertEqual(ac.ts.executor._max_workers, 20)
+        self.assertIs(ac.ts.streamer.metrics, ac.metrics)
+        self.assertEqual(ac.counters["pages_fetched"], 0)
+        ac = AsyncCollector(pool_size=30, max_concurrency=20)
+        self.assertEqual(ac.ts.streamer.session.get_adapter("https://")._pool_maxsize, 30)
+        self.assertRaises(Exception, lambda: AsyncCollector(pool_size=5, max_concurrency=20))
+
+    def test_get_history(self):
+        event = {"users": ["ChartMill"], "start": "2022-04-03T16:20:00Z"}
+        self.assertEqual(asyncio.run(self.ac.get_history(event)), self.c.ts.um)
+        event = {"symbols": ["TSLA"], "start": "2022-04-03T17:01:11Z"}
+        self.assertEqual(asyncio.run(self.ac.get_history(event)), self.c.ts.sm)
+
+    def test_iter_messages(self):
+        async def take(event, count):
+            messages = []
+            async for message in self.ac.iter_messages(event):
+                messages.append(message)
+                if len(messages) == count:
+                    break
+            return messages
+        event = {"symbols": ["TSLA"], "start": "2022-04-03T17:01:11Z"}
+        self.assertEqual(asyncio.run(take(dict(event), 100)), self.c.ts.sm)
+        self.assertEqual(asyncio.run(take(dict(event), 2)), self.c.ts.smh)
+
+    def read_files(self, prefix):
+        files = {}
+        for file in sorted(os.listdir(".")):
+            if file.startswith(prefix):
+                with open(file, "r") as fh:
+                    files[file] = fh.read()
+                os.remove(file)
+        return files
+
+    def test_save_history(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-02T00:00:00Z", "filename_prefix": "async-history."}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300)
+        ac = AsyncCollector()
+        ac.ts = AsyncStreamer(streamer=SyntheticStreamer(interval=1300))
+        self.assertEqual(asyncio.run(ac.save_history(dict(event))), c.save_history(dict(event)))
+        files = self.read_files("async-history.")
+        self.assertTrue(len(files) > 0)
+        asyncio.run(ac.save_history(dict(event)))
+        self.assertEqual(self.read_files("async-history."), files)
+
+    def test_get_history_window(self):
+        event = {"symbols": ["TSLA"], "start": "2022-03-20T00:00:00Z", "end": "2022-03-22T00:00:00Z"}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=4000)
+        ac = AsyncCollector()
+        ac.ts = AsyncStreamer(streamer=SyntheticStreamer(interval=1300, messages=4000))
+        self.assertEqual(asyncio.run(ac.seek(dict(event), event["end"])), c.seek(dict(event), event["end"]))
+        self.assertEqual(asyncio.run(ac.get_history(dict(event))), c.get_history(dict(event)))
+
+    def test_work(self):
+        event = {"symbols": ["TSLA"], "start": "2022-03-20T00:00:00Z", "end": "2022-03-23T00:00:00Z", "filename_prefix": "async-queue-history."}
+        queue = TaskQueue("async-queue-test.db")
+        self.assertEqual(self.c.enqueue(queue, event), 3)
+        ac = AsyncCollector()
+        ac.ts = AsyncStreamer(streamer=SyntheticStreamer(interval=1300, messages=4000))
+        self.assertEqual(asyncio.run(ac.work(queue)), 3)
+        self.assertEqual(queue.get_counts(), {"pending": 0, "leased": 0, "done": 3, "failed": 0})
+        files = self.read_files("async-queue-history.")
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=4000)
+        c.save_history(dict(event, filename_prefix="async-queue-expected.TSLA."))
+        expected = {name.replace("async-queue-expected.", "async-queue-history."): messages for name, messages in self.read_files("async-queue-expected.").items()}
+        self.assertEqual(files, expected)
+        queue.close()
+        for filename in ["async-queue-test.db", "async-queue-test.db-wal", "async-queue-test.db-shm"]:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def test_tail(self):
+        self.assertRaises(NotImplementedError, lambda: self.ac.tail({"symbols": ["TSLA"]}, print))
+
+if __name__ == '__main__':
+    unittest.main()
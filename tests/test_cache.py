@@ -0,0 +1,81 @@
+import unittest
+import os
+import time
+import tempfile
+from unittest import mock
+from stocktwits_collector.cache import Cache
+
+class TestService(unittest.TestCase, Cache):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_key(self):
+        c = Cache(self.path)
+        self.assertEqual(c.get_key("symbol", "TSLA", 0, 10, 30), c.get_key("symbol", "TSLA", "0", "10", "30"))
+        self.assertNotEqual(c.get_key("symbol", "TSLA", 0, 10, 30), c.get_key("user", "TSLA", 0, 10, 30))
+        self.assertNotEqual(c.get_key("symbol", "TSLA", 0, 10, 30), c.get_key("symbol", "TSLA", 0, 11, 30))
+
+    def test_is_cacheable(self):
+        c = Cache(self.path)
+        self.assertFalse(c.is_cacheable("0", "0"))
+        self.assertFalse(c.is_cacheable("449479095", "0"))
+        self.assertTrue(c.is_cacheable("0", "449479095"))
+
+    def test_get_set(self):
+        c = Cache(self.path)
+        self.assertIsNone(c.get("key"))
+        c.set("key", {"messages": [{"id": 1}]})
+        self.assertEqual(c.get("key"), {"messages": [{"id": 1}]})
+        c.clear()
+        self.assertIsNone(c.get("key"))
+
+    def test_max_age(self):
+        c = Cache(self.path, max_age=60)
+        c.set("old", {"messages": []})
+        c.set("new", {"messages": []})
+        past = time.time() - 120
+        os.utime(c.get_file_name("old"), (past, past))
+        self.assertIsNone(c.get("old"))
+        self.assertFalse(os.path.isfile(c.get_file_name("old")))
+        self.assertEqual(c.get("new"), {"messages": []})
+
+    def test_max_size(self):
+        c = Cache(self.path)
+        c.set("first", {"messages": [{"id": 1}]})
+        size = os.path.getsize(c.get_file_name("first"))
+        c.max_size = size * 2 + size // 2
+        c.set("second", {"messages": [{"id": 2}]})
+        past = time.time() - 10
+        os.utime(c.get_file_name("first"), (past - 10, past - 10))
+        os.utime(c.get_file_name("second"), (past, past))
+        c.get("first")
+        c.set("third", {"messages": [{"id": 3}]})
+        self.assertEqual(c.get("first"), {"messages": [{"id": 1}]})
+        self.assertIsNone(c.get("second"))
+        self.assertEqual(c.get("third"), {"messages": [{"id": 3}]})
+
+    def test_scan_interval(self):
+        c = Cache(self.path, max_size=10 ** 9, scan_interval=20)
+        with mock.patch("os.listdir", wraps=os.listdir) as listdir:
+            for index in range(50):
+                c.set(f"key{index}", {"messages": [{"id": index}]})
+            # the first set and then every 20 sets
+            self.assertEqual(listdir.call_count, 3)
+        self.assertEqual(c.size, sum([os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path)]))
+        c.set("key0", {"messages": [{"id": 0, "body": "a longer body"}]})
+        c.get("key1")
+        os.utime(c.get_file_name("key1"), (time.time() - 60, time.time() - 60))
+        c.max_age = 30
+        self.assertIsNone(c.get("key1"))
+        self.assertEqual(c.size, sum([os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path)]))
+        c.max_size = c.size // 2
+        c.set("key50", {"messages": [{"id": 50}]})
+        self.assertLessEqual(c.size, c.max_size)
+        self.assertEqual(c.size, sum([os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path)]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import json
+from stocktwits_collector.codec import Codec
+from stocktwits_collector.message import Message
+
+class TestService(unittest.TestCase, Codec):
+    def __init__(self, *args, **kwargs):
+        with open('tests/symbol-msgs-all.json') as json_file:
+            self.messages = json.load(json_file)
+        unittest.TestCase.__init__(self, *args, **kwargs)
+
+    def get_codecs(self):
+        return [Codec(library) for library, module in Codec.libraries.items() if module is not None]
+
+    def test_library(self):
+        self.assertIn(Codec().library, Codec.libraries)
+        self.assertEqual(Codec("json").library, "json")
+        self.assertRaises(Exception, lambda: Codec("yaml"))
+
+    def test_loads(self):
+        page = json.dumps({"messages": self.messages})
+        for codec in self.get_codecs():
+            self.assertEqual(codec.loads(page), {"messages": self.messages})
+            self.assertEqual(codec.loads(page.encode()), {"messages": self.messages})
+            self.assertRaises(ValueError, lambda: codec.loads(b'{"messages": ['))
+
+    def test_dumps(self):
+        records = [Message.from_dict(message) for message in self.messages]
+        for codec in self.get_codecs():
+            self.assertEqual(json.loads(codec.dumps(self.messages)), self.messages)
+            self.assertEqual(json.loads(codec.dumps(records)), [record.to_dict() for record in records])
+
+    def test_dumps_bytes(self):
+        for codec in self.get_codecs():
+            self.assertEqual(codec.dumps_bytes(self.messages), codec.dumps(self.messages).encode())
+            self.assertEqual(codec.loads(codec.dumps_bytes({"messages": self.messages})), {"messages": self.messages})
+
+if __name__ == '__main__':
+    unittest.main()
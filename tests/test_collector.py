@@ -1,8 +1,14 @@
 import unittest
 import os
 import json
-from datetime import datetime
+import time
+import threading
+from unittest import mock
+from datetime import datetime, timedelta
 from stocktwits_collector.collector import Collector
+from stocktwits_collector.database import Database
+from stocktwits_collector.taskqueue import TaskQueue
+from tests.synthetic_streamer import SyntheticStreamer
 
 class Streamer():
     um = None
@@ -59,6 +65,45 @@ class Streamer():
             return {"messages": self.smt}
         #return {"messages": self.smt}
 
+class LiveStreamer():
+    """
+    one synthetic stream per symbol: HOT publishes new messages at each request, the other ones never
+    """
+    def __init__(self, symbols):
+        self.streams = {symbol: SyntheticStreamer(last_id = 500000000 + index) for index, symbol in enumerate(symbols)}
+        self.requests = []
+    def get_symbol_msgs(self, symbol_id, since, max, limit, callback=None, filter=None):
+        self.requests.append(symbol_id)
+        stream = self.streams[symbol_id]
+        if symbol_id == "HOT" and len(self.requests) > 1:
+            stream.last_id += 40 * stream.step
+            stream.last_date += timedelta(seconds=40 * stream.interval)
+            stream.messages += 40
+        return stream.get_symbol_msgs(symbol_id, since, max, limit)
+
+class FailingStreamer(SyntheticStreamer):
+    """
+    synthetic stream whose requests fail after the first pages
+    """
+    def __init__(self, pages, **kwargs):
+        SyntheticStreamer.__init__(self, **kwargs)
+        self.pages = pages
+    def get_page(self, kind, stream, since, max, limit):
+        if len(self.requests) >= self.pages:
+            raise Exception('Unable to Return Request 500')
+        return SyntheticStreamer.get_page(self, kind, stream, since, max, limit)
+
+class SlowStreamer(SyntheticStreamer):
+    """
+    synthetic stream whose requests take delay seconds
+    """
+    def __init__(self, delay, **kwargs):
+        SyntheticStreamer.__init__(self, **kwargs)
+        self.delay = delay
+    def get_page(self, kind, stream, since, max, limit):
+        time.sleep(self.delay)
+        return SyntheticStreamer.get_page(self, kind, stream, since, max, limit)
+
 class TestService(unittest.TestCase, Collector):
     c = None
     def __init__(self, *args, **kwargs):
@@ -83,10 +128,74 @@ class TestService(unittest.TestCase, Collector):
         event = {"symbols": ["TSLA"], "min": 449483123, "limit": 2}
         self.assertEqual(self.c.get_data(event), self.c.ts.smh)
 
+    def test_get_data_max(self):
+        c = Collector()
+        c.ts = SyntheticStreamer()
+        self.assertEqual(c.get_data({"symbols": ["TSLA"], "max": 499999986})[0]["id"], 499999986)
+
+    def test_get_projection(self):
+        self.assertEqual(self.c.get_projection(("body", "user.username", "symbols.symbol")), {"id": None, "created_at": None, "body": None, "user": {"username": None}, "symbols": {"symbol": None}})
+        self.assertEqual(self.c.get_projection(("user", "user.username")), {"id": None, "created_at": None, "user": None})
+        self.assertEqual(self.c.get_projection(("user.username", "user")), {"id": None, "created_at": None, "user": None})
+
+    def test_project_data(self):
+        messages = self.c.project_data(self.c.ts.sm, {"fields": ["body", "user.username", "symbols.symbol", "entities.sentiment.basic"]})
+        self.assertEqual(len(messages), len(self.c.ts.sm))
+        for message, original in zip(messages, self.c.ts.sm):
+            self.assertEqual(set(message.keys()), {"id", "created_at", "body", "user", "symbols", "entities"})
+            self.assertEqual(message["user"], {"username": original["user"]["username"]})
+            self.assertEqual(message["symbols"], [{"symbol": symbol["symbol"]} for symbol in original["symbols"]])
+            self.assertEqual(message["entities"]["sentiment"], original["entities"]["sentiment"] and {"basic": original["entities"]["sentiment"]["basic"]})
+        self.assertEqual(self.c.project_data(self.c.ts.sm, {}), self.c.ts.sm)
+        records = self.c.project_data(self.c.ts.sm, {"compact": True})
+        self.assertEqual([record.to_dict() for record in records], [record.to_dict() for record in self.c.project_data(messages, {"compact": True})])
+
+    def test_save_history_projected(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-03T00:00:00Z", "filename_prefix": "projected-history.", "fields": ["body", "user.username", "symbols.symbol", "entities.sentiment.basic"]}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300)
+        c.save_history(dict(event))
+        files = self.read_files("projected-history.")
+        c.ts = SyntheticStreamer(interval=1300)
+        c.save_history(dict(event, compact=True))
+        self.assertEqual(self.read_files("projected-history."), files)
+
+    def test_save_history_format(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-03T00:00:00Z", "filename_prefix": "format-history."}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300)
+        c.save_history(dict(event))
+        files = self.read_files("format-history.")
+        c.ts = SyntheticStreamer(interval=1300)
+        c.save_history(dict(event, format="jsonl.gz"))
+        names = sorted([file for file in os.listdir(".") if file.startswith("format-history.")])
+        self.assertEqual(names, [name.replace(".json", ".jsonl.gz") for name in files])
+        for name in names:
+            self.assertEqual(c.get_writer({"format": "jsonl.gz"}).read(name), files[name.replace(".jsonl.gz", ".json")])
+            os.remove(name)
+        self.assertRaises(Exception, lambda: c.save_history(dict(event, format="xml")))
+
     def test_is_younger(self):
         self.assertFalse(self.c.is_younger("2022-02-25T06:54:00Z", "2022-02-16T20:10:00Z"))
         self.assertTrue(self.c.is_younger("2022-02-16T20:10:00Z", "2022-02-25T06:54:00Z"))
 
+    def test_get_datetime(self):
+        self.assertEqual(self.c.get_datetime("2022-02-25T06:54:03Z"), datetime(2022, 2, 25, 6, 54, 3))
+
+    def test_get_chunk_key(self):
+        self.assertEqual(self.c.get_chunk_key("2022-02-25T06:54:00Z"), "2022-02-25")
+        self.assertEqual(self.c.get_chunk_key("2022-02-25T06:54:00Z", "week"), "08")
+        self.assertEqual(self.c.get_chunk_key("2022-02-25T06:54:00Z", "month"), "2022-02")
+
+    def test_find_chunk_border(self):
+        history = [{"id": 4, "created_at": "2022-02-25T06:54:00Z"}, {"id": 3, "created_at": "2022-02-21T20:10:00Z"}, {"id": 2, "created_at": "2022-02-21T10:10:00Z"}, {"id": 1, "created_at": "2022-02-16T20:10:00Z"}]
+        self.assertEqual(self.c.find_chunk_border(history, "2022-02-16T20:10:00Z"), 3)
+        self.assertEqual(self.c.find_chunk_border(history, "2022-02-21T00:00:00Z"), 1)
+        self.assertEqual(self.c.find_chunk_border(history, "2022-02-16T20:10:00Z", "month"), 0)
+        self.assertEqual(self.c.find_chunk_border(history, "2022-02-25T06:54:00Z", "day", False), 1)
+        self.assertEqual(self.c.find_chunk_border(history, "2022-02-25T06:54:00Z", "week", False), 3)
+        self.assertEqual(self.c.find_chunk_border([], "2022-02-25T06:54:00Z"), 0)
+
     def test_is_same_chunk(self):
         self.assertTrue(self.c.is_same_chunk("2022-02-25T06:54:00Z", "2022-02-25T20:10:00Z"))
         self.assertTrue(self.c.is_same_chunk("2022-02-25T06:54:00Z", "2022-02-25T20:10:00Z", chunk = "day"))
@@ -131,6 +240,402 @@ class TestService(unittest.TestCase, Collector):
         self.assertEqual(self.c.get_history(event), self.c.ts.sm)
         # @todo: min test
 
+    def test_iter_pages(self):
+        event = {"users": ["ChartMill"], "start": "2022-04-03T16:20:00Z"}
+        pages = list(self.c.iter_pages(event))
+        self.assertEqual(pages[0], self.c.ts.umh)
+        self.assertEqual([message for page in pages for message in page], self.c.ts.um)
+
+    def test_iter_messages(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-03T17:01:11Z"}
+        self.assertEqual(list(self.c.iter_messages(event)), self.c.ts.sm)
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        messages = c.iter_messages({"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z"})
+        for _ in range(31):
+            next(messages)
+        self.assertEqual(len(c.ts.requests), 2)
+
+    def test_get_bounds(self):
+        cursor = {"oldest_date": "2022-04-03T10:00:00Z", "min": 1000, "earliest_date": "2022-04-03T11:00:00Z", "max": 1100}
+        self.assertEqual(self.c.get_bounds({"start": "2022-04-03T00:00:00Z", "workers": 4}, cursor), [1000, 750, 500, 250, None])
+        self.assertEqual(self.c.get_bounds({"start": "2022-04-03T10:30:00Z", "workers": 4}, cursor), [1000, None])
+        cursor["earliest_date"] = cursor["oldest_date"]
+        self.assertEqual(self.c.get_bounds({"start": "2022-04-03T00:00:00Z", "workers": 4}, cursor), [1000, None])
+
+    def test_get_parallel_history(self):
+        for start in ["2022-04-05T09:00:00Z", "2022-04-03T07:00:00Z", "2022-04-01T00:00:00Z"]:
+            c = Collector()
+            c.ts = SyntheticStreamer(interval=1300, messages=400)
+            history = c.get_history({"symbols": ["TSLA"], "start": start})
+            for workers in [2, 3, 8]:
+                c.ts = SyntheticStreamer(interval=1300, messages=400)
+                c.reset_counters()
+                parallel_history = c.get_history({"symbols": ["TSLA"], "start": start, "workers": workers})
+                self.assertEqual(c.counters["pages_fetched"], len(c.ts.requests))
+                ids = [message["id"] for message in parallel_history]
+                self.assertEqual(ids, sorted(set(ids), reverse=True))
+                self.assertEqual([message for message in parallel_history if message["created_at"] >= start], [message for message in history if message["created_at"] >= start])
+                self.assertTrue(parallel_history[-1]["created_at"] <= start or start > history[-1]["created_at"])
+
+    def test_count(self):
+        c = Collector()
+        threads = [threading.Thread(target=lambda: [c.count("pages_fetched") for i in range(10000)]) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(c.counters["pages_fetched"], 80000)
+
+    def test_save_parallel_history(self):
+        files = []
+        for workers in [1, 4]:
+            c = Collector()
+            c.ts = SyntheticStreamer(interval=1300, messages=400)
+            c.save_history({"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "workers": workers, "filename_prefix": "parallel-history."})
+            files.append(self.read_files("parallel-history."))
+        self.assertEqual(len(files[0]), 5)
+        self.assertEqual(files[0], files[1])
+
+    def test_save_history_single_pass(self):
+        start = "2022-04-01T00:00:00Z"
+        for chunk, amount in [("day", 5), ("week", 2), ("month", 1)]:
+            c = Collector()
+            c.ts = SyntheticStreamer(interval=1300, messages=400)
+            history = c.get_history({"symbols": ["TSLA"], "start": start})
+            c.ts = SyntheticStreamer(interval=1300, messages=400)
+            next_chunk = c.save_history({"symbols": ["TSLA"], "start": start, "chunk": chunk, "filename_prefix": "single-pass-history."})
+            files = self.read_files("single-pass-history.")
+            self.assertEqual(len(files), amount)
+            self.assertEqual(c.counters["pages_fetched"], c.counters["pages_used"])
+            self.assertEqual(len(c.ts.requests), len(set(c.ts.requests)))
+            saved = [message for name in sorted(files, reverse=True) for message in files[name]]
+            self.assertEqual(saved, [message for message in history if message["created_at"] >= start])
+            for name, messages in files.items():
+                self.assertEqual(len(set([c.get_date(chunk, message["created_at"]) for message in messages])), 1)
+                self.assertEqual(name, f'single-pass-history.{c.get_date(chunk, messages[0]["created_at"])[0:10].replace("-", "")}.json')
+            self.assertEqual(next_chunk["max"], saved[-1]["id"] - 1)
+
+    def test_save_history_next_chunk(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-03T00:00:00Z", "filename_prefix": "next-chunk-history."}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        next_chunk = c.save_history(dict(event))
+        first = self.read_files("next-chunk-history.")
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        c.save_history(next_chunk)
+        second = self.read_files("next-chunk-history.")
+        self.assertEqual(list(second), ["next-chunk-history.20220402.json"])
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        c.save_history(dict(event, start="2022-04-02T00:00:00Z"))
+        self.assertEqual(self.read_files("next-chunk-history."), dict(first, **second))
+
+    def test_save_history_metrics(self):
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        with self.assertLogs("stocktwits_collector.collector", level="INFO") as logs:
+            c.save_history({"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "filename_prefix": "metrics-history.", "is_verbose": True})
+        files = self.read_files("metrics-history.")
+        self.assertEqual(len(logs.records), len(files))
+        self.assertEqual(logs.records[0].stocktwits["count"], len(files[logs.records[0].stocktwits["file"]]))
+        self.assertEqual(c.metrics.get("stocktwits_pages_total"), c.counters["pages_fetched"])
+        self.assertEqual(c.metrics.get("stocktwits_chunks_saved_total"), len(files))
+        self.assertEqual(c.metrics.get("stocktwits_messages_total"), len(c.ts.requests) * 30)
+        for phase in ["clean", "write"]:
+            self.assertGreater(c.metrics.get("stocktwits_phase_seconds_total", phase=phase), 0)
+
+    def read_files(self, prefix):
+        files = {}
+        for file in sorted(os.listdir(".")):
+            if file.startswith(prefix):
+                with open(file, "r") as fh:
+                    files[file] = json.loads(fh.read())
+                os.remove(file)
+        return files
+
+    def test_save_history_checkpoint(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "filename_prefix": "checkpoint-history.", "checkpoint": "checkpoint.json", "resume": True}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        expected_chunk = c.save_history(dict(event))
+        expected_requests = len(c.ts.requests)
+        expected_files = self.read_files("checkpoint-history.")
+        os.remove("checkpoint.json")
+
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        get_page = c.ts.get_page
+        def broken_get_page(kind, stream, since, max, limit):
+            if len(c.ts.requests) == 8:
+                raise Exception("Unable to Return Request 504")
+            return get_page(kind, stream, since, max, limit)
+        c.ts.get_page = broken_get_page
+        self.assertRaises(Exception, lambda: c.save_history(dict(event)))
+        with open("checkpoint.json", "r") as fh:
+            checkpoint = json.loads(fh.read())
+        self.assertEqual(checkpoint["chunk"]["start"], "2022-04-01T00:00:00Z")
+
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        self.assertEqual(c.save_history(dict(event)), expected_chunk)
+        self.assertLess(len(c.ts.requests), expected_requests)
+        self.assertEqual(self.read_files("checkpoint-history."), expected_files)
+        self.assertRaises(Exception, lambda: c.save_history(self.c.update_event("start", "2022-03-01T00:00:00Z", event)))
+        os.remove("checkpoint.json")
+
+    def test_save_history_manifest(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "filename_prefix": "manifest-history.", "manifest": "manifest.json"}
+        c = Collector()
+        c.get_now = lambda: "2022-04-07T10:01:40Z"
+        c.ts = SyntheticStreamer(interval=1300, messages=533, last_id=500000000 + 133 * 7, last_date="2022-04-07T10:01:40Z")
+        c.save_history(self.c.update_event("manifest", "expected-manifest.json", event))
+        expected_requests = len(c.ts.requests)
+        expected_files = {name: [message["id"] for message in messages] for name, messages in self.read_files("manifest-history.").items()}
+        os.remove("expected-manifest.json")
+
+        c.get_now = lambda: "2022-04-05T10:00:00Z"
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        c.save_history(dict(event))
+        with open("manifest.json", "r") as fh:
+            manifest = json.loads(fh.read())
+        self.assertEqual(sorted(manifest["chunks"]), [f"2022-04-0{day}T00:00:00Z" for day in range(1, 6)])
+        self.assertFalse(manifest["chunks"]["2022-04-05T00:00:00Z"]["complete"])
+        self.assertTrue(all([manifest["chunks"][f"2022-04-0{day}T00:00:00Z"]["complete"] for day in range(1, 5)]))
+        entry = manifest["chunks"]["2022-04-02T00:00:00Z"]
+        with open(entry["file"], "r") as fh:
+            messages = json.loads(fh.read())
+        self.assertEqual(entry["count"], len(messages))
+        self.assertEqual([entry["max"], entry["min"]], [messages[0]["id"], messages[-1]["id"]])
+        self.assertEqual([entry["earliest_date"], entry["oldest_date"]], [messages[0]["created_at"], messages[-1]["created_at"]])
+        self.assertEqual(entry["symbols"], ["TSLA"])
+
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        c.save_history(dict(event))
+        self.assertEqual(len(c.ts.requests), 1)
+        self.assertEqual(c.counters["chunks_skipped"], 4)
+
+        c.get_now = lambda: "2022-04-07T10:01:40Z"
+        c.ts = SyntheticStreamer(interval=1300, messages=533, last_id=500000000 + 133 * 7, last_date="2022-04-07T10:01:40Z")
+        c.save_history(dict(event))
+        self.assertLess(len(c.ts.requests), expected_requests / 2)
+        self.assertEqual(c.counters["pages_fetched"], c.counters["pages_used"])
+        self.assertEqual({name: [message["id"] for message in messages] for name, messages in self.read_files("manifest-history.").items()}, expected_files)
+        self.assertRaises(Exception, lambda: c.save_history(self.c.update_event("chunk", "week", event)))
+        os.remove("manifest.json")
+
+    def test_seek(self):
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=4000)
+        history = c.get_history({"symbols": ["TSLA"], "start": "2022-03-01T00:00:00Z"})
+        for date in ["2022-04-05T11:00:00Z", "2022-04-03T00:00:00Z", "2022-03-20T12:34:56Z", "2022-03-01T00:00:00Z", "2022-02-01T00:00:00Z"]:
+            c.ts = SyntheticStreamer(interval=1300, messages=4000)
+            found = c.seek({"symbols": ["TSLA"]}, date)
+            newer = [message["id"] for message in history if message["created_at"] >= date]
+            self.assertEqual(found, newer[-1] if newer and len(newer) < len(history) else found)
+            self.assertTrue(all([message["created_at"] < date for message in history if message["id"] < found]))
+            # the date before the first message is found by bisection on the empty pages
+            self.assertLessEqual(len(c.ts.requests), 4 if date > history[-1]["created_at"] else 16)
+        c.ts = SyntheticStreamer(interval=1300, messages=4000)
+        self.assertEqual(c.seek({"symbols": ["TSLA"]}, "2022-04-05T11:00:00Z"), 0)
+        self.assertEqual(len(c.ts.requests), 1)
+
+    def test_save_history_window(self):
+        event = {"symbols": ["TSLA"], "start": "2022-03-20T00:00:00Z", "end": "2022-03-22T00:00:00Z", "filename_prefix": "window-history.", "manifest": "window-manifest.json"}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=4000)
+        history = c.get_history(dict(event))
+        self.assertEqual(history[0]["created_at"][0:10], "2022-03-21")
+        self.assertTrue(all([message["created_at"] < "2022-03-22T00:00:00Z" for message in history]))
+        history = [message for message in history if message["created_at"] >= "2022-03-20T00:00:00Z"]
+        self.assertLess(len(c.ts.requests), len(history) / 30 + 10)
+        c.ts = SyntheticStreamer(interval=1300, messages=4000)
+        c.save_history(dict(event))
+        self.assertEqual(c.counters["pages_fetched"], c.counters["pages_used"])
+        self.assertLess(len(c.ts.requests), len(history) / 30 + 10)
+        with open("window-manifest.json", "r") as fh:
+            manifest = json.loads(fh.read())
+        self.assertTrue(all([entry["complete"] for entry in manifest["chunks"].values()]))
+        files = self.read_files("window-history.")
+        self.assertEqual(sorted(files), ["window-history.20220320.json", "window-history.20220321.json"])
+        self.assertEqual([message for name in sorted(files, reverse=True) for message in files[name]], history)
+        os.remove("window-manifest.json")
+
+    def test_get_tasks(self):
+        tasks = self.c.get_tasks({"symbols": ["TSLA"], "users": ["ChartMill"], "start": "2022-03-30T12:00:00Z", "end": "2022-04-02T00:00:00Z", "chunk": "day"})
+        self.assertEqual([key for key, event in tasks], [
+            "user:ChartMill:2022-04-01T00:00:00Z:2022-04-02T00:00:00Z",
+            "user:ChartMill:2022-03-31T00:00:00Z:2022-04-01T00:00:00Z",
+            "user:ChartMill:2022-03-30T12:00:00Z:2022-03-31T00:00:00Z",
+            "symbol:TSLA:2022-04-01T00:00:00Z:2022-04-02T00:00:00Z",
+            "symbol:TSLA:2022-03-31T00:00:00Z:2022-04-01T00:00:00Z",
+            "symbol:TSLA:2022-03-30T12:00:00Z:2022-03-31T00:00:00Z"
+        ])
+        self.assertEqual(tasks[3][1], {"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "end": "2022-04-02T00:00:00Z", "chunk": "day", "filename_prefix": "history.TSLA.", "filename_suffix": ".json"})
+        self.assertEqual(len(self.c.get_tasks({"symbols": ["TSLA"], "start": "2022-03-01T00:00:00Z", "end": "2022-04-01T00:00:00Z", "chunk": "week"})), 5)
+        self.assertRaises(Exception, lambda: self.c.get_tasks({"symbols": ["TSLA"], "manifest": "manifest.json"}))
+
+    def test_work(self):
+        event = {"symbols": ["TSLA", "AAPL"], "start": "2022-03-20T00:00:00Z", "end": "2022-04-01T00:00:00Z", "filename_prefix": "queue-history."}
+        queue = TaskQueue("queue-test.db")
+        self.assertEqual(self.c.enqueue(queue, event), 24)
+        self.assertEqual(self.c.enqueue(queue, event), 0)
+        workers = [Collector() for index in range(3)]
+        completed = []
+        def work(c):
+            c.ts = SyntheticStreamer(interval=1300, messages=4000)
+            completed.append(c.work(TaskQueue("queue-test.db")))
+        threads = [threading.Thread(target=work, args=(c,)) for c in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(completed), 24)
+        self.assertEqual(queue.get_counts(), {"pending": 0, "leased": 0, "done": 24, "failed": 0})
+        self.assertEqual(sum([c.metrics.get("stocktwits_tasks_total", status="done") for c in workers]), 24)
+        files = self.read_files("queue-history.")
+        for symbol in ["TSLA", "AAPL"]:
+            c = Collector()
+            c.ts = SyntheticStreamer(interval=1300, messages=4000)
+            c.save_history(dict(event, symbols=[symbol], filename_prefix=f"queue-expected.{symbol}."))
+            expected = {name.replace("queue-expected.", "queue-history."): messages for name, messages in self.read_files("queue-expected.").items()}
+            self.assertEqual({name: messages for name, messages in files.items() if f".{symbol}." in name}, expected)
+        queue.close()
+        for filename in ["queue-test.db", "queue-test.db-wal", "queue-test.db-shm"]:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def test_work_lease_lost(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-03T00:00:00Z", "end": "2022-04-05T00:00:00Z", "filename_prefix": "lost-history."}
+        queue = TaskQueue("lost-test.db", lease_seconds=0.03, max_attempts=1)
+        self.assertEqual(self.c.enqueue(queue, event), 2)
+        c = Collector()
+        c.ts = SlowStreamer(0.05, interval=1300, messages=400)
+        with mock.patch.object(TaskQueue, "renew", return_value=False):
+            self.assertEqual(c.work(queue), 0)
+        self.assertEqual(self.read_files("lost-history."), {})
+        self.assertEqual(c.metrics.get("stocktwits_tasks_total", status="lost"), 2)
+        self.assertEqual(queue.get_counts()["failed"], 2)
+        self.assertIsNone(c.lease_lost)
+        queue.close()
+        for filename in ["lost-test.db", "lost-test.db-wal", "lost-test.db-shm"]:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def test_save_history_dedup(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "filename_prefix": "dedup-history."}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=533, last_id=500000000 + 133 * 7, last_date="2022-04-07T10:01:40Z")
+        c.save_history(dict(event))
+        expected_files = {name: [message["id"] for message in messages] for name, messages in self.read_files("dedup-history.").items()}
+
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        c.save_history(dict(event, start="2022-04-03T00:00:00Z", dedup="dedup.npy"))
+        saved = c.counters["pages_used"]
+        c.ts = SyntheticStreamer(interval=1300, messages=533, last_id=500000000 + 133 * 7, last_date="2022-04-07T10:01:40Z")
+        c.save_history(dict(event, dedup="dedup.npy"))
+        files = {name: [message["id"] for message in messages] for name, messages in self.read_files("dedup-history.").items()}
+        self.assertEqual(files, expected_files)
+        self.assertEqual(c.counters["duplicates"], len(files["dedup-history.20220403.json"]) + len(files["dedup-history.20220404.json"]) + 28)
+        duplicates = c.counters["duplicates"]
+        self.assertGreater(saved, 0)
+
+        c.ts = SyntheticStreamer(interval=1300, messages=533, last_id=500000000 + 133 * 7, last_date="2022-04-07T10:01:40Z")
+        c.save_history(dict(event, dedup="dedup.npy"))
+        self.assertEqual(self.read_files("dedup-history."), {})
+        self.assertEqual(c.counters["duplicates"], sum([len(ids) for ids in expected_files.values()]))
+        self.assertEqual(c.metrics.get("stocktwits_duplicates_total"), duplicates + c.counters["duplicates"])
+        os.remove("dedup.npy.log")
+
+    def test_save_history_dedup_merge(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "filename_prefix": "merge-history.", "database": "merge-test.db"}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        c.save_history(dict(event))
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        c.save_history(dict(event, dedup="ids.npy"))
+        self.assertEqual(c.counters["duplicates"], 0)
+        files = self.read_files("merge-history.")
+        ids = [message["id"] for messages in files.values() for message in messages]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertGreater(len(ids), 0)
+        db = Database("merge-test.db")
+        self.assertEqual(sorted(db.query()["id"].tolist()), sorted(ids))
+        db.close()
+        for name in ["ids.npy", "ids.npy.log", "merge-test.db", "merge-test.db-wal", "merge-test.db-shm"]:
+            if os.path.isfile(name):
+                os.remove(name)
+
+    def test_save_history_database(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "filename_prefix": "database-history.", "database": "collector-test.db"}
+        c = Collector()
+        c.ts = SyntheticStreamer(interval=1300, messages=400)
+        c.save_history(dict(event))
+        db = Database("collector-test.db")
+        twits = db.query(symbols=["TSLA"], start="2022-04-02T00:00:00Z", end="2022-04-03T00:00:00Z")
+        files = self.read_files("database-history.")
+        self.assertEqual(twits["id"].tolist(), [message["id"] for message in reversed(files["database-history.20220402.json"])])
+        self.assertEqual(sum([len(messages) for messages in files.values()]), len(db.query()))
+        db.close()
+        for name in ["collector-test.db", "collector-test.db-wal", "collector-test.db-shm"]:
+            if os.path.isfile(name):
+                os.remove(name)
+
+    def test_save_history_database_error(self):
+        event = {"symbols": ["TSLA"], "start": "2022-04-01T00:00:00Z", "filename_prefix": "error-history.", "database": "error-test.db"}
+        c = Collector()
+        c.ts = FailingStreamer(5, interval=1300, messages=400)
+        with mock.patch.object(Database, "close", autospec=True, side_effect=Database.close) as close:
+            self.assertRaises(Exception, lambda: c.save_history(dict(event)))
+        self.assertEqual(close.call_count, 1)
+        files = self.read_files("error-history.")
+        self.assertGreater(len(files), 0)
+        db = Database("error-test.db")
+        self.assertEqual(len(db.query()), sum([len(messages) for messages in files.values()]))
+        db.close()
+        for name in ["error-test.db", "error-test.db-wal", "error-test.db-shm"]:
+            if os.path.isfile(name):
+                os.remove(name)
+
+    def test_get_poll_interval(self):
+        self.assertEqual(self.c.get_poll_interval(0, 30, 5, 300), 300)
+        self.assertEqual(self.c.get_poll_interval(0.01, 30, 5, 300), 300)
+        self.assertEqual(self.c.get_poll_interval(1, 30, 5, 300), 15)
+        self.assertEqual(self.c.get_poll_interval(100, 30, 5, 300), 5)
+
+    def test_tail(self):
+        c = Collector()
+        c.ts = LiveStreamer(["HOT", "QUIET"])
+        batches = []
+        cursors = c.tail({"symbols": ["HOT", "QUIET"], "min_interval": 0.01, "max_interval": 0.2, "max_polls": 12}, batches.append)
+        self.assertGreater(c.ts.requests.count("HOT"), 2 * c.ts.requests.count("QUIET"))
+        ids = [message["id"] for batch in batches for message in batch if message["symbols"][0]["symbol"] == "HOT"]
+        self.assertEqual(sorted(ids), list(range(min(ids), max(ids) + 1, 7)))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(cursors["symbol:HOT"], max(ids))
+        self.assertEqual(cursors["symbol:QUIET"], 500000001)
+
+        c.ts = LiveStreamer(["HOT"])
+        batches = []
+        c.tail({"symbols": ["HOT"], "min": c.ts.streams["HOT"].last_id - 7, "min_interval": 0.01, "max_interval": 0.2, "max_polls": 2}, batches.append)
+        self.assertEqual([len(batch) for batch in batches], [1, 40])
+
+        for expected in [[30], []]:
+            c.ts = LiveStreamer(["QUIET"])
+            batches = []
+            c.tail({"symbols": ["QUIET"], "min_interval": 0.01, "max_interval": 0.2, "max_polls": 2, "dedup": "tail-dedup.npy"}, batches.append)
+            self.assertEqual([len(batch) for batch in batches], expected)
+        os.remove("tail-dedup.npy.log")
+
+    def test_tail_database_error(self):
+        def callback(messages):
+            raise Exception('callback failed')
+        c = Collector()
+        c.ts = LiveStreamer(["QUIET"])
+        with mock.patch.object(Database, "close", autospec=True, side_effect=Database.close) as close:
+            self.assertRaises(Exception, lambda: c.tail({"symbols": ["QUIET"], "min_interval": 0.01, "max_interval": 0.2, "max_polls": 2, "database": "tail-error-test.db"}, callback))
+        self.assertEqual(close.call_count, 1)
+        for name in ["tail-error-test.db", "tail-error-test.db-wal", "tail-error-test.db-shm"]:
+            if os.path.isfile(name):
+                os.remove(name)
+
     def test_get_date(self):
         date = datetime.now()
         self.assertEqual(self.c.get_date("day"), date.strftime("%Y-%m-%dT00:00:00Z"))
@@ -0,0 +1,62 @@
+import unittest
+import os
+import json
+from stocktwits_collector.database import Database
+from stocktwits_collector.message import Message
+from stocktwits_collector.signals import Signals
+
+class TestService(unittest.TestCase, Database):
+    path = "database-test.db"
+    def __init__(self, *args, **kwargs):
+        with open('tests/symbol-msgs-all.json') as json_file:
+            self.messages = json.load(json_file)
+        with open('tests/user-msgs-all.json') as json_file:
+            self.messages.extend(json.load(json_file))
+        unittest.TestCase.__init__(self, *args, **kwargs)
+
+    def tearDown(self):
+        for filename in [self.path, f"{self.path}-wal", f"{self.path}-shm"]:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def test_write(self):
+        db = Database(self.path, batch_size=7)
+        db.write(self.messages)
+        db.write(self.messages[:10])
+        ids = set([message["id"] for message in self.messages])
+        self.assertEqual(db.connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0], len(ids))
+        self.assertEqual(db.connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        db.write([Message.from_dict(message) for message in self.messages])
+        self.assertEqual(db.connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0], len(ids))
+        row = db.connection.execute("SELECT message FROM messages WHERE id = ?", [self.messages[0]["id"]]).fetchone()
+        self.assertEqual(json.loads(row[0]), self.messages[0])
+        db.close()
+
+    def test_query(self):
+        db = Database(self.path)
+        db.write(self.messages)
+        twits = db.query()
+        self.assertEqual(list(twits.columns), db.columns)
+        self.assertEqual(twits["created_at"].tolist(), sorted(twits["created_at"].tolist()))
+        dates = sorted([message["created_at"] for message in self.messages])
+        start, end = dates[len(dates) // 4], dates[len(dates) // 2]
+        tsla = [message for message in self.messages if "TSLA" in [symbol["symbol"] for symbol in message["symbols"]] and start <= message["created_at"] < end]
+        twits = db.query(symbols=["TSLA"], start=start, end=end)
+        self.assertEqual(sorted(twits["id"].tolist()), sorted(set([message["id"] for message in tsla])))
+        username = self.messages[-1]["user"]["username"]
+        twits = db.query(users=[username], columns=["id", "username"])
+        self.assertEqual(set(twits["username"]), {username})
+        self.assertEqual(len(twits), len(set([message["id"] for message in self.messages if message["user"]["username"] == username])))
+        plan = " ".join([row[-1] for row in db.connection.execute("EXPLAIN QUERY PLAN SELECT id FROM symbols WHERE symbol IN (?) AND created_at >= ?", ["TSLA", start])])
+        self.assertIn("PRIMARY KEY", plan)
+        db.close()
+
+    def test_signals(self):
+        db = Database(self.path)
+        db.write(self.messages)
+        twits = Signals().add_signals("my_prefix", "sentiment", db.query(), [5])
+        self.assertIn("my_prefix_day_bb_ratio_5", twits.columns)
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import glob
+from stocktwits_collector.idset import IdSet
+
+class TestService(unittest.TestCase, IdSet):
+    def remove(self, path):
+        for filename in glob.glob(f"{path}.*"):
+            os.remove(filename)
+
+    def test_contains(self):
+        ids = IdSet()
+        self.assertEqual(len(ids), 0)
+        self.assertFalse(1 in ids)
+        ids.update([5, 3, 9, 3])
+        self.assertEqual(len(ids), 3)
+        self.assertTrue(3 in ids)
+        self.assertFalse(4 in ids)
+        ids.merge()
+        self.assertEqual([run.tolist() for run in ids.runs], [[3, 5, 9]])
+        ids.update([4, 5, 10])
+        self.assertEqual(len(ids), 5)
+        ids.merge()
+        self.assertEqual([run.tolist() for run in ids.runs], [[3, 4, 5, 9, 10]])
+        self.assertTrue(all([id in ids for id in [3, 4, 5, 9, 10]]))
+        self.assertFalse(any([id in ids for id in [0, 6, 11]]))
+
+    def test_merge_blocks(self):
+        ids = IdSet(block_size=2)
+        first = [1, 4, 5, 8, 9, 20]
+        second = [2, 3, 4, 10, 11, 12, 13, 30]
+        blocks = list(ids.merge_blocks(first, second))
+        self.assertTrue(all([len(block) <= 4 for block in blocks]))
+        self.assertEqual([id for block in blocks for id in block], sorted(set(first + second)))
+
+    def test_save(self):
+        path = "idset-test"
+        ids = IdSet(path, buffer_size=4)
+        ids.update([1, 2, 3])
+        ids.save()
+        self.assertEqual(glob.glob(f"{path}.*.run"), [])
+        self.assertEqual(sorted(IdSet(path).pending), [1, 2, 3])
+        ids.update([3, 4, 5])
+        ids.save()
+        self.assertFalse(os.path.isfile(f"{path}.log"))
+        ids.update([7])
+        ids.save()
+        loaded = IdSet(path)
+        self.assertEqual([run.tolist() for run in loaded.runs], [[1, 2, 3, 4, 5]])
+        self.assertEqual(loaded.pending, {7})
+        self.assertEqual(len(loaded), 6)
+        self.assertTrue(7 in loaded and 4 in loaded and 6 not in loaded)
+        self.remove(path)
+
+    def test_save_runs(self):
+        path = "idset-runs-test"
+        ids = IdSet(path, buffer_size=4, block_size=3)
+        for start in range(0, 40, 4):
+            ids.update(range(start * 3 % 40, start * 3 % 40 + 4))
+            ids.save()
+        expected = sorted(set([id for start in range(0, 40, 4) for id in range(start * 3 % 40, start * 3 % 40 + 4)]))
+        loaded = IdSet(path)
+        self.assertEqual(len(glob.glob(f"{path}.*.tmp")), 0)
+        self.assertTrue(len(loaded.runs) <= 4)
+        self.assertTrue(all([len(loaded.runs[i]) > 2 * len(loaded.runs[i + 1]) for i in range(len(loaded.runs) - 1)]))
+        self.assertEqual(sorted([id for run in loaded.runs for id in run.tolist()] + list(loaded.pending)), expected)
+        self.assertTrue(all([id in loaded for id in expected]))
+        self.assertFalse(any([id in loaded for id in [-1, 41, 100]]))
+        self.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
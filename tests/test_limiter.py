@@ -0,0 +1,39 @@
+import unittest
+import time
+import threading
+from stocktwits_collector.limiter import RateLimiter
+
+class TestService(unittest.TestCase, RateLimiter):
+    def test_burst(self):
+        limiter = RateLimiter(5, 1)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_rate(self):
+        limiter = RateLimiter(20, 1, burst=1)
+        start = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertAlmostEqual(time.monotonic() - start, 0.5, delta=0.15)
+
+    def test_threads(self):
+        limiter = RateLimiter(20, 1, burst=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertAlmostEqual(time.monotonic() - start, 0.5, delta=0.15)
+
+    def test_hold(self):
+        limiter = RateLimiter(5, 1)
+        limiter.hold(0.3)
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertAlmostEqual(time.monotonic() - start, 0.3, delta=0.1)
+
+if __name__ == '__main__':
+    unittest.main()
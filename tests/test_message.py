@@ -0,0 +1,46 @@
+import unittest
+import json
+from stocktwits_collector.message import Message
+
+class TestService(unittest.TestCase, Message):
+    def __init__(self, *args, **kwargs):
+        with open('tests/symbol-msgs-all.json') as json_file:
+            self.messages = json.load(json_file)
+        unittest.TestCase.__init__(self, *args, **kwargs)
+
+    def test_from_dict(self):
+        message = self.messages[0]
+        record = Message.from_dict(message)
+        self.assertEqual(record.id, message["id"])
+        self.assertEqual(record.created_at, message["created_at"])
+        self.assertEqual(record.body, message["body"])
+        self.assertEqual(record.username, message["user"]["username"])
+        self.assertEqual(list(record.symbols), [symbol["symbol"] for symbol in message["symbols"]])
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_to_dict(self):
+        for message in self.messages:
+            record = Message.from_dict(message)
+            self.assertEqual(Message.from_dict(record.to_dict()), record)
+            self.assertEqual(json.loads(json.dumps(record, default=Message.to_dict)), record.to_dict())
+            sentiment = message["entities"]["sentiment"]
+            self.assertEqual(record.sentiment, None if sentiment is None else sentiment["basic"])
+
+    def test_getitem(self):
+        message = self.messages[0]
+        record = Message.from_dict(message)
+        self.assertEqual(record["id"], message["id"])
+        self.assertEqual(record["created_at"], message["created_at"])
+        self.assertEqual(record["user"]["username"], message["user"]["username"])
+        self.assertEqual(record["symbols"][0]["symbol"], message["symbols"][0]["symbol"])
+        self.assertRaises(KeyError, lambda: record["likes"])
+        for key in ["id", "created_at", "body", "user", "symbols", "entities"]:
+            self.assertEqual(record[key], record.to_dict()[key])
+
+    def test_hash(self):
+        records = [Message.from_dict(message) for message in self.messages]
+        self.assertEqual(len(set(records + [Message.from_dict(message) for message in self.messages])), len({message["id"] for message in self.messages}))
+        self.assertEqual(hash(records[0]), hash(Message.from_dict(self.messages[0])))
+
+if __name__ == '__main__':
+    unittest.main()
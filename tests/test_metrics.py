@@ -0,0 +1,59 @@
+import unittest
+import urllib.request
+from stocktwits_collector.metrics import Metrics
+
+class TestService(unittest.TestCase, Metrics):
+    def test_increment(self):
+        metrics = Metrics()
+        updates = []
+        metrics.add_callback(lambda kind, name, value, labels: updates.append((kind, name, value, labels)))
+        metrics.increment("stocktwits_requests_total", endpoint="symbol", status="200")
+        metrics.increment("stocktwits_requests_total", endpoint="symbol", status="429")
+        metrics.increment("stocktwits_requests_total", 2, endpoint="user", status="200")
+        self.assertEqual(metrics.get("stocktwits_requests_total"), 4)
+        self.assertEqual(metrics.get("stocktwits_requests_total", status="200"), 3)
+        self.assertEqual(metrics.get("stocktwits_requests_total", endpoint="symbol", status="200"), 1)
+        self.assertEqual(metrics.get("stocktwits_pages_total"), 0)
+        self.assertEqual(updates[-1], ("counter", "stocktwits_requests_total", 2, {"endpoint": "user", "status": "200"}))
+        self.assertGreater(metrics.get_rate("stocktwits_requests_total"), 0)
+        metrics.reset()
+        self.assertEqual(metrics.get("stocktwits_requests_total"), 0)
+
+    def test_observe(self):
+        metrics = Metrics(buckets=[1, 0.1])
+        for value in [0.05, 0.5, 2]:
+            metrics.observe("stocktwits_request_seconds", value, endpoint="symbol")
+        metrics.observe("stocktwits_request_seconds", 0.01, endpoint="user")
+        self.assertEqual(metrics.get_histogram("stocktwits_request_seconds", endpoint="symbol"), {"buckets": {0.1: 1, 1: 2}, "sum": 2.55, "count": 3})
+        self.assertEqual(metrics.get_histogram("stocktwits_request_seconds")["count"], 4)
+        with metrics.timer("write"):
+            pass
+        self.assertGreater(metrics.get("stocktwits_phase_seconds_total", phase="write"), 0)
+
+    def test_to_prometheus(self):
+        metrics = Metrics(buckets=[0.1, 1])
+        metrics.increment("stocktwits_pages_total", 3)
+        metrics.observe("stocktwits_request_seconds", 0.5, endpoint="symbol")
+        text = metrics.to_prometheus()
+        self.assertEqual(text.splitlines(), [
+            "# HELP stocktwits_pages_total pages fetched by the collector",
+            "# TYPE stocktwits_pages_total counter",
+            "stocktwits_pages_total 3",
+            "# HELP stocktwits_request_seconds latency of the requests to the API by endpoint",
+            "# TYPE stocktwits_request_seconds histogram",
+            'stocktwits_request_seconds_bucket{endpoint="symbol",le="0.1"} 0',
+            'stocktwits_request_seconds_bucket{endpoint="symbol",le="1"} 1',
+            'stocktwits_request_seconds_bucket{endpoint="symbol",le="+Inf"} 1',
+            'stocktwits_request_seconds_sum{endpoint="symbol"} 0.5',
+            'stocktwits_request_seconds_count{endpoint="symbol"} 1'
+        ])
+        server = metrics.serve(0)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                self.assertEqual(response.read().decode(), text)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
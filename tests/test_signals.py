@@ -1,7 +1,8 @@
 import unittest
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from stocktwits_collector.signals import Signals
+from stocktwits_collector.signals import Signals, OnlineSignals
 
 class TestService(unittest.TestCase, Signals):
     s = None
@@ -36,6 +37,106 @@ class TestService(unittest.TestCase, Signals):
         self.assertCountEqual(twits_enriched.keys(), features)
         self.assertListEqual(twits_enriched.keys().to_list(), features)
 
+    def test_details(self):
+        twits = pd.read_csv('tests/collection-ok.csv')
+        details = self.s.details('p', 'sentiment', twits.copy())
+        datetimes = twits['created_at'].apply(self.s.convert_datetime)
+        self.assertListEqual(details['datetime'].to_list(), datetimes.to_list())
+        self.assertListEqual(details['date'].to_list(), datetimes.dt.strftime('%Y-%m-%d').to_list())
+        self.assertListEqual(details['time'].to_list(), datetimes.dt.strftime('%H:%M:%SZ').to_list())
+        self.assertListEqual(details['hour'].to_list(), datetimes.dt.strftime('%Y-%m-%dT%H:59:59Z').to_list())
+        self.assertListEqual(details['p_number'].to_list(), twits['sentiment'].apply(self.s.convert_sentiment).to_list())
+        self.assertListEqual(details['p_day_cum'].to_list(), details.groupby('date')['p_number'].cumsum().to_list())
+        self.assertListEqual(details['p_hour_cum'].to_list(), details.groupby('hour')['p_number'].cumsum().to_list())
+
+    def test_ema(self):
+        values = np.random.default_rng(0).random(1000) * 3
+        values[[0, 1, 10, 31, 32, 500, 999]] = np.nan
+        spans = [1, 2, 5, 20, 200]
+        emas = self.s.ema(values, spans)
+        self.assertEqual(emas.shape, (1000, 5))
+        for index, span in enumerate(spans):
+            expected = pd.Series(values).ewm(span=span, adjust=False, ignore_na=True).mean().to_numpy()
+            np.testing.assert_allclose(emas[:, index], expected, rtol=1e-12)
+        self.assertTrue(np.isnan(self.s.ema([np.nan, np.nan], [5])).all())
+        self.assertEqual(self.s.ema(values, []).shape, (1000, 0))
+        self.assertRaises(Exception, lambda: self.s.ema(values, [0.5]))
+        segments = np.repeat([3, 1, 2], [400, 350, 250])
+        emas = self.s.ema(values, spans, segments=segments)
+        for segment in [3, 1, 2]:
+            np.testing.assert_allclose(emas[segments == segment], self.s.ema(values[segments == segment], spans), rtol=1e-12)
+
+    def test_cube(self):
+        twits = self.s.details('p', 'sentiment', pd.read_csv('tests/collection-ok.csv'))
+        twits['symbol'] = ['TSLA', 'AAPL', 'TSLA', 'AAPL', 'TSLA'][:len(twits)]
+        cube = self.s.get_cube('sentiment', twits, 'min')
+        self.assertEqual(cube.values.sum(), twits.dropna(subset=['sentiment'])['body'].count())
+        for groupby, freq, format in [('date', 'D', '%Y-%m-%d'), ('hour', 'h', '%Y-%m-%dT%H:59:59Z')]:
+            counts = twits.groupby([groupby, 'sentiment'])['body'].count().unstack(fill_value=0)
+            pd.testing.assert_frame_equal(self.s.roll_up(cube, freq, format), counts, check_names=False)
+            expected = self.s.bull_bear_ratios('q', groupby, 'sentiment', twits.copy(), [2])
+            rolled = self.s.bull_bear_ratios('q', groupby, 'sentiment', twits.copy(), [2], self.s.roll_up(cube, freq, format))
+            pd.testing.assert_frame_equal(expected, rolled)
+        cube = self.s.get_cube('sentiment', twits, key='symbol')
+        self.assertListEqual(cube.index.names, ['symbol', 'period'])
+        self.assertEqual(self.s.roll_up(cube, 'D', '%Y-%m-%d').loc['TSLA'].values.sum(), twits[twits['symbol'] == 'TSLA'].dropna(subset=['sentiment'])['body'].count())
+
+    def test_online(self):
+        seconds = np.sort(np.random.default_rng(0).integers(0, 3 * 86400, 3000))
+        twits = pd.DataFrame({
+            'id': np.arange(3000),
+            'body': 'message',
+            'created_at': (pd.Timestamp('2022-04-04') + pd.to_timedelta(seconds, unit='s')).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'sentiment': np.array(['Bullish', 'Bearish', 'Bullish', None], dtype=object)[np.arange(3000) % 4]
+        })
+        online = OnlineSignals('p', 'sentiment', [2, 5])
+        cuts = [0, 2, 7, 500, 501, 1800, 3000]
+        for start, end in zip(cuts[:-1], cuts[1:]):
+            batch = online.update(twits.iloc[start:end].copy())
+            expected = self.s.add_signals('p', 'sentiment', twits.iloc[:end].copy(), [2, 5]).iloc[start:end]
+            pd.testing.assert_frame_equal(batch, expected, check_dtype=False)
+        self.assertListEqual(online.update(twits.iloc[:0].copy()).keys().to_list(), batch.keys().to_list())
+        self.assertRaises(Exception, lambda: online.update(twits.iloc[:10].copy()))
+        online.reset()
+        self.assertEqual(online.update(twits.iloc[:10].copy())['p_total_cum'].iloc[-1], twits.iloc[:10]['sentiment'].map({'Bullish': 1, 'Bearish': -1}).sum())
+
+    def test_online_boundary(self):
+        twits = pd.DataFrame({
+            'id': np.arange(5),
+            'body': 'message',
+            'created_at': ['2022-04-04T10:00:00Z', '2022-04-04T10:10:00Z', '2022-04-04T10:20:00Z', '2022-04-04T10:30:00Z', '2022-04-04T11:05:00Z'],
+            'sentiment': np.array(['Bullish', 'Bearish', 'Bullish', None, 'Bullish'], dtype=object)
+        })
+        online = OnlineSignals('p', 'sentiment', [2, 5])
+        online.update(twits.iloc[:3].copy())
+        batch = online.update(twits.iloc[3:].copy())
+        self.assertListEqual(batch[['p_hour_bull', 'p_hour_bear', 'p_hour_bb_ratio']].iloc[0].to_list(), [2, 1, 2.0])
+        expected = self.s.add_signals('p', 'sentiment', twits.copy(), [2, 5]).iloc[3:]
+        pd.testing.assert_frame_equal(batch, expected, check_dtype=False)
+
+    def test_panel(self):
+        rng = np.random.default_rng(0)
+        seconds = np.sort(rng.integers(0, 3 * 86400, 3000))
+        twits = pd.DataFrame({
+            'id': np.arange(3000),
+            'body': 'message',
+            'created_at': (pd.Timestamp('2022-04-04') + pd.to_timedelta(seconds, unit='s')).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'sentiment': np.array(['Bullish', 'Bearish', None], dtype=object)[rng.integers(0, 3, 3000)],
+            'symbol': np.array(['TSLA', 'AAPL', 'AMZN'], dtype=object)[rng.integers(0, 3, 3000)]
+        })
+        # AMZN has no Bearish twits, so its ratios are NaN
+        twits.loc[(twits['symbol'] == 'AMZN') & (twits['sentiment'] == 'Bearish'), 'sentiment'] = 'Bullish'
+        panel = self.s.add_signals('p', 'sentiment', twits.copy(), [2, 5], key='symbol')
+        for symbol in ['TSLA', 'AAPL']:
+            expected = self.s.add_signals('p', 'sentiment', twits[twits['symbol'] == symbol].copy(), [2, 5])
+            pd.testing.assert_frame_equal(panel[twits['symbol'] == symbol], expected, check_dtype=False)
+        self.assertTrue(panel.loc[twits['symbol'] == 'AMZN', 'p_day_bb_ratio_5'].isna().all())
+        amzn = panel[twits['symbol'] == 'AMZN']
+        self.assertListEqual(amzn['p_total_cum'].to_list(), amzn['p_number'].cumsum().to_list())
+        pd.testing.assert_frame_equal(self.s.add_signals('p', 'sentiment', twits.copy(), [2, 5], key='symbol', workers=3), panel)
+        twits['sentiment'] = twits['sentiment'].replace('Bearish', 'Bullish')
+        self.assertRaises(Exception, lambda: self.s.add_signals('p', 'sentiment', twits.copy(), [2, 5], key='symbol'))
+
     def test_csv_ok(self):
         twits = pd.read_csv('tests/collection-ok.csv')
         self.add_signals(twits)
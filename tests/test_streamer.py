@@ -0,0 +1,97 @@
+import unittest
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from stocktwits_collector.streamer import Streamer
+from stocktwits_collector.limiter import RateLimiter
+from stocktwits_collector.cache import Cache
+from stocktwits_collector.metrics import Metrics
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    def log_message(self, format, *args):
+        pass
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        status, headers = self.server.responses.pop(0) if self.server.responses else (200, {})
+        body = json.dumps({"messages": [{"id": len(self.server.requests)}]}).encode()
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class TestService(unittest.TestCase, Streamer):
+    server = None
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.requests = []
+        self.server.responses = []
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_symbol_msgs(self):
+        st = Streamer(url=self.url)
+        self.assertEqual(st.get_symbol_msgs("TSLA", max=3, limit=30), {"messages": [{"id": 1}]})
+        self.assertEqual(self.server.requests, ["/streams/symbol/TSLA.json?since=0&max=3&limit=30"])
+
+    def test_get_backoff(self):
+        st = Streamer(backoff=1, max_backoff=4)
+        self.assertEqual(st.get_backoff(0, "7"), 7)
+        self.assertEqual(st.get_backoff(0, "Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        for attempt, backoff in [(0, 1), (1, 2), (2, 4), (5, 4)]:
+            self.assertTrue(backoff / 2 <= st.get_backoff(attempt) <= backoff)
+
+    def test_retry(self):
+        self.server.responses = [(504, {}), (429, {"Retry-After": "0"}), (200, {})]
+        st = Streamer(url=self.url, limiter=RateLimiter(10, 1), backoff=0.01)
+        self.assertEqual(st.get_user_msgs("ChartMill"), {"messages": [{"id": 3}]})
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_metrics(self):
+        self.server.responses = [(504, {}), (429, {"Retry-After": "0"}), (200, {})]
+        st = Streamer(url=self.url, backoff=0.01, metrics=Metrics())
+        st.get_symbol_msgs("TSLA")
+        self.assertEqual(st.metrics.get("stocktwits_requests_total", endpoint="symbol"), 3)
+        self.assertEqual(st.metrics.get("stocktwits_requests_total", status="200"), 1)
+        self.assertEqual(st.metrics.get("stocktwits_retries_total", endpoint="symbol"), 2)
+        self.assertEqual(st.metrics.get("stocktwits_received_bytes_total"), len(json.dumps({"messages": [{"id": 3}]})) * 3)
+        self.assertEqual(st.metrics.get_histogram("stocktwits_request_seconds", endpoint="symbol")["count"], 3)
+        self.assertGreater(st.metrics.get("stocktwits_phase_seconds_total", phase="fetch"), 0)
+
+    def test_retries_exhausted(self):
+        self.server.responses = [(504, {}), (504, {}), (504, {})]
+        st = Streamer(url=self.url, retries=2, backoff=0.01)
+        self.assertRaises(Exception, lambda: st.get_user_msgs("ChartMill"))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_no_retry(self):
+        self.server.responses = [(404, {})]
+        st = Streamer(url=self.url, backoff=0.01)
+        self.assertRaises(Exception, lambda: st.get_user_msgs("ChartMill"))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as path:
+            st = Streamer(url=self.url, cache=Cache(path))
+            self.assertEqual(st.get_symbol_msgs("TSLA", max=3, limit=30), {"messages": [{"id": 1}]})
+            self.assertEqual(st.get_symbol_msgs("TSLA", max=3, limit=30), {"messages": [{"id": 1}]})
+            self.assertEqual(st.get_symbol_msgs("TSLA", max=3, limit=20), {"messages": [{"id": 2}]})
+            self.assertEqual(st.get_symbol_msgs("TSLA", limit=30), {"messages": [{"id": 3}]})
+            self.assertEqual(st.get_symbol_msgs("TSLA", limit=30), {"messages": [{"id": 4}]})
+            self.assertEqual(len(self.server.requests), 4)
+
+            st = Streamer(url=self.url, cache=Cache(path, offline=True))
+            self.assertEqual(st.get_symbol_msgs("TSLA", max=3, limit=30), {"messages": [{"id": 1}]})
+            self.assertEqual(st.get_symbol_msgs("TSLA", limit=30), {"messages": [{"id": 4}]})
+            self.assertRaises(Exception, lambda: st.get_user_msgs("ChartMill", limit=30))
+            self.assertEqual(len(self.server.requests), 4)
+
+if __name__ == '__main__':
+    unittest.main()
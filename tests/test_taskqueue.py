@@ -0,0 +1,60 @@
+import unittest
+import os
+import time
+from stocktwits_collector.taskqueue import TaskQueue
+
+class TestService(unittest.TestCase, TaskQueue):
+    def remove(self, path):
+        for filename in [path, f"{path}-wal", f"{path}-shm"]:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def test_put(self):
+        path = "taskqueue-put.db"
+        queue = TaskQueue(path)
+        self.assertEqual(queue.put([("a", {"symbols": ["TSLA"]}), ("b", {"symbols": ["AAPL"]})]), 2)
+        self.assertEqual(queue.put([("b", {"symbols": ["AAPL"]}), ("c", {"symbols": ["AMZN"]})]), 1)
+        self.assertEqual(queue.get_counts(), {"pending": 3, "leased": 0, "done": 0, "failed": 0})
+        self.assertEqual([task["event"] for task in queue.get_tasks()], [{"symbols": ["TSLA"]}, {"symbols": ["AAPL"]}, {"symbols": ["AMZN"]}])
+        queue.close()
+        self.remove(path)
+
+    def test_lease(self):
+        path = "taskqueue-lease.db"
+        queue = TaskQueue(path)
+        other = TaskQueue(path)
+        queue.put([("a", {"symbols": ["TSLA"]}), ("b", {"symbols": ["AAPL"]})])
+        first = queue.lease("first")
+        second = other.lease("second")
+        self.assertEqual([first["key"], second["key"]], ["a", "b"])
+        self.assertIsNone(queue.lease("third"))
+        self.assertTrue(queue.renew(first))
+        self.assertTrue(queue.complete(first, {"pages": 3}))
+        self.assertFalse(queue.complete(first))
+        self.assertTrue(other.fail(second, "timeout"))
+        self.assertEqual(other.lease("third")["attempts"], 2)
+        self.assertEqual(queue.get_counts(), {"pending": 0, "leased": 1, "done": 1, "failed": 0})
+        self.assertEqual(queue.get_tasks("done")[0]["result"], {"pages": 3})
+        queue.close()
+        other.close()
+        self.remove(path)
+
+    def test_expired_lease(self):
+        path = "taskqueue-expired.db"
+        queue = TaskQueue(path, lease_seconds=0.05, max_attempts=2)
+        queue.put([("a", {"symbols": ["TSLA"]})])
+        first = queue.lease("first")
+        self.assertIsNone(queue.lease("second"))
+        time.sleep(0.1)
+        second = queue.lease("second")
+        self.assertEqual([second["key"], second["attempts"]], ["a", 2])
+        self.assertFalse(queue.complete(first))
+        time.sleep(0.1)
+        self.assertIsNone(queue.lease("third"))
+        self.assertEqual(queue.get_counts()["failed"], 1)
+        self.assertFalse(queue.complete(second))
+        queue.close()
+        self.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
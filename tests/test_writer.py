@@ -0,0 +1,68 @@
+import unittest
+import os
+import json
+from stocktwits_collector.message import Message
+import stocktwits_collector.writer as w
+from stocktwits_collector.writer import Writer
+
+class TestService(unittest.TestCase, Writer):
+    def __init__(self, *args, **kwargs):
+        with open('tests/symbol-msgs-all.json') as json_file:
+            self.messages = json.load(json_file)
+        unittest.TestCase.__init__(self, *args, **kwargs)
+
+    def get_formats(self):
+        formats = ["json", "jsonl", "jsonl.gz"]
+        if w.zstandard is not None:
+            formats.append("jsonl.zst")
+        return formats
+
+    def test_format(self):
+        self.assertEqual(Writer().suffix, ".json")
+        self.assertEqual(Writer("jsonl.gz").suffix, ".jsonl.gz")
+        self.assertRaises(Exception, lambda: Writer("xml"))
+
+    def test_write(self):
+        for format in self.get_formats():
+            writer = Writer(format)
+            filename = f"writer-test{writer.suffix}"
+            writer.write(filename, self.messages)
+            self.assertEqual(writer.read(filename), self.messages)
+            writer.write(filename, [Message.from_dict(message) for message in self.messages])
+            self.assertEqual(writer.read(filename), [Message.from_dict(message).to_dict() for message in self.messages])
+            os.remove(filename)
+
+    def test_append(self):
+        self.assertRaises(Exception, lambda: Writer("json").write("writer-test.json", self.messages, True))
+        for format in self.get_formats()[1:]:
+            writer = Writer(format)
+            filename = f"writer-test{writer.suffix}"
+            writer.write(filename, self.messages[:1])
+            writer.write(filename, self.messages[1:], True)
+            self.assertEqual(writer.read(filename), self.messages)
+            os.remove(filename)
+
+    def test_flatten(self):
+        row = self.flatten(self.messages[0])
+        self.assertEqual(list(row.keys()), self.columns)
+        self.assertEqual(row["user.username"], self.messages[0]["user"]["username"])
+        self.assertEqual(row["symbols"], [symbol["symbol"] for symbol in self.messages[0]["symbols"]])
+        self.assertEqual(self.flatten({"id": 1, "created_at": "2022-04-04T00:00:00Z"})["symbols"], [])
+        self.assertEqual(self.flatten(Message.from_dict(self.messages[0]))["entities.sentiment.basic"], row["entities.sentiment.basic"])
+
+    def test_read_frame(self):
+        formats = self.get_formats() + (["parquet"] if w.pyarrow is not None else [])
+        frames = []
+        for format in formats:
+            writer = Writer(format)
+            filename = f"writer-test{writer.suffix}"
+            writer.write(filename, self.messages)
+            frames.append(writer.read_frame(filename, ["id", "created_at", "entities.sentiment.basic"]))
+            os.remove(filename)
+        for frame in frames:
+            self.assertEqual(list(frame.columns), ["id", "created_at", "entities.sentiment.basic"])
+            self.assertEqual(frame["id"].tolist(), [message["id"] for message in self.messages])
+            self.assertEqual(frame["created_at"].tolist(), frames[0]["created_at"].tolist())
+
+if __name__ == '__main__':
+    unittest.main()